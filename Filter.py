@@ -1,73 +1,50 @@
-import json
-import os
 from datetime import datetime
 
+from document_store import get_document_store
+from facets import SearchFilters, get_store_facets
+
 
 class FilterManager:
     """Менеджер фильтрации записей по темам"""
 
     def __init__(self, data_file="knowledge_base.json"):
         self.data_file = data_file
-        self.data = self._load_data()
-
-    def _load_data(self):
-        """Загружает данные из файла"""
-        if os.path.exists(self.data_file):
-            with open(self.data_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return []
+        self.store = get_document_store(data_file)
+        self.facets = get_store_facets(self.store)
 
-    def _save_data(self, data):
-        """Сохраняет данные в файл"""
-        with open(self.data_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        self.data = data
+    @property
+    def data(self):
+        """Актуальные записи из общего хранилища"""
+        return self.store.snapshot().entries
 
     def get_unique_topics(self):
-        """Возвращает список уникальных тем"""
-        topics = set(["Все темы", "Без темы"])
-        for entry in self.data:  # Исправлено: self.data вместо self
-            topic = entry.get("topic", "Без темы")
-            topics.add(topic)
-        return sorted(list(topics))
+        """Возвращает список уникальных тем (из индекса фасетов, без просмотра записей)"""
+        return sorted(set(["Все темы", "Без темы"]) | set(self.facets.counts("topic")))
 
     def add_topic_field(self):
         """Добавляет поле topic в существующие записи"""
-        updated = False
-        for entry in self.data:  # Исправлено: self.data вместо self
-            if "topic" not in entry:
-                entry["topic"] = "Без темы"
-                updated = True
-        if updated:
-            self._save_data(self.data)
-        return updated
+        data = self.data
+        if all("topic" in entry for entry in data):
+            return False
+        # Хранилище само проставляет тему по умолчанию при сохранении
+        self.store.replace_all(list(data))
+        return True
 
     def filter_by_topic(self, topic="Все темы"):
         """Фильтрует записи по теме"""
-        if topic == "Все темы" or not topic:
-            return self.data
-
-        filtered_data = []
-        for entry in self.data:  # Исправлено: self.data вместо self
-            if entry.get("topic", "Без темы") == topic:
-                filtered_data.append(entry)
-
-        return filtered_data
+        return self.facets.filter(SearchFilters(topic=topic))
 
     def get_topic_statistics(self):
         """Возвращает статистику по темам"""
-        stats = {"Все темы": len(self.data)}
-        for entry in self.data:  # Исправлено: self.data вместо self
-            topic = entry.get("topic", "Без темы")
-            stats[topic] = stats.get(topic, 0) + 1
+        stats = {"Все темы": self.facets.total()}
+        stats.update(self.facets.counts("topic"))
         return stats
 
     def update_entry_topic(self, index, new_topic):
         """Обновляет тему для конкретной записи"""
-        if 0 <= index < len(self.data):
-            self.data[index]["topic"] = new_topic
-            self._save_data(self.data)
-            return True
+        data = self.data
+        if 0 <= index < len(data):
+            return self.store.update_entry(data[index].get("id"), {"topic": new_topic}) is not None
         return False
 
     def format_date(self, date_str):
@@ -2,6 +2,9 @@ import json
 import os
 from datetime import datetime
 
+from document_store import get_document_store
+from facets import SearchFilters, get_store_facets
+
 
 class AdvancedFilterManager:
     """Менеджер расширенной фильтрации записей по классам, параллелям и предметам"""
@@ -9,21 +12,15 @@ class AdvancedFilterManager:
     def __init__(self, data_file="knowledge_base.json", filters_file="filters.json"):
         self.data_file = data_file
         self.filters_file = filters_file
-        self.data = self._load_data()
+        self.store = get_document_store(data_file)
+        # Списки записей для каждого значения фасета, обновляемые по изменениям хранилища
+        self.facets = get_store_facets(self.store)
         self.filters = self._load_filters()
 
-    def _load_data(self):
-        """Загружает данные из файла"""
-        if os.path.exists(self.data_file):
-            with open(self.data_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        return []
-
-    def _save_data(self, data):
-        """Сохраняет данные в файл"""
-        with open(self.data_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        self.data = data
+    @property
+    def data(self):
+        """Актуальные записи из общего хранилища"""
+        return self.store.snapshot().entries
 
     def _load_filters(self):
         """Загружает конфигурацию фильтров"""
@@ -108,92 +105,52 @@ class AdvancedFilterManager:
 
     def update_entry_filters(self, index, class_name=None, parallel=None, subject=None):
         """Обновляет фильтры для конкретной записи"""
-        if 0 <= index < len(self.data):
-            if "education_info" not in self.data[index]:
-                self.data[index]["education_info"] = {}
+        data = self.data
+        if 0 <= index < len(data):
+            education_info = dict(data[index].get("education_info", {}))
             
             if class_name is not None:
-                self.data[index]["education_info"]["class"] = class_name
+                education_info["class"] = class_name
             if parallel is not None:
-                self.data[index]["education_info"]["parallel"] = parallel
+                education_info["parallel"] = parallel
             if subject is not None:
-                self.data[index]["education_info"]["subject"] = subject
+                education_info["subject"] = subject
                 
-            self._save_data(self.data)
-            return True
+            changes = {"education_info": education_info}
+            return self.store.update_entry(data[index].get("id"), changes) is not None
         return False
 
-    def filter_entries(self, selected_class=None, selected_parallel=None, selected_subject=None, selected_topic=None):
-        """Фильтрует записи по указанным параметрам"""
-        filtered_data = self.data
-        
-        # Фильтрация по классу
-        if selected_class and selected_class != "all":
-            filtered_data = [
-                entry for entry in filtered_data
-                if entry.get("education_info", {}).get("class") == selected_class
-            ]
-        
-        # Фильтрация по параллели
-        if selected_parallel and selected_parallel != "all":
-            filtered_data = [
-                entry for entry in filtered_data
-                if entry.get("education_info", {}).get("parallel") == selected_parallel
-            ]
-        
-        # Фильтрация по предмету
-        if selected_subject and selected_subject != "all":
-            filtered_data = [
-                entry for entry in filtered_data
-                if entry.get("education_info", {}).get("subject") == selected_subject
-            ]
-        
-        # Фильтрация по теме (если была часть предыдущей системы)
-        if selected_topic and selected_topic != "Все темы" and selected_topic != "":
-            filtered_data = [
-                entry for entry in filtered_data
-                if entry.get("topic", "Без темы") == selected_topic
-            ]
-        
-        return filtered_data
+    def filter_entries(self, selected_class=None, selected_parallel=None, selected_subject=None, selected_topic=None,
+                       date_from=None, date_to=None, newest_first=False):
+        """
+        Фильтрует записи по указанным параметрам (пересечение списков записей, начиная с самого короткого)
+
+        Диапазон дат (YYYY-MM-DD, включительно) выбирается из индекса по дате создания;
+        newest_first=True возвращает записи от новых к старым без сортировки.
+        """
+        filters = SearchFilters(topic=selected_topic, class_name=selected_class, parallel=selected_parallel,
+                                subject=selected_subject, date_from=date_from, date_to=date_to)
+        return self.facets.filter(filters, newest_first=newest_first)
+
+    def get_facet_counts(self, field):
+        """Количество записей для каждого значения фасета ("topic", "class", "parallel", "subject", "author")"""
+        return {value: count for value, count in self.facets.counts(field).items() if value}
 
     def get_unique_classes(self):
         """Возвращает уникальные классы из существующих записей"""
-        classes = set()
-        for entry in self.data:
-            edu_info = entry.get("education_info", {})
-            class_name = edu_info.get("class")
-            if class_name:
-                classes.add(class_name)
-        return sorted(list(classes))
+        return sorted(self.get_facet_counts("class"))
 
     def get_unique_parallels(self):
         """Возвращает уникальные параллели из существующих записей"""
-        parallels = set()
-        for entry in self.data:
-            edu_info = entry.get("education_info", {})
-            parallel = edu_info.get("parallel")
-            if parallel:
-                parallels.add(parallel)
-        return sorted(list(parallels))
+        return sorted(self.get_facet_counts("parallel"))
 
     def get_unique_subjects(self):
         """Возвращает уникальные предметы из существующих записей"""
-        subjects = set()
-        for entry in self.data:
-            edu_info = entry.get("education_info", {})
-            subject = edu_info.get("subject")
-            if subject:
-                subjects.add(subject)
-        return sorted(list(subjects))
+        return sorted(self.get_facet_counts("subject"))
 
     def get_unique_topics(self):
         """Возвращает уникальные темы (для совместимости со старой системой)"""
-        topics = set(["Все темы", "Без темы"])
-        for entry in self.data:
-            topic = entry.get("topic", "Без темы")
-            topics.add(topic)
-        return sorted(list(topics))
+        return sorted(set(["Все темы", "Без темы"]) | set(self.facets.counts("topic")))
 
     def format_date(self, date_str):
         """Форматирует дату для отображения"""
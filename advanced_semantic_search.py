@@ -1,43 +1,66 @@
 import numpy as np
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import torch
 from transformers import AutoTokenizer, AutoModel
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
 import string
 import pickle
 import os
+from nlp_resources import download_nltk_resources, get_lemmatizer, get_stop_words, word_tokenize
 import warnings
+from embedding_cache import EmbeddingCache
+from ann_index import IVFIndex
+from quantized_embeddings import QuantizedEmbeddings
+import sparse_scoring
 warnings.filterwarnings('ignore')
 
+# Каталог постоянного кэша эмбеддингов документов
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "embedding_cache")
+
+# Формат общего для рабочих процессов файла эмбеддингов: "int8", "float16" или "none" (матрица float32 в памяти)
+EMBEDDING_QUANTIZATION = os.environ.get("EMBEDDING_QUANTIZATION", "int8")
+
+# Начиная с этого числа документов поиск выполняется по приближенному индексу IVF
+ANN_MIN_DOCUMENTS = 10000
+
 class AdvancedSemanticSearchEngine:
     """
     Расширенный класс для реализации семантического поиска, который анализирует смысл и контекст запроса,
     используя предобученные трансформерные модели для получения эмбеддингов.
     """
     
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
+    def __init__(self, model_name='all-MiniLM-L6-v2', cache_dir=None, local_files_only=False,
+                 ann_min_documents=ANN_MIN_DOCUMENTS, ann_n_probe=8, quantization=EMBEDDING_QUANTIZATION):
         """
         Инициализация поискового движка
         
         Args:
             model_name: Название предобученной модели для получения эмбеддингов
+            cache_dir: Каталог постоянного кэша эмбеддингов (None — без кэша)
+            local_files_only: Загружать модель только из локального кэша, без обращения к сети
+            ann_min_documents: Минимальное число документов для приближенного поиска (None — всегда точный)
+            ann_n_probe: Количество просматриваемых кластеров IVF (больше — точнее, но медленнее)
+            quantization: Формат файла эмбеддингов в каталоге кэша ("int8", "float16" или "none")
         """
         try:
-            self.model = SentenceTransformer(model_name)
+            self.model = SentenceTransformer(model_name, local_files_only=local_files_only)
         except Exception as e:
             print(f"Ошибка при загрузке модели {model_name}: {e}")
             print("Попробуйте установить необходимые библиотеки: pip install sentence-transformers")
             raise
         
+        self.model_name = model_name
+        self.embedding_cache = EmbeddingCache(cache_dir, model_name) if cache_dir else None
+        self.ann_min_documents = ann_min_documents
+        self.ann_n_probe = ann_n_probe
+        self.ann_index = None
+        self.quantization = quantization if quantization in ("int8", "float16") else None
         self.documents = []
         self.doc_embeddings = None
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english')).union(set(stopwords.words('russian')))
+        # Ресурсы NLTK ищутся только локально; при их отсутствии используется простая замена
+        self.lemmatizer = get_lemmatizer()
+        self.stop_words = get_stop_words()
         
     def preprocess_text(self, text: str) -> str:
         """
@@ -65,16 +88,50 @@ class AdvancedSemanticSearchEngine:
         """
         self.documents = documents
         
-        # Получение эмбеддингов для всех документов
-        self.doc_embeddings = self.model.encode(documents)
+        if self.embedding_cache is None:
+            # Получение эмбеддингов для всех документов
+            embeddings = self.model.encode(documents)
+        else:
+            # Модель вычисляет эмбеддинги только для новых и измененных документов
+            embeddings = self.embedding_cache.encode(documents, self.model.encode)
+            if self.embedding_cache.row_count > 2 * max(len(documents), 1):
+                # Устаревших эмбеддингов больше, чем актуальных — переписываем кэш
+                self.embedding_cache.compact(documents)
+        
+        if self.embedding_cache is not None and self.quantization:
+            # Квантованный файл отображается в память и разделяется всеми рабочими процессами;
+            # массив float32 нужен только на время загрузки
+            prefix = os.path.splitext(self.embedding_cache.vectors_file)[0]
+            self.doc_embeddings = QuantizedEmbeddings.open_or_create(prefix, embeddings, self.quantization)
+        else:
+            self.doc_embeddings = embeddings
+        self._build_ann_index(embeddings)
+    
+    def _build_ann_index(self, embeddings):
+        """Строит (или загружает сохраненный рядом с кэшем эмбеддингов) индекс IVF для большого корпуса"""
+        self.ann_index = None
+        if self.ann_min_documents is None or len(self.documents) < self.ann_min_documents:
+            return
+        index_file = None
+        if self.embedding_cache is not None:
+            index_file = os.path.splitext(self.embedding_cache.vectors_file)[0] + ".ivf.npz"
+        matrix = self.doc_embeddings if isinstance(self.doc_embeddings, QuantizedEmbeddings) else None
+        if index_file is not None:
+            self.ann_index = IVFIndex.load(index_file, embeddings, matrix)
+        if self.ann_index is None:
+            self.ann_index = IVFIndex(n_probe=self.ann_n_probe).build(embeddings, matrix)
+            if index_file is not None:
+                self.ann_index.save(index_file)
+        self.ann_index.n_probe = self.ann_n_probe
     
-    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+    def search(self, query: str, top_k: int = 5, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
         """
         Поиск наиболее релевантных документов для запроса.
         
         Args:
             query: Поисковый запрос
             top_k: Количество возвращаемых результатов
+            rows: Номера документов, прошедших фильтры (по умолчанию — все документы)
             
         Returns:
             Список кортежей (индекс документа, оценка релевантности)
@@ -85,8 +142,25 @@ class AdvancedSemanticSearchEngine:
         # Получение эмбеддинга для запроса
         query_embedding = self.model.encode([query])
         
+        if rows is not None:
+            # Фильтры заданы: точное сходство считается только для допустимых документов
+            rows = np.sort(np.asarray(rows, dtype=np.int64))
+            if isinstance(self.doc_embeddings, QuantizedEmbeddings):
+                similarities = self.doc_embeddings.score(query_embedding, rows)
+            else:
+                similarities = cosine_similarity(query_embedding, self.doc_embeddings[rows]).flatten()
+            positive = similarities > 0
+            return sparse_scoring.select_top_k(rows[positive], similarities[positive], top_k)
+        
+        if self.ann_index is not None:
+            # Большой корпус: точное сходство считается только в ближайших кластерах
+            return [(idx, score) for idx, score in self.ann_index.search(query_embedding, top_k) if score > 0]
+        
         # Вычисление косинусного сходства между запросом и документами
-        similarities = cosine_similarity(query_embedding, self.doc_embeddings).flatten()
+        if isinstance(self.doc_embeddings, QuantizedEmbeddings):
+            similarities = self.doc_embeddings.score(query_embedding)
+        else:
+            similarities = cosine_similarity(query_embedding, self.doc_embeddings).flatten()
         
         # Получение индексов топ-K наиболее похожих документов
         top_indices = similarities.argsort()[-top_k:][::-1]
@@ -96,13 +170,43 @@ class AdvancedSemanticSearchEngine:
         
         return results
     
+    def batch_search(self, queries: List[str], top_k: int = 5) -> List[List[Tuple[int, float]]]:
+        """
+        Поиск по пакету запросов: эмбеддинги всех запросов вычисляются одним вызовом модели,
+        а сходство — одним матричным произведением.
+        
+        Args:
+            queries: Список поисковых запросов
+            top_k: Количество возвращаемых результатов на запрос
+            
+        Returns:
+            Для каждого запроса список кортежей (индекс документа, оценка релевантности)
+        """
+        if self.doc_embeddings is None or len(self.documents) == 0:
+            raise ValueError("Нет загруженных документов. Используйте метод add_documents() сначала.")
+        if not queries:
+            return []
+        
+        query_embeddings = self.model.encode(list(queries))
+        
+        if self.ann_index is not None:
+            return [[(idx, score) for idx, score in self.ann_index.search(query_embedding, top_k) if score > 0]
+                    for query_embedding in query_embeddings]
+        
+        if isinstance(self.doc_embeddings, QuantizedEmbeddings):
+            similarities = self.doc_embeddings.score_batch(query_embeddings)
+        else:
+            similarities = cosine_similarity(query_embeddings, self.doc_embeddings)
+        return [sparse_scoring.top_k(row, top_k) for row in similarities]
+    
     def save_model(self, filepath: str):
         """
         Сохранение модели в файл.
         """
         model_data = {
             'documents': self.documents,
-            'doc_embeddings': self.doc_embeddings
+            'doc_embeddings': (self.doc_embeddings.to_array()
+                               if isinstance(self.doc_embeddings, QuantizedEmbeddings) else self.doc_embeddings)
         }
         with open(filepath, 'wb') as f:
             pickle.dump(model_data, f)
@@ -189,20 +293,7 @@ def compare_approaches():
 
 if __name__ == "__main__":
     # Загрузка необходимых ресурсов NLTK
-    try:
-        nltk.data.find('tokenizers/punkt')
-    except LookupError:
-        nltk.download('punkt')
-
-    try:
-        nltk.data.find('corpora/stopwords')
-    except LookupError:
-        nltk.download('stopwords')
-
-    try:
-        nltk.data.find('corpora/wordnet')
-    except LookupError:
-        nltk.download('wordnet')
+    download_nltk_resources()
     
     demo_advanced_search()
     compare_approaches()
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+Приближенный поиск ближайших соседей по эмбеддингам (IVF) на NumPy.
+
+Векторы документов разбиваются на кластеры сферическим k-means; запрос
+сравнивается с центроидами, и точное косинусное сходство считается только
+для документов из n_probe ближайших кластеров. Параметры n_lists и n_probe
+задают баланс между полнотой (recall) и временем ответа.
+"""
+import hashlib
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+DTYPE = np.float32
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Нормирует строки до единичной длины (косинусное сходство становится скалярным произведением)"""
+    vectors = np.asarray(vectors, dtype=DTYPE)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def embeddings_fingerprint(embeddings: np.ndarray) -> str:
+    """Отпечаток набора эмбеддингов: по нему проверяется, что сохраненный индекс актуален"""
+    embeddings = np.ascontiguousarray(embeddings, dtype=DTYPE)
+    digest = hashlib.sha1(str(embeddings.shape).encode("utf-8"))
+    digest.update(embeddings.tobytes())
+    return digest.hexdigest()
+
+
+class IVFIndex:
+    """
+    Инвертированный файл (IVF) по нормированным эмбеддингам.
+
+    Номера документов хранятся сгруппированными по кластерам (list_ids),
+    а list_offsets задает границы групп, как в разреженной CSR-матрице.
+    Сходство кандидатов считается по нормированной матрице float32 или по
+    внешней матрице с методом score(query, rows) (например, QuantizedEmbeddings).
+    """
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8, n_iter: int = 20,
+                 train_per_list: int = 64, seed: int = 0):
+        """
+        Инициализация индекса
+
+        Args:
+            n_lists: количество кластеров (по умолчанию ~ корень из числа документов)
+            n_probe: количество просматриваемых кластеров при поиске
+            n_iter: количество итераций k-means
+            train_per_list: размер обучающей выборки на один кластер
+            seed: зерно генератора случайных чисел
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.train_per_list = train_per_list
+        self.seed = seed
+        self.centroids = None
+        self.vectors = None
+        self.list_ids = None
+        self.list_offsets = None
+        self.fingerprint = None
+
+    def __len__(self):
+        return 0 if self.vectors is None else len(self.vectors)
+
+    def build(self, embeddings: np.ndarray, matrix=None):
+        """
+        Строит индекс по эмбеддингам документов
+
+        Args:
+            embeddings: массив формы (количество документов, размерность)
+            matrix: матрица для вычисления сходства кандидатов (по умолчанию — нормированные эмбеддинги)
+        """
+        vectors = normalize_rows(embeddings)
+        count = len(vectors)
+        n_lists = self.n_lists or max(1, int(round(np.sqrt(count))))
+        n_lists = max(1, min(n_lists, count))
+        rng = np.random.default_rng(self.seed)
+
+        # Кластеризация по выборке, затем распределение всех документов
+        sample_size = min(count, n_lists * self.train_per_list)
+        sample = vectors[rng.choice(count, sample_size, replace=False)] if sample_size < count else vectors
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignment = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            # Пустой кластер получает случайную точку выборки
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        assignment = self._assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        self.centroids = centroids
+        self.vectors = vectors if matrix is None else matrix
+        self.list_ids = order.astype(np.int64)
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=n_lists)))).astype(np.int64)
+        self.fingerprint = embeddings_fingerprint(embeddings)
+        return self
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        """Номер ближайшего центроида для каждой строки (блоками, чтобы ограничить память)"""
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk):
+            assignment[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        return assignment
+
+    def search(self, query: np.ndarray, top_k: int = 5, n_probe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Приближенный поиск наиболее похожих документов
+
+        Args:
+            query: эмбеддинг запроса
+            top_k: количество возвращаемых результатов
+            n_probe: количество просматриваемых кластеров (по умолчанию self.n_probe)
+
+        Returns:
+            Список кортежей (номер документа, косинусное сходство) по убыванию сходства
+        """
+        if self.centroids is None or top_k <= 0:
+            return []
+        query = normalize_rows(query)[0]
+        n_probe = max(1, min(n_probe or self.n_probe, len(self.centroids)))
+
+        centroid_scores = self.centroids @ query
+        if n_probe < len(centroid_scores):
+            lists = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        else:
+            lists = np.arange(len(centroid_scores))
+        candidates = np.concatenate([
+            self.list_ids[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists
+        ])
+        if len(candidates) == 0:
+            return []
+
+        if isinstance(self.vectors, np.ndarray):
+            scores = self.vectors[candidates] @ query
+        else:
+            scores = self.vectors.score(query, candidates)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        # Равные оценки упорядочиваются по номеру документа
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def save(self, path: str):
+        """Атомарно сохраняет индекс в файл .npz"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".ivf_", suffix=".npz", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, centroids=self.centroids, list_ids=self.list_ids, list_offsets=self.list_offsets,
+                         fingerprint=np.array(self.fingerprint), n_probe=np.array(self.n_probe))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray, matrix=None) -> Optional["IVFIndex"]:
+        """
+        Загружает индекс, если он построен по тем же эмбеддингам
+
+        Args:
+            path: путь к файлу .npz
+            embeddings: текущие эмбеддинги документов (сами векторы в файле не хранятся)
+            matrix: матрица для вычисления сходства кандидатов (по умолчанию — нормированные эмбеддинги)
+
+        Returns:
+            IVFIndex или None, если файла нет или он устарел
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                fingerprint = str(data["fingerprint"])
+                if fingerprint != embeddings_fingerprint(embeddings):
+                    return None
+                index = cls(n_lists=len(data["centroids"]), n_probe=int(data["n_probe"]))
+                index.centroids = data["centroids"]
+                index.list_ids = data["list_ids"]
+                index.list_offsets = data["list_offsets"]
+        except (OSError, ValueError, KeyError):
+            return None
+        index.vectors = normalize_rows(embeddings) if matrix is None else matrix
+        index.fingerprint = fingerprint
+        return index
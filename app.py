@@ -1,6 +1,5 @@
 import json
 import os
-import re
 import threading
 import logging
 import uuid
@@ -12,13 +11,22 @@ from flask import Flask, render_template, request, redirect, url_for, send_from_
 from werkzeug.utils import secure_filename
 from audit_system import init_audit_system, log_action
 from auth import auth
-from data_utils import load_data
+from document_store import document_store
 from scheduler import background_job, start_scheduler
-from utils import extract_content_from_pdf, fetch_edsoo_documents, download_document, logger, sync_edsoo
+from utils import (extract_content_from_pdf, fetch_edsoo_documents, download_document, logger, save_attachment_text,
+                   sync_edsoo)
 from Filter import FilterManager
 from advanced_filter import AdvancedFilterManager
 from forms import KnowledgeEntryForm
-from simple_semantic_search_integration import initialize_search_system, perform_integrated_search
+from simple_semantic_search_integration import (attach_search_system, is_search_system_ready, perform_batch_search,
+                                                 perform_combined_search, perform_integrated_search,
+                                                 warm_up_search_system)
+from syntax_query import syntax_aware_search
+from inverted_index import attach_syntax_index, syntax_index
+from result_cache import ResultCache, normalize_query
+from facets import SearchFilters
+from pagination import page_ranked, page_size
+from passages import remove_full_text
 from backup_system import backup_system, create_daily_backup
 init_audit_system()
 
@@ -38,6 +46,19 @@ ALLOWED_EXTENSIONS = {"pdf", "docx", "txt", "doc", "rtf"}
 filter_manager = FilterManager(DATA_FILE)
 advanced_filter_manager = AdvancedFilterManager(DATA_FILE, "filters.json")
 
+# Индексы поиска строятся один раз и дальше обновляются по изменениям хранилища.
+# Семантический индекс прогревается в фоне, чтобы запуск приложения не ждал scikit-learn.
+attach_search_system(document_store, build=False)
+warm_up_search_system()
+attach_syntax_index(document_store)
+
+# Кэш результатов /search: ключ включает версию хранилища, поэтому изменения записей
+# делают старые результаты недоступными без явной очистки
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "256"))
+SEARCH_CACHE_TTL = float(os.environ["SEARCH_CACHE_TTL"]) if os.environ.get("SEARCH_CACHE_TTL") else None
+SEMANTIC_TOP_K = 20
+search_result_cache = ResultCache(max_entries=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
 UPLOAD_FOLDER = "static/uploads"
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -63,6 +84,14 @@ def statistics():
     return render_template("statistics.html", report=report, topic_stats=topic_stats, format_date=format_date)
 
 
+@app.route("/api/audit/status")
+def audit_status():
+    """Счетчики фоновой записи аудита: глубина очереди и время записи пакетов"""
+    if "user" not in session or session["user"]["role"] != "admin":
+        return jsonify({"error": "Доступ запрещён"}), 403
+    return jsonify(audit_system.audit_writer.stats())
+
+
 @app.route("/audit")
 def audit_log():
     if "user" not in session or session["user"]["role"] != "admin":
@@ -75,37 +104,17 @@ def audit_log():
     date_from = request.args.get("date_from", "")
     date_to = request.args.get("date_to", "")
 
-    # Загружаем логи
-    logs = audit_system.load_audit_logs()
-
-    # Фильтруем логи
-    if action_type:
-        logs = [log for log in logs if log["action_type"] == action_type]
-
-    if username:
-        logs = [log for log in logs if log["username"] == username]
-
-    if query:
-        logs = [log for log in logs if query in log["details"].lower() or
-                query in log["target"].lower() or
-                query in log["username"].lower()]
-    
-    # Фильтруем по дате
-    if date_from:
-        from_date = datetime.strptime(date_from, '%Y-%m-%d')
-        logs = [log for log in logs if datetime.fromisoformat(log["timestamp"]) >= from_date]
-    
-    if date_to:
-        to_date = datetime.strptime(date_to, '%Y-%m-%d')
-        logs = [log for log in logs if datetime.fromisoformat(log["timestamp"]).date() <= to_date.date()]
-
-    # Сортируем по времени (новые сначала)
-    logs.sort(key=lambda x: x["timestamp"], reverse=True)
+    # Страница логов из индекса аудита (новые сначала)
+    result = audit_system.query_audit_logs(username=username, action_type=action_type, text=query,
+                                           date_from=date_from, date_to=date_to,
+                                           limit=page_size(request.args.get("per_page")),
+                                           after=request.args.get("after"))
 
     # Генерируем отчет
     report = audit_system.generate_audit_report()
 
-    return render_template("audit.html", logs=logs, report=report, format_date=format_date)
+    return render_template("audit.html", logs=result["logs"], report=report, format_date=format_date,
+                           total_logs=result["total"], **page_links(result["next_cursor"]))
 
 
 @app.route("/backups")
@@ -153,25 +162,13 @@ def restore_data():
         action_types = data.get("action_types", [])
         targets = data.get("targets", [])
         
-        # Load audit logs
-        logs = audit_system.load_audit_logs()
+        # Load audit logs of the requested period (only the overlapping monthly segments are read),
+        # including actions still queued for the background writer
+        logs = audit_system.iter_audit_logs(date_from, date_to, flush=True)
         
         # Filter logs based on criteria
         filtered_logs = []
         for log in logs:
-            log_time = datetime.fromisoformat(log["timestamp"])
-            
-            # Check date range
-            if date_from:
-                from_date = datetime.strptime(date_from, '%Y-%m-%d')
-                if log_time < from_date:
-                    continue
-            
-            if date_to:
-                to_date = datetime.strptime(date_to, '%Y-%m-%d')
-                if log_time.date() > to_date.date():
-                    continue
-            
             # Check action types
             if action_types and log["action_type"] not in action_types:
                 continue
@@ -185,22 +182,21 @@ def restore_data():
         # Perform restoration based on logs
         restored_items = []
         for log in filtered_logs:
-            if log["action_type"] == "delete" and "old_value" in log:
-                # Restore deleted item
-                data = load_data()
-                # Check if item doesn't already exist
-                if not any(item.get("title") == log["old_value"].get("title") for item in data):
-                    data.append(log["old_value"])
-                    save_data(data)
+            if not isinstance(log.get("old_value"), dict):
+                # Only full entry snapshots can be restored
+                continue
+            if log["action_type"] == "delete":
+                # Restore deleted item if it doesn't already exist
+                if not document_store.title_exists(log["old_value"].get("title")):
+                    document_store.add_entry(log["old_value"])
                     restored_items.append(log["target"])
-            elif log["action_type"] == "edit" and "old_value" in log:
+            elif log["action_type"] == "edit":
                 # Revert edit to old value
-                data = load_data()
-                for i, item in enumerate(data):
-                    if item.get("title") == log["target"] or item.get("id") == log.get("entry_id"):
-                        data[i] = log["old_value"]
-                        break
-                save_data(data)
+                entry_id = log.get("entry_id")
+                if document_store.get_entry(entry_id) is None:
+                    entry_id = document_store.find_id_by_title(log["target"])
+                if entry_id is not None:
+                    document_store.update_entry(entry_id, log["old_value"])
                 restored_items.append(log["target"])
         
         log_action(
@@ -236,7 +232,7 @@ def start_background_tasks(app):
             knowledge = load_data()
             added = 0
             for doc in new_docs:
-                if not any(e["title"] == doc["title"] for e in knowledge):
+                if not document_store.title_exists(doc["title"]):
                     filename = download_document(doc["url"])
                     if filename:
                         content = extract_content_from_pdf(filename)
@@ -259,96 +255,11 @@ def start_background_tasks(app):
 
 
 def load_data():
-    """Загружает данные с обновлением структуры"""
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for entry in data:
-                if "created_at" not in entry:
-                    entry["created_at"] = datetime.now().isoformat()
-                if "updated_at" not in entry:
-                    entry["updated_at"] = entry["created_at"]
-                # Добавляем поле topic, если его нет
-                if "topic" not in entry or entry["topic"] is None:
-                    entry["topic"] = "Без темы"
-            
-            # Инициализируем систему семантического поиска с новыми данными
-            try:
-                initialize_search_system(data)
-            except Exception as e:
-                print(f"[ERROR] Не удалось инициализировать систему семантического поиска: {e}")
-            
-            return data
-    return []
+    """Возвращает записи из общего хранилища (файл перечитывается только при его изменении)"""
+    return list(document_store.snapshot().entries)
 
 def save_data(data):
-    for entry in data:
-        if "author" not in entry or not entry["author"]:
-            entry["author"] = "system"
-    with open(DATA_FILE, "w", encoding="utf-8") as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
-
-
-def syntax_aware_search(text, query):
-    """
-    Performs syntax-aware search supporting:
-    - AND operator: "word1 AND word2"
-    - OR operator: "word1 OR word2" 
-    - NOT operator: "word1 NOT word2"
-    - Phrase search: "word1 word2" (both words present)
-    - Quoted phrases: "\"exact phrase\""
-    """
-    # Normalize text and query to lowercase
-    text_lower = text.lower()
-    query = query.strip()
-    
-    # Handle quoted phrases first
-    quoted_phrases = re.findall(r'"([^"]*)"', query)
-    query_without_quotes = re.sub(r'"[^"]*"', '', query)
-    
-    # Check if all quoted phrases are present in the text
-    for phrase in quoted_phrases:
-        phrase = phrase.strip().lower()
-        if phrase and phrase not in text_lower:
-            return False
-    
-    # Process the remaining query without quotes
-    terms = query_without_quotes.strip()
-    if not terms:
-        return len(quoted_phrases) > 0  # If only quotes were provided, return True if they matched
-    
-    # Split by AND, OR, NOT operators while preserving them
-    parts = re.split(r'\s+(AND|OR|NOT)\s+', terms, flags=re.IGNORECASE)
-    
-    # Process parts with operators
-    i = 0
-    result = True  # Start with True for AND logic
-    operator = 'AND'  # Default operator
-    
-    while i < len(parts):
-        part = parts[i].strip()
-        
-        if part.upper() in ['AND', 'OR', 'NOT']:
-            operator = part.upper()
-        else:
-            term = part.strip().lower()
-            if term:
-                term_exists = term in text_lower
-                
-                if operator == 'AND':
-                    result = result and term_exists
-                elif operator == 'OR':
-                    if i == 0:  # First term, initialize result
-                        result = term_exists
-                    else:
-                        result = result or term_exists
-                elif operator == 'NOT':
-                    result = result and not term_exists
-        
-        i += 1
-    
-    return result
-
+    document_store.replace_all(data)
 
 
 def format_date(date_str):
@@ -364,6 +275,16 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def page_links(next_cursor):
+    """Ссылки на следующую и первую страницы с теми же параметрами запроса"""
+    args = request.args.to_dict()
+    args.pop("after", None)
+    return {
+        "next_page_url": url_for(request.endpoint, **args, after=next_cursor) if next_cursor else None,
+        "first_page_url": url_for(request.endpoint, **args) if request.args.get("after") else None,
+    }
+
+
 # --- Маршруты ---
 @app.route("/")
 def index():
@@ -378,32 +299,12 @@ def index():
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
     
-    # Фильтруем записи по всем параметрам
-    filtered_data = advanced_filter_manager.filter_entries(
-        selected_class=selected_class,
-        selected_parallel=selected_parallel,
-        selected_subject=selected_subject,
-        selected_topic=selected_topic
-    )
-    
-    # Применяем фильтрацию по дате, если указаны параметры
-    if date_from or date_to:
-        filtered_temp = []
-        for entry in filtered_data:
-            entry_date = datetime.fromisoformat(entry['created_at'].replace('Z', '+00:00'))
-            if date_from:
-                from_date = datetime.strptime(date_from, '%Y-%m-%d')
-                if entry_date.date() < from_date.date():
-                    continue
-            if date_to:
-                to_date = datetime.strptime(date_to, '%Y-%m-%d')
-                if entry_date.date() > to_date.date():
-                    continue
-            filtered_temp.append(entry)
-        filtered_data = filtered_temp
-    
-    # Сортируем записи по дате создания (новые сверху)
-    filtered_data.sort(key=lambda x: x['created_at'], reverse=True)
+    # Страница записей (новые сверху) по всем параметрам и диапазону дат из индекса хранилища;
+    # общее количество считается по индексу без построения полного списка
+    filters = SearchFilters.from_args(request.args)
+    filtered_data, next_cursor = advanced_filter_manager.facets.page(
+        filters, limit=page_size(request.args.get("per_page")), after=request.args.get("after"))
+    total_entries = advanced_filter_manager.facets.count(filters)
     
     # Получаем доступные фильтры
     available_filters = advanced_filter_manager.get_available_filters()
@@ -431,6 +332,8 @@ def index():
         selected_subject=selected_subject,
         date_from=date_from,
         date_to=date_to,
+        total_entries=total_entries,
+        **page_links(next_cursor),
         unique_classes=unique_classes,
         unique_parallels=unique_parallels,
         unique_subjects=unique_subjects
@@ -544,9 +447,8 @@ def add_entry():
             if not title:
                 title = "Без заголовка"
 
-        # Загружаем данные и проверяем на дубликаты
-        data = load_data()
-        if any(entry["title"] == title for entry in data):
+        # Проверяем на дубликаты
+        if document_store.title_exists(title):
             return "Запись с таким заголовком уже существует", 400
 
         # Обработка файла
@@ -560,6 +462,7 @@ def add_entry():
                     # Дополнительная проверка сохранения файла
                     if not os.path.exists(file_path):
                         raise Exception("Файл не был сохранен на диск")
+                    save_attachment_text(file_path)
                 except Exception as e:
                     logging.error(f"Ошибка при сохранении файла {filename}: {str(e)}")
                     return "Ошибка при сохранении файла", 500
@@ -590,12 +493,7 @@ def add_entry():
 
         # Сохраняем запись
         try:
-            data.append(new_entry)
-            save_data(data)
-
-            # Обновляем данные в менеджере фильтрации
-            filter_manager.data = data
-            advanced_filter_manager.data = data
+            document_store.add_entry(new_entry)
 
             # Логируем действие
             log_action(
@@ -611,6 +509,8 @@ def add_entry():
             # Если был загружен файл, удаляем его
             if filename and os.path.exists(os.path.join(app.config["UPLOAD_FOLDER"], filename)):
                 os.remove(os.path.join(app.config["UPLOAD_FOLDER"], filename))
+            if filename:
+                remove_full_text(os.path.join(app.config["UPLOAD_FOLDER"], filename))
             return "Ошибка при сохранении записи", 500
 
     # Для GET-запроса отображаем форму добавления
@@ -626,8 +526,7 @@ def add_entry():
 
 @app.route("/view/<id>")
 def view_entry(id):
-    data = load_data()
-    entry = next((item for item in data if str(item.get('id')) == str(id)), None)
+    entry = document_store.get_entry(id)
     if entry is None:
         return "Запись не найдена", 404
     return render_template("view.html", entry=entry, format_date=format_date)
@@ -637,8 +536,7 @@ def view_entry(id):
 def edit_entry(id):
     if "user" not in session:
         return redirect(url_for("login"))
-    data = load_data()
-    entry = next((item for item in data if str(item.get('id')) == str(id)), None)
+    entry = document_store.get_entry(id)
     if entry is None:
         return "Запись не найдена", 404
 
@@ -663,7 +561,7 @@ def edit_entry(id):
             return "Поля не могут быть пустыми", 400
 
         # Проверка на дубликаты (кроме текущей записи)
-        if any(e["title"] == new_title and e != entry for e in data):
+        if document_store.title_exists(new_title, exclude_id=entry.get("id")):
             return "Дубликат заголовка", 400
 
         # Сохраняем старые значения для аудита
@@ -672,11 +570,13 @@ def edit_entry(id):
         old_content = entry["content"]
 
         # Обновляем запись
-        entry["title"] = new_title
-        entry["topic"] = new_topic
-        entry["content"] = new_content
-        entry["author"] = session["user"]["username"]  # Устанавливаем автора
-        entry["updated_at"] = datetime.now().isoformat()
+        changes = {
+            "title": new_title,
+            "topic": new_topic,
+            "content": new_content,
+            "author": session["user"]["username"],  # Устанавливаем автора
+            "updated_at": datetime.now().isoformat()
+        }
 
         # Обработка файла
         if file and allowed_file(file.filename):
@@ -685,14 +585,13 @@ def edit_entry(id):
                 old_path = os.path.join(app.config["UPLOAD_FOLDER"], old_file)
                 if os.path.exists(old_path):
                     os.remove(old_path)
-            entry["file"] = secure_filename(file.filename)
-            file.save(os.path.join(app.config["UPLOAD_FOLDER"], entry["file"]))
+                remove_full_text(old_path)
+            changes["file"] = secure_filename(file.filename)
+            file_path = os.path.join(app.config["UPLOAD_FOLDER"], changes["file"])
+            file.save(file_path)
+            save_attachment_text(file_path)
 
-        save_data(data)
-
-        # Обновляем данные в менеджере фильтрации
-        filter_manager.data = data
-        advanced_filter_manager.data = data
+        document_store.update_entry(id, changes)
 
         # Запись в аудит
         log_action(
@@ -714,8 +613,7 @@ def delete_entry(id):
     if "user" not in session:
         return redirect(url_for("login"))
 
-    data = load_data()
-    entry = next((item for item in data if str(item.get('id')) == str(id)), None)
+    entry = document_store.get_entry(id)
     if entry is None:
         return "Запись не найдена", 404
 
@@ -733,9 +631,9 @@ def delete_entry(id):
         old_path = os.path.join(app.config["UPLOAD_FOLDER"], old_file)
         if os.path.exists(old_path):
             os.remove(old_path)
+        remove_full_text(old_path)
     
-    data.remove(entry)
-    save_data(data)
+    document_store.delete_entry(id)
     return redirect(url_for("index"))
 
 
@@ -758,6 +656,52 @@ def uploaded_file(filename):
         return f"Произошла ошибка: {e}", 500
 
 
+@app.route("/api/search/status")
+def search_status():
+    """Готовность поисковых индексов (семантический индекс строится в фоне после запуска)"""
+    return jsonify({"semantic_ready": is_search_system_ready(), "result_cache": search_result_cache.stats()})
+
+
+# Ограничения пакетного поиска
+MAX_BATCH_QUERIES = 50
+MAX_BATCH_TOP_K = 50
+BATCH_SEARCH_TYPES = ("semantic", "syntax", "combined")
+
+
+@app.route("/api/search/batch", methods=["POST"])
+def search_batch():
+    """
+    Пакетный поиск: {"queries": [...], "search_type": "semantic" | "syntax" | "combined", "top_k": 10}
+    
+    Только для вошедших пользователей. Семантические запросы оцениваются одним матричным произведением.
+    """
+    if "user" not in session:
+        return jsonify({"error": "Требуется вход в систему"}), 401
+    payload = request.get_json(silent=True) or {}
+    queries = payload.get("queries")
+    search_type = payload.get("search_type", "semantic")
+    if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+        return jsonify({"error": "Поле queries должно быть списком строк"}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"Не более {MAX_BATCH_QUERIES} запросов за один вызов"}), 400
+    if search_type not in BATCH_SEARCH_TYPES:
+        return jsonify({"error": "Неизвестный тип поиска"}), 400
+    try:
+        top_k = int(payload.get("top_k", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Поле top_k должно быть числом"}), 400
+    top_k = max(1, min(top_k, MAX_BATCH_TOP_K))
+
+    queries = [query.strip() for query in queries]
+    batch_results = perform_batch_search(queries, search_type=search_type, top_k=top_k)
+
+    return jsonify({
+        "search_type": search_type,
+        "top_k": top_k,
+        "results": [{"query": query, "entries": entries} for query, entries in zip(queries, batch_results)]
+    })
+
+
 @app.route("/search", methods=["POST"])
 def search_entry():
     query = request.form.get("query", "").strip()
@@ -768,7 +712,12 @@ def search_entry():
         return redirect(url_for("index"))
 
     # Redirect to GET route to have clean URLs that can be shared
-    return redirect(url_for('search_entry_get', query=query, topic=selected_topic, search_type=search_type))
+    facets = {
+        name: request.form.get(name, "")
+        for name in ("class", "parallel", "subject", "author", "date_from", "date_to")
+    }
+    return redirect(url_for('search_entry_get', query=query, topic=selected_topic, search_type=search_type,
+                            **{name: value for name, value in facets.items() if value}))
 
 
 @app.route("/search", methods=["GET"])
@@ -776,38 +725,51 @@ def search_entry_get():
     query = request.args.get("query", "").strip()
     selected_topic = request.args.get("topic", "Все темы")
     search_type = request.args.get("search_type", "syntax")  # Добавляем параметр типа поиска
+    # Фильтры по фасетам передаются в движки и применяются до выбора лучших результатов
+    filters = SearchFilters.from_args(request.args)
 
     if not query:
         return redirect(url_for("index"))
 
-    # Загружаем данные (это также инициализирует систему семантического поиска)
-    data = load_data()
-
-    if search_type == "semantic":
-        # Используем семантический поиск
-        results = perform_integrated_search(query, search_type="semantic", top_k=20)
-    else:
-        # Используем синтаксический поиск
-        results = []
-        for entry in data:
-            # Фильтруем по теме, если выбрана конкретная тема
-            if selected_topic != "Все темы" and selected_topic:
-                if entry.get("topic", "Без темы") != selected_topic:
-                    continue
-
-            # Используем синтаксически-осознанный поиск в заголовке и содержании
-            search_in_title = syntax_aware_search(entry["title"], query)
-            search_in_content = syntax_aware_search(entry["content"], query)
-
-            if search_in_title or search_in_content:
-                results.append(entry)
+    def run_search():
+        if search_type == "semantic":
+            # Используем семантический поиск
+            entries = perform_integrated_search(query, search_type="semantic", top_k=SEMANTIC_TOP_K, filters=filters)
+        elif search_type == "combined":
+            # Синтаксический и семантический движки параллельно, выдача объединяется по рангам
+            return perform_combined_search(query, top_k=SEMANTIC_TOP_K, filters=filters)
+        else:
+            # Синтаксический поиск по инвертированному индексу заголовков и содержания
+            entries = syntax_index.search(query, filters=filters)
+        return {"entries": entries, "partial": False}
+
+    cache_key = (normalize_query(query), search_type, filters.key(), SEMANTIC_TOP_K, document_store.version)
+    found = search_result_cache.get(cache_key)
+    if found is None:
+        found = run_search()
+        # Частичный ответ (движок не уложился в бюджет времени) не кэшируется
+        if not found["partial"]:
+            search_result_cache.put(cache_key, found)
+    results, next_cursor = page_ranked(found["entries"], page_size(request.args.get("per_page")),
+                                       request.args.get("after"))
 
     # Получаем статистику по темам
     topic_stats = filter_manager.get_topic_statistics()
+    available_filters = advanced_filter_manager.get_available_filters()
 
     return render_template("index.html", entries=results, is_search=True, format_date=format_date, query=query,
                            topics=filter_manager.get_unique_topics(), selected_topic=selected_topic,
-                           search_query=query, topic_stats=topic_stats, search_type=search_type)
+                           search_query=query, topic_stats=topic_stats, search_type=search_type,
+                           partial_results=found["partial"],
+                           total_entries=len(found["entries"]), **page_links(next_cursor),
+                           available_classes=available_filters['classes'],
+                           available_parallels=available_filters['parallels'],
+                           available_subjects=available_filters['subjects'],
+                           selected_class=request.args.get("class", ""),
+                           selected_parallel=request.args.get("parallel", ""),
+                           selected_subject=request.args.get("subject", ""),
+                           date_from=request.args.get("date_from", ""),
+                           date_to=request.args.get("date_to", ""))
 
 
 def generate_title_from_content(content):
@@ -822,26 +784,9 @@ def generate_title_from_content(content):
 
 
 
-def find_entry_index_by_id(data, entry_id):
-    """Находит индекс записи по её ID"""
-    for i, entry in enumerate(data):
-        if entry.get("id") == entry_id:
-            return i
-    return None
-
-
-def find_entry_by_id(data, entry_id):
-    """Находит запись по её ID"""
-    for entry in data:
-        if entry.get("id") == entry_id:
-            return entry
-    return None
-
-
 @app.route("/view/id/<entry_id>")
 def view_entry_by_id(entry_id):
-    data = load_data()
-    entry = find_entry_by_id(data, entry_id)
+    entry = document_store.get_entry(entry_id)
     if not entry:
         return "Запись не найдена", 404
     return render_template("view.html", entry=entry, format_date=format_date)
@@ -851,8 +796,7 @@ def view_entry_by_id(entry_id):
 def edit_entry_by_id(entry_id):
     if "user" not in session:
         return redirect(url_for("login"))
-    data = load_data()
-    entry = find_entry_by_id(data, entry_id)
+    entry = document_store.get_entry(entry_id)
     if not entry:
         return "Запись не найдена", 404
 
@@ -877,7 +821,7 @@ def edit_entry_by_id(entry_id):
             return "Поля не могут быть пустыми", 400
 
         # Проверка на дубликаты (кроме текущей записи)
-        if any(e["title"] == new_title and e.get("id") != entry_id for e in data):
+        if document_store.title_exists(new_title, exclude_id=entry_id):
             return "Дубликат заголовка", 400
 
         # Сохраняем старые значения для аудита
@@ -886,11 +830,13 @@ def edit_entry_by_id(entry_id):
         old_content = entry["content"]
 
         # Обновляем запись
-        entry["title"] = new_title
-        entry["topic"] = new_topic
-        entry["content"] = new_content
-        entry["author"] = session["user"]["username"]  # Устанавливаем автора
-        entry["updated_at"] = datetime.now().isoformat()
+        changes = {
+            "title": new_title,
+            "topic": new_topic,
+            "content": new_content,
+            "author": session["user"]["username"],  # Устанавливаем автора
+            "updated_at": datetime.now().isoformat()
+        }
 
         # Обработка файла
         if file and allowed_file(file.filename):
@@ -899,10 +845,13 @@ def edit_entry_by_id(entry_id):
                 old_path = os.path.join(app.config["UPLOAD_FOLDER"], old_file)
                 if os.path.exists(old_path):
                     os.remove(old_path)
-            entry["file"] = secure_filename(file.filename)
-            file.save(os.path.join(app.config["UPLOAD_FOLDER"], entry["file"]))
+                remove_full_text(old_path)
+            changes["file"] = secure_filename(file.filename)
+            file_path = os.path.join(app.config["UPLOAD_FOLDER"], changes["file"])
+            file.save(file_path)
+            save_attachment_text(file_path)
 
-        save_data(data)
+        document_store.update_entry(entry_id, changes)
 
         # Запись в аудит
         log_action(
@@ -914,7 +863,6 @@ def edit_entry_by_id(entry_id):
             new_value=new_content[:100] + "..." if len(new_content) > 100 else new_content
         )
         
-        filter_manager.data = data
         return redirect(url_for("index"))
 
     return render_template("edit.html", entry=entry, entry_id=entry_id, topics=filter_manager.get_unique_topics())
@@ -925,12 +873,10 @@ def delete_entry_by_id(entry_id):
     if "user" not in session:
         return redirect(url_for("login"))
 
-    data = load_data()
-    entry_index = find_entry_index_by_id(data, entry_id)
-    if entry_index is None:
+    entry = document_store.get_entry(entry_id)
+    if entry is None:
         return "Запись не найдена", 404
 
-    entry = data[entry_index]
     if entry["author"] != session["user"]["username"] and session["user"]["role"] != "admin":
         return "Доступ запрещён", 403
         
@@ -946,8 +892,8 @@ def delete_entry_by_id(entry_id):
         old_path = os.path.join(app.config["UPLOAD_FOLDER"], old_file)
         if os.path.exists(old_path):
             os.remove(old_path)
-    del data[entry_index]
-    save_data(data)
+        remove_full_text(old_path)
+    document_store.delete_entry(entry_id)
     return redirect(url_for("index"))
 
 
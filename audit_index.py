@@ -0,0 +1,269 @@
+"""
+Индекс запросов к журналу аудита.
+
+Записи журнала нумеруются в порядке записи (строки). Для полей username, action_type,
+target и entry_id хранятся списки строк по значению, для текстового поиска по details,
+target и username — словарь слов со списками строк, а отметки времени разбираются
+один раз и хранятся упорядоченными. Запрос пересекает списки строк и выдает страницу
+от новых записей к старым по курсору, не просматривая весь журнал. Индекс подписан
+на хранилище сегментов и дополняется при каждой записи, в том числе записи другого
+процесса: дочитываются только выросшие сегменты.
+"""
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+from audit_segments import segment_month
+from facets import NO_TIMESTAMP, day_bounds, parse_timestamp
+from pagination import PAGE_SIZE, decode_cursor, encode_cursor
+
+INDEXED_FIELDS = ("username", "action_type", "target", "entry_id")
+
+# Поля, по которым выполняется текстовый поиск (поиск подстроки без учета регистра)
+TEXT_FIELDS = ("details", "target", "username")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Количество слов запроса, для которых хранится список содержащих их слов словаря
+EXPANSION_CACHE_SIZE = 1024
+
+
+def _field_text(log: dict, field: str) -> str:
+    value = log.get(field)
+    return str(value).lower() if value is not None else ""
+
+
+class AuditQueryIndex:
+    """
+    Индекс записей журнала аудита для страницы /audit
+
+    Текстовый запрос сначала сужается словарем слов: каждое слово запроса должно
+    входить в одно из слов записи. Затем у оставшихся записей проверяется вхождение
+    всего запроса как подстроки, поэтому результат совпадает с полным просмотром.
+
+    Слова словаря, содержащие слово запроса, ищутся просмотром словаря один раз и
+    запоминаются; новые слова журнала дополняют запомненные списки при добавлении.
+    """
+
+    def __init__(self, store):
+        """
+        Args:
+            store: хранилище сегментов журнала (AuditSegmentStore)
+        """
+        self.store = store
+        self._lock = threading.Lock()
+        self._stale = True
+        self._logs: List[dict] = []
+        self._times = array("q")
+        self._by_time = []
+        self._postings: Dict[str, Dict[str, List[int]]] = {}
+        self._tokens: Dict[str, List[int]] = {}
+        self._expansions: Dict[str, Set[str]] = {}
+        # Поколение и количество проиндексированных записей сегментов по месяцам
+        self._segments: Dict[str, Tuple[Optional[str], int]] = {}
+        store.subscribe(self.apply_change)
+
+    def apply_change(self, op, logs):
+        """
+        Слушатель хранилища: дописанные записи добавляются, после записи другим процессом
+        дочитываются выросшие сегменты, замена журнала перестраивает индекс
+        """
+        with self._lock:
+            if self._stale:
+                return
+            if op == "append":
+                self._add(logs)
+                added: Dict[str, int] = {}
+                for log in logs:
+                    month = segment_month(log)
+                    added[month] = added.get(month, 0) + 1
+                if any(month not in self._segments for month in added):
+                    # Новый месяц: поколение его сегмента известно только каталогу
+                    self._segments = self.store.segment_counts()
+                else:
+                    for month, count in added.items():
+                        generation, indexed = self._segments[month]
+                        self._segments[month] = (generation, indexed + count)
+            elif op == "reload":
+                self._catch_up()
+            else:
+                self._stale = True
+
+    def _catch_up(self):
+        """Добавляет записи, дописанные в сегменты другим процессом (под блокировкой хранилища)"""
+        segments = self.store.segment_counts()
+        for month, (generation, indexed) in self._segments.items():
+            current = segments.get(month)
+            if current is None or current[0] != generation or current[1] < indexed:
+                # Сегмент создан заново или записи пропали: журнал заменен
+                self._stale = True
+                return
+        for month in sorted(segments):
+            indexed = self._segments.get(month, (None, 0))[1]
+            if segments[month][1] > indexed:
+                self._add(list(self.store.iter_segment(month, indexed)))
+        self._segments = segments
+
+    def ensure_current(self):
+        """Строит индекс по журналу, если он еще не построен или журнал был заменен"""
+        # Порядок блокировок тот же, что у слушателя: сначала хранилище, затем индекс
+        with self.store.locked():
+            with self._lock:
+                if self._stale:
+                    self._build(self.store.iter_logs())
+                    self._segments = self.store.segment_counts()
+
+    def _build(self, logs):
+        self._logs = []
+        self._times = array("q")
+        self._by_time = []
+        self._postings = {field: {} for field in INDEXED_FIELDS}
+        self._tokens = {}
+        self._expansions = {}
+        self._add(logs)
+        self._stale = False
+
+    def _add(self, logs):
+        for log in logs:
+            row = len(self._logs)
+            self._logs.append(log)
+            timestamp = parse_timestamp(log.get("timestamp"))
+            self._times.append(timestamp)
+            # Ключ (время, -строка): при равном времени обратный обход дает записи в порядке записи
+            insort(self._by_time, (timestamp, -row))
+            for field in INDEXED_FIELDS:
+                value = log.get(field)
+                if value is not None:
+                    self._postings[field].setdefault(str(value), []).append(row)
+            tokens = set()
+            for field in TEXT_FIELDS:
+                tokens.update(_TOKEN_RE.findall(_field_text(log, field)))
+            for token in tokens:
+                token_rows = self._tokens.get(token)
+                if token_rows is None:
+                    token_rows = self._tokens[token] = []
+                    for word, expansion in self._expansions.items():
+                        if word in token:
+                            expansion.add(token)
+                token_rows.append(row)
+
+    def query(self, username: Optional[str] = None, action_type: Optional[str] = None,
+              target: Optional[str] = None, entry_id: Optional[str] = None, text: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None,
+              limit: int = PAGE_SIZE, after: Optional[str] = None) -> dict:
+        """
+        Страница записей журнала, новые сверху
+
+        Args:
+            username, action_type, target, entry_id: точное значение поля (пустое — без фильтра)
+            text: подстрока details, target или username без учета регистра
+            date_from: первый день диапазона (YYYY-MM-DD, включительно)
+            date_to: последний день диапазона (YYYY-MM-DD, включительно)
+            limit: размер страницы
+            after: курсор последней показанной записи
+
+        Returns:
+            {"logs": записи страницы, "next_cursor": курсор или None, "total": количество записей по фильтрам}
+        """
+        self.ensure_current()
+        with self._lock:
+            rows = self._filter_rows({"username": username, "action_type": action_type,
+                                      "target": target, "entry_id": entry_id}, text)
+            keys, low, high, rows = self._time_keys(rows, *day_bounds(date_from, date_to))
+            if rows is None:
+                total = high - low
+            else:
+                total = sum(1 for position in range(low, high) if -keys[position][1] in rows)
+
+            cursor = decode_cursor(after)
+            if cursor is not None:
+                timestamp, row = cursor
+                key = (timestamp, -int(row)) if row.isdigit() else (timestamp,)
+                high = min(high, bisect_left(keys, key))
+
+            page = []
+            position = high - 1
+            while position >= low and len(page) <= limit:
+                row = -keys[position][1]
+                if rows is None or row in rows:
+                    page.append(row)
+                position -= 1
+            next_cursor = None
+            if len(page) > limit:
+                page.pop()
+                next_cursor = encode_cursor(self._times[page[-1]], page[-1])
+            return {"logs": [self._logs[row] for row in page], "next_cursor": next_cursor, "total": total}
+
+    def _filter_rows(self, values: Dict[str, Optional[str]], text: Optional[str]) -> Optional[Set[int]]:
+        """Строки, удовлетворяющие фильтрам по полям и тексту (None — все строки)"""
+        postings = [self._postings[field].get(str(value), []) for field, value in values.items() if value]
+        postings.sort(key=len)
+        rows = set(postings[0]) if postings else None
+        for other in postings[1:]:
+            rows.intersection_update(other)
+            if not rows:
+                return rows
+        text = (text or "").strip().lower()
+        if not text:
+            return rows
+        candidates = self._text_candidates(text)
+        if candidates is None:
+            candidates = rows if rows is not None else set(range(len(self._logs)))
+        elif rows is not None:
+            candidates &= rows
+        return {row for row in candidates
+                if any(text in _field_text(self._logs[row], field) for field in TEXT_FIELDS)}
+
+    def _text_candidates(self, text: str) -> Optional[Set[int]]:
+        """Строки, где каждое слово запроса входит в какое-либо слово записи (None — запрос без слов)"""
+        rows = None
+        for word in set(_TOKEN_RE.findall(text)):
+            matched = set()
+            for token in self._expand(word):
+                matched.update(self._tokens[token])
+            rows = matched if rows is None else rows & matched
+            if not rows:
+                return rows
+        return rows
+
+    def _expand(self, word: str) -> Set[str]:
+        """Слова словаря, содержащие word (просмотр словаря только при первом запросе слова)"""
+        expansion = self._expansions.get(word)
+        if expansion is None:
+            expansion = {token for token in self._tokens if word in token}
+            if len(self._expansions) >= EXPANSION_CACHE_SIZE:
+                # Вытесняется самое старое слово
+                del self._expansions[next(iter(self._expansions))]
+            self._expansions[word] = expansion
+        return expansion
+
+    def _time_keys(self, rows: Optional[Set[int]], start: Optional[int], end: Optional[int]):
+        """Отсортированные ключи (время, -строка) и границы диапазона [start, end) в них (как в StoreFacetIndex)"""
+        if start is None:
+            # С фильтром по датам записи без разборчивого времени не показываются
+            start = NO_TIMESTAMP if end is None else NO_TIMESTAMP + 1
+        keys = self._by_time
+        low = bisect_left(keys, (start,))
+        high = len(keys) if end is None else bisect_left(keys, (end,))
+        if rows is not None and len(rows) * 8 < high - low:
+            # Немногие строки проще отсортировать, чем просматривать весь диапазон времени
+            keys = sorted((self._times[row], -row) for row in rows)
+            rows = None
+            low = bisect_left(keys, (start,))
+            high = len(keys) if end is None else bisect_left(keys, (end,))
+        return keys, low, high, rows
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_audit_query_index(store) -> AuditQueryIndex:
+    """Возвращает единственный индекс запросов для указанного хранилища сегментов"""
+    with _indexes_lock:
+        index = _indexes.get(id(store))
+        if index is None or index.store is not store:
+            index = _indexes[id(store)] = AuditQueryIndex(store)
+        return index
@@ -0,0 +1,195 @@
+"""
+Сводный отчет по журналу аудита, обновляемый при каждой записи.
+
+Счетчики действий по типам и пользователям, счетчики изменений записей базы знаний
+(для «самой активной записи») и последние действия хранятся в памяти и в файле
+report.json рядом с сегментами журнала. Отчет выдается без чтения журнала; полный
+пересчет по сегментам выполняется, только если файл отчета потерян или не совпадает
+с каталогом сегментов, а также по запросу для проверки.
+
+Каталог журнала может быть общим для нескольких процессов: отчет обновляется под
+межпроцессной блокировкой хранилища, а состояние в памяти сверяется с числом записей
+в каталоге и перечитывается из файла, если его дописал другой процесс.
+"""
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+REPORT_FILE = "report.json"
+
+# Действия, которые учитываются при выборе самой активной записи
+ENTRY_ACTION_TYPES = ("add", "edit", "delete")
+
+RECENT_ACTIONS = 10
+
+
+class _ReportState:
+    """Счетчики отчета и последние действия"""
+
+    def __init__(self):
+        self.count = 0
+        self.actions_by_type: Dict[str, int] = {}
+        self.actions_by_user: Dict[str, int] = {}
+        self.entries: Dict[str, int] = {}
+        self.entry_order: Dict[str, int] = {}
+        self.most_active_entry: Optional[str] = None
+        self.recent_actions = deque(maxlen=RECENT_ACTIONS)
+
+    def add(self, log: dict):
+        self.count += 1
+        action_type, username = log.get("action_type"), log.get("username")
+        self.actions_by_type[action_type] = self.actions_by_type.get(action_type, 0) + 1
+        self.actions_by_user[username] = self.actions_by_user.get(username, 0) + 1
+        if action_type in ENTRY_ACTION_TYPES:
+            self._count_entry(log.get("target"))
+        self.recent_actions.append(log)
+
+    def _count_entry(self, target):
+        count = self.entries.get(target, 0) + 1
+        self.entries[target] = count
+        self.entry_order.setdefault(target, len(self.entry_order))
+        # Счетчики только растут, поэтому лидер меняется, лишь когда его догоняет другая запись;
+        # при равенстве, как и max() по словарю, выигрывает запись, встретившаяся раньше
+        leader = self.most_active_entry
+        if leader is None or count > self.entries[leader] or \
+                (count == self.entries[leader] and self.entry_order[target] < self.entry_order[leader]):
+            self.most_active_entry = target
+
+    def report(self) -> dict:
+        return {
+            "total_actions": self.count,
+            "actions_by_type": dict(self.actions_by_type),
+            "actions_by_user": dict(self.actions_by_user),
+            "most_active_entry": self.most_active_entry,
+            "recent_actions": list(self.recent_actions),
+        }
+
+    def to_json(self) -> dict:
+        return {
+            "count": self.count,
+            "actions_by_type": self.actions_by_type,
+            "actions_by_user": self.actions_by_user,
+            "entries": self.entries,
+            "most_active_entry": self.most_active_entry,
+            "recent_actions": list(self.recent_actions),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "_ReportState":
+        state = cls()
+        state.count = int(data["count"])
+        state.actions_by_type = dict(data["actions_by_type"])
+        state.actions_by_user = dict(data["actions_by_user"])
+        state.entries = dict(data["entries"])
+        state.entry_order = {target: position for position, target in enumerate(state.entries)}
+        state.most_active_entry = data["most_active_entry"]
+        state.recent_actions.extend(data["recent_actions"])
+        return state
+
+
+class AuditReportAggregates:
+    """
+    Отчет по журналу аудита, подписанный на хранилище сегментов
+
+    Дописанные записи учитываются сразу (в потоке записи аудита), после чего
+    состояние сохраняется в report.json. Замена журнала удаляет файл отчета,
+    и следующий запрос пересчитывает его по сегментам. Слушатель вызывается под
+    блокировкой хранилища, поэтому чтение, дополнение и сохранение файла отчета
+    не пересекаются с записью другого процесса.
+    """
+
+    def __init__(self, store):
+        """
+        Args:
+            store: хранилище сегментов журнала (AuditSegmentStore)
+        """
+        self.store = store
+        self.path = os.path.join(store.directory, REPORT_FILE)
+        self._lock = threading.Lock()
+        self._state: Optional[_ReportState] = None
+        store.subscribe(self.apply_change)
+
+    def apply_change(self, op, logs):
+        """Слушатель хранилища: учитывает дописанные записи и сохраняет отчет"""
+        with self._lock:
+            if op != "append":
+                self._state = None
+                if op == "rewrite" and os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            # Каталог уже учитывает дописанные записи, файл отчета — еще нет
+            expected_count = self.store.count() - len(logs)
+            if self._state is None or self._state.count != expected_count:
+                # Отчет в памяти отстал от журнала, если записи дописал другой процесс
+                self._state = self._read(expected_count)
+                if self._state is None:
+                    self._state = self._rebuild_state()
+                    self._save()
+                    return
+            for log in logs:
+                self._state.add(log)
+            self._save()
+
+    def report(self) -> dict:
+        """Отчет: total_actions, actions_by_type, actions_by_user, most_active_entry, recent_actions"""
+        # Порядок блокировок тот же, что у слушателя: сначала хранилище, затем отчет
+        with self.store.locked():
+            with self._lock:
+                count = self.store.count()
+                if self._state is None or self._state.count != count:
+                    self._state = self._read(count)
+                    if self._state is None:
+                        self._state = self._rebuild_state()
+                        self._save()
+                return self._state.report()
+
+    def rebuild(self) -> dict:
+        """Пересчитывает отчет по всем сегментам журнала и сохраняет его"""
+        with self.store.locked():
+            with self._lock:
+                self._state = self._rebuild_state()
+                self._save()
+                return self._state.report()
+
+    def _rebuild_state(self) -> _ReportState:
+        state = _ReportState()
+        for log in self.store.iter_logs():
+            state.add(log)
+        return state
+
+    def _read(self, expected_count: int) -> Optional[_ReportState]:
+        """Состояние из файла отчета или None, если файла нет, он поврежден или отстал от журнала"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = _ReportState.from_json(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return state if state.count == expected_count else None
+
+    def _save(self):
+        os.makedirs(self.store.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".report_", suffix=".json", dir=self.store.directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._state.to_json(), f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+_reports = {}
+_reports_lock = threading.Lock()
+
+
+def get_audit_report(store) -> AuditReportAggregates:
+    """Возвращает единственный отчет для указанного хранилища сегментов"""
+    with _reports_lock:
+        report = _reports.get(id(store))
+        if report is None or report.store is not store:
+            report = _reports[id(store)] = AuditReportAggregates(store)
+        return report
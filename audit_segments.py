@@ -0,0 +1,507 @@
+"""
+Хранение журнала аудита помесячными сегментами.
+
+Каждый месяц хранится в отдельном файле audit-YYYY-MM.jsonl (одна запись JSON на строку).
+Сегмент последнего месяца дописывается без сжатия, а закрытые сегменты сжимаются
+gzip или lzma. Каталог catalog.json хранит для каждого сегмента диапазон времени,
+количество записей и счетчики по пользователям и типам действий: запросы с диапазоном
+дат открывают только пересекающиеся с ним сегменты, а общие счетчики не требуют
+чтения журнала.
+
+Каталог может быть общим для нескольких процессов (воркеров): изменения выполняются
+под блокировкой файла .lock, а каталог сегментов перечитывается, если его заменил
+другой процесс.
+"""
+import gzip
+import json
+import lzma
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: журнал защищен только от параллельных потоков одного процесса
+    fcntl = None
+
+# Сжатие закрытых сегментов: "gzip" или "lzma"
+AUDIT_COMPRESSION = os.environ.get("AUDIT_COMPRESSION", "gzip")
+
+CATALOG_FILE = "catalog.json"
+LOCK_FILE = ".lock"
+SEGMENT_PREFIX = "audit-"
+SEGMENT_SUFFIX = ".jsonl"
+COMPRESSORS = {"gzip": (".gz", gzip.open), "lzma": (".xz", lzma.open)}
+
+# Месяц записей без разборчивой отметки времени
+UNDATED_MONTH = "0000-00"
+
+
+def segment_month(log: dict) -> str:
+    """Месяц записи аудита (YYYY-MM) по ее отметке времени"""
+    timestamp = log.get("timestamp")
+    if isinstance(timestamp, str) and len(timestamp) >= 7 and timestamp[4] == "-":
+        return timestamp[:7]
+    return UNDATED_MONTH
+
+
+def _parse_segment_name(filename: str):
+    """(месяц, сжатие) по имени файла сегмента или None для посторонних файлов"""
+    if not filename.startswith(SEGMENT_PREFIX):
+        return None
+    rest = filename[len(SEGMENT_PREFIX):]
+    month, _, suffix = rest.partition(SEGMENT_SUFFIX)
+    if len(month) != 7:
+        return None
+    if not suffix:
+        return month, None
+    for compression, (extension, _) in COMPRESSORS.items():
+        if suffix == extension:
+            return month, compression
+    return None
+
+
+def _new_segment(month: str) -> dict:
+    # generation меняется, только когда сегмент создается заново (замена журнала, восстановление каталога)
+    return {"month": month, "file": SEGMENT_PREFIX + month + SEGMENT_SUFFIX, "compression": None,
+            "start": None, "end": None, "count": 0, "users": {}, "types": {}, "generation": uuid.uuid4().hex}
+
+
+def _count(segment: dict, logs: List[dict]):
+    """Учитывает записи в описании сегмента"""
+    for log in logs:
+        timestamp = log.get("timestamp")
+        if isinstance(timestamp, str):
+            if segment["start"] is None or timestamp < segment["start"]:
+                segment["start"] = timestamp
+            if segment["end"] is None or timestamp > segment["end"]:
+                segment["end"] = timestamp
+        username, action_type = str(log.get("username")), str(log.get("action_type"))
+        segment["users"][username] = segment["users"].get(username, 0) + 1
+        segment["types"][action_type] = segment["types"].get(action_type, 0) + 1
+    segment["count"] += len(logs)
+
+
+def _encode(logs: List[dict]) -> bytes:
+    return "".join(json.dumps(log, ensure_ascii=False) + "\n" for log in logs).encode("utf-8")
+
+
+def _decode_lines(lines) -> Iterator[dict]:
+    """Записи из строк сегмента; поврежденные и недописанные строки пропускаются"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            log = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            continue
+        if isinstance(log, dict):
+            yield log
+
+
+class AuditSegmentStore:
+    """
+    Журнал аудита в каталоге помесячных сегментов
+
+    Записи группируются по месяцу отметки времени. Когда появляется запись более
+    позднего месяца, все предыдущие несжатые сегменты сжимаются. Запись в уже
+    сжатый сегмент (импорт, перевод часов) дописывает в файл новый сжатый поток.
+
+    Каталог сегментов кэшируется в памяти вместе с признаком файла catalog.json
+    (inode, время изменения, размер). Если файл заменил другой процесс, каталог
+    перечитывается, а слушатели получают "reload".
+    """
+
+    def __init__(self, directory: str, compression: str = AUDIT_COMPRESSION):
+        """
+        Args:
+            directory: каталог сегментов и каталога catalog.json
+            compression: сжатие закрытых сегментов ("gzip" или "lzma")
+        """
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Неизвестный способ сжатия: {compression}")
+        self.directory = directory
+        self.compression = compression
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._catalog: Optional[Dict[str, dict]] = None
+        self._total = 0
+        self._signature = None
+        self._listeners = []
+
+    def subscribe(self, listener):
+        """
+        Подписка на изменения журнала
+
+        Слушатель вызывается под блокировкой хранилища с аргументами (op, logs):
+        op — "append" (logs — дописанные записи), "rewrite" или "reload" (logs — None).
+        "reload" означает, что каталог изменил другой процесс; что именно изменилось,
+        показывают поколения и счетчики сегментов (segment_counts).
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    @contextmanager
+    def locked(self):
+        """
+        Блокировка хранилища: пока она удерживается, журнал не меняется ни в этом, ни в других процессах
+
+        Изменения, сделанные другими процессами, учитываются при захвате (слушатели получают "reload").
+        """
+        with self._exclusive():
+            self._load_catalog()
+            yield
+
+    @contextmanager
+    def _exclusive(self):
+        """Блокировка потоков и процессов (повторный захват тем же потоком допускается)"""
+        with self._lock:
+            if self._lock_depth == 0:
+                os.makedirs(self.directory, exist_ok=True)
+                self._lock_file = open(os.path.join(self.directory, LOCK_FILE), "a")
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    # Закрытие файла снимает блокировку
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _notify(self, op, logs):
+        for listener in list(self._listeners):
+            listener(op, logs)
+
+    # --- Каталог ---
+
+    def catalog(self) -> List[dict]:
+        """Описания сегментов по возрастанию месяца"""
+        with self._exclusive():
+            catalog = self._load_catalog()
+            return [json.loads(json.dumps(catalog[month])) for month in sorted(catalog)]
+
+    def totals(self) -> dict:
+        """Общее количество записей и счетчики по пользователям и типам действий (из каталога)"""
+        totals = {"count": 0, "users": {}, "types": {}}
+        for segment in self.catalog():
+            totals["count"] += segment["count"]
+            for field in ("users", "types"):
+                for key, count in segment[field].items():
+                    totals[field][key] = totals[field].get(key, 0) + count
+        return totals
+
+    def count(self) -> int:
+        """Общее количество записей (из каталога, без его копирования и обхода)"""
+        with self._exclusive():
+            self._load_catalog()
+            return self._total
+
+    def segment_counts(self) -> Dict[str, Tuple[Optional[str], int]]:
+        """
+        Поколение и количество записей сегментов по месяцам (без копирования каталога)
+
+        Пока поколение сегмента не изменилось, в него только дописывались записи.
+        """
+        with self._exclusive():
+            return {month: (segment.get("generation"), segment["count"])
+                    for month, segment in self._load_catalog().items()}
+
+    def is_empty(self) -> bool:
+        """Нет ни одного сегмента"""
+        with self._exclusive():
+            return not self._load_catalog()
+
+    def rebuild_catalog(self) -> List[dict]:
+        """Пересчитывает каталог, читая все сегменты (если каталог потерян или поврежден)"""
+        with self._exclusive():
+            catalog = {}
+            if os.path.isdir(self.directory):
+                for filename in sorted(os.listdir(self.directory)):
+                    parsed = _parse_segment_name(filename)
+                    if parsed is None:
+                        continue
+                    month, compression = parsed
+                    segment = _new_segment(month)
+                    segment["file"], segment["compression"] = filename, compression
+                    with self._open_segment(segment) as f:
+                        _count(segment, list(self._read(f)))
+                    catalog[month] = segment
+            self._catalog = catalog
+            self._save_catalog()
+            return self.catalog()
+
+    def _catalog_signature(self):
+        try:
+            stat = os.stat(os.path.join(self.directory, CATALOG_FILE))
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load_catalog(self) -> Dict[str, dict]:
+        """Каталог из памяти или с диска, если его заменил другой процесс (под блокировкой хранилища)"""
+        signature = self._catalog_signature()
+        if self._catalog is not None and signature == self._signature:
+            return self._catalog
+        changed = self._catalog is not None
+        try:
+            with open(os.path.join(self.directory, CATALOG_FILE), "r", encoding="utf-8") as f:
+                catalog = {segment["month"]: segment for segment in json.load(f)}
+            valid = all(os.path.exists(os.path.join(self.directory, segment["file"])) for segment in catalog.values())
+        except (OSError, ValueError, KeyError, TypeError):
+            valid = False
+        if valid:
+            self._catalog = catalog
+            self._total = sum(segment["count"] for segment in catalog.values())
+            self._signature = signature
+        else:
+            self.rebuild_catalog()
+        if changed:
+            self._notify("reload", None)
+        return self._catalog
+
+    def _save_catalog(self):
+        os.makedirs(self.directory, exist_ok=True)
+        segments = [self._catalog[month] for month in sorted(self._catalog)]
+        self._total = sum(segment["count"] for segment in segments)
+        fd, tmp_path = tempfile.mkstemp(prefix=".catalog_", suffix=".json", dir=self.directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(segments, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, os.path.join(self.directory, CATALOG_FILE))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._signature = self._catalog_signature()
+
+    # --- Запись ---
+
+    def append(self, logs: List[dict], fsync: bool = False):
+        """
+        Дописывает записи в сегменты их месяцев
+
+        Args:
+            logs: записи аудита в порядке действий
+            fsync: сбросить файлы на диск
+        """
+        groups: Dict[str, List[dict]] = {}
+        for log in logs:
+            groups.setdefault(segment_month(log), []).append(log)
+        with self._exclusive():
+            # Каталог перечитывается, если его изменил другой процесс: счетчики не затираются
+            catalog = self._load_catalog()
+            for month, group in groups.items():
+                segment = catalog.setdefault(month, _new_segment(month))
+                self._append_segment(segment, _encode(group), fsync)
+                _count(segment, group)
+            self._close_segments()
+            self._save_catalog()
+            self._notify("append", logs)
+
+    def rewrite(self, logs: List[dict]):
+        """
+        Заменяет весь журнал списком записей
+
+        Новые сегменты пишутся во временные файлы и подменяют старые через os.replace;
+        старые файлы, которым нет замены, удаляются только после сохранения нового
+        каталога, поэтому сбой в середине замены не теряет журнал.
+        """
+        groups: Dict[str, List[dict]] = {}
+        for log in logs:
+            groups.setdefault(segment_month(log), []).append(log)
+        with self._exclusive():
+            old_files = {segment["file"] for segment in self._load_catalog().values()}
+            months = sorted(groups)
+            catalog = {}
+            for month in months:
+                segment = _new_segment(month)
+                if month != months[-1]:
+                    # Закрытые месяцы сразу пишутся сжатыми, чтобы имена совпали с итоговыми
+                    segment["file"] += COMPRESSORS[self.compression][0]
+                    segment["compression"] = self.compression
+                self._write_new_segment(segment, _encode(groups[month]))
+                _count(segment, groups[month])
+                catalog[month] = segment
+            for segment in catalog.values():
+                os.replace(self._path(segment, ".new-"), self._path(segment))
+            self._catalog = catalog
+            self._save_catalog()
+            for filename in old_files - {segment["file"] for segment in catalog.values()}:
+                path = os.path.join(self.directory, filename)
+                if os.path.exists(path):
+                    os.remove(path)
+            self._notify("rewrite", None)
+
+    def restore(self, source_directory: str):
+        """
+        Заменяет журнал файлами другого каталога (восстановление резервной копии)
+
+        Файлы копируются во временные .new-<файл> и подменяют прежние через os.replace,
+        catalog.json — последним; прежние файлы, которым нет замены, затем удаляются.
+        Все это выполняется под блокировкой хранилища, а файл .lock остается на месте,
+        поэтому другие процессы не пишут в журнал во время замены. Слушатели получают "rewrite".
+
+        Args:
+            source_directory: каталог с сегментами и catalog.json
+        """
+        names = sorted((name for name in os.listdir(source_directory)
+                        if not name.startswith(".") and os.path.isfile(os.path.join(source_directory, name))),
+                       key=lambda name: (name == CATALOG_FILE, name))
+        with self._exclusive():
+            old_files = {name for name in os.listdir(self.directory)
+                         if not name.startswith(".") and os.path.isfile(os.path.join(self.directory, name))}
+            for name in names:
+                shutil.copyfile(os.path.join(source_directory, name), os.path.join(self.directory, ".new-" + name))
+            for name in names:
+                os.replace(os.path.join(self.directory, ".new-" + name), os.path.join(self.directory, name))
+            for name in old_files - set(names):
+                os.remove(os.path.join(self.directory, name))
+            self._catalog = None
+            # Сегменты копии считаются созданными заново: записи после копии не продолжают прежние
+            for segment in self._load_catalog().values():
+                segment["generation"] = uuid.uuid4().hex
+            self._save_catalog()
+            self._notify("rewrite", None)
+
+    def _write_new_segment(self, segment: dict, data: bytes):
+        """Записывает сегмент во временный файл .new-<файл> и сбрасывает его на диск"""
+        with open(self._path(segment, ".new-"), "wb") as raw:
+            if segment["compression"] is None:
+                raw.write(data)
+            else:
+                with COMPRESSORS[segment["compression"]][1](raw, "wb") as f:
+                    f.write(data)
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    def _append_segment(self, segment: dict, data: bytes, fsync: bool):
+        with open(self._path(segment), "ab+") as raw:
+            if segment["compression"] is None:
+                # Если предыдущая запись оборвалась на середине, начинаем с новой строки
+                raw.seek(0, os.SEEK_END)
+                if raw.tell() > 0:
+                    raw.seek(-1, os.SEEK_END)
+                    if raw.read(1) != b"\n":
+                        data = b"\n" + data
+                raw.write(data)
+            else:
+                with COMPRESSORS[segment["compression"]][1](raw, "ab") as f:
+                    f.write(data)
+            raw.flush()
+            if fsync:
+                os.fsync(raw.fileno())
+
+    def _close_segments(self):
+        """Сжимает несжатые сегменты всех месяцев, кроме последнего"""
+        months = sorted(self._catalog)
+        for month in months[:-1]:
+            segment = self._catalog[month]
+            if segment["compression"] is None:
+                self._compress(segment)
+
+    def _compress(self, segment: dict):
+        extension, compressor = COMPRESSORS[self.compression]
+        plain_path = self._path(segment)
+        compressed_file = segment["file"] + extension
+        fd, tmp_path = tempfile.mkstemp(prefix=".segment_", suffix=extension, dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as raw, open(plain_path, "rb") as source:
+                with compressor(raw, "wb") as f:
+                    for chunk in iter(lambda: source.read(1 << 20), b""):
+                        f.write(chunk)
+            os.replace(tmp_path, os.path.join(self.directory, compressed_file))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        os.remove(plain_path)
+        segment["file"], segment["compression"] = compressed_file, self.compression
+
+    # --- Чтение ---
+
+    def iter_logs(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Iterator[dict]:
+        """
+        Записи в порядке месяцев и порядке записи внутри месяца
+
+        Args:
+            date_from: первый день диапазона (YYYY-MM-DD, включительно)
+            date_to: последний день диапазона (YYYY-MM-DD, включительно)
+        """
+        with self._exclusive():
+            segments = [segment for _, segment in sorted(self._load_catalog().items())
+                        if self._overlaps(segment, date_from, date_to)]
+            # Файлы открываются под блокировкой: сжатие сегмента после этого не мешает чтению
+            files = [self._open_segment(segment) for segment in segments]
+        bounded = date_from is not None or date_to is not None
+        for f in files:
+            with f:
+                for log in self._read(f):
+                    if bounded:
+                        day = str(log.get("timestamp", ""))[:10]
+                        if (date_from is not None and day < date_from) or (date_to is not None and day > date_to):
+                            continue
+                    yield log
+
+    def iter_segment(self, month: str, skip: int = 0) -> Iterator[dict]:
+        """
+        Записи сегмента месяца, начиная с номера skip
+
+        Позволяет дочитать записи, дописанные другим процессом, не читая остальной журнал.
+        """
+        with self._exclusive():
+            segment = self._load_catalog().get(month)
+            if segment is None:
+                return
+            f = self._open_segment(segment)
+        with f:
+            yield from islice(self._read(f), skip, None)
+
+    @staticmethod
+    def _overlaps(segment: dict, date_from: Optional[str], date_to: Optional[str]) -> bool:
+        if date_from is None and date_to is None:
+            return True
+        if segment["start"] is None:
+            return False
+        if date_from is not None and segment["end"][:10] < date_from:
+            return False
+        return date_to is None or segment["start"][:10] <= date_to
+
+    def _open_segment(self, segment: dict):
+        if segment["compression"] is None:
+            return open(self._path(segment), "rb")
+        return COMPRESSORS[segment["compression"]][1](self._path(segment), "rb")
+
+    @staticmethod
+    def _read(f) -> Iterator[dict]:
+        try:
+            yield from _decode_lines(f)
+        except (EOFError, OSError, lzma.LZMAError):
+            # Сжатый поток оборвался при сбое: прочитанные до обрыва записи остаются
+            return
+
+    def _path(self, segment: dict, prefix: str = "") -> str:
+        return os.path.join(self.directory, prefix + segment["file"])
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_audit_store(directory: str) -> AuditSegmentStore:
+    """Общее хранилище сегментов для каталога"""
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = AuditSegmentStore(directory)
+        return _stores[key]
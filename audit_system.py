@@ -1,23 +1,244 @@
 
+import atexit
 import json
+import logging
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 
-# Путь к файлу аудита
-AUDIT_LOG_FILE = "audit_logs.json"
+from audit_index import get_audit_query_index
+from audit_report import get_audit_report
+from audit_segments import get_audit_store
+
+# Каталог журнала аудита: помесячные сегменты (закрытые месяцы сжаты) и каталог сегментов
+AUDIT_LOG_DIR = "audit_logs"
+
+# Прежние форматы, переносимые в AUDIT_LOG_DIR один раз: массив JSON и один файл JSON Lines
+LEGACY_AUDIT_LOG_FILE = "audit_logs.json"
+JSONL_AUDIT_LOG_FILE = "audit_logs.jsonl"
+
+# Сбрасывать ли каждую запись аудита на диск (медленнее, но запись переживает сбой питания)
+AUDIT_FSYNC = os.environ.get("AUDIT_FSYNC", "0") == "1"
+
+# Режим записи: "async" — фоновая запись пакетами, "sync" — каждое действие записывается до ответа
+AUDIT_DURABILITY = os.environ.get("AUDIT_DURABILITY", "async")
+
+# Действия, важные для безопасности: в любом режиме записываются до ответа и сбрасываются на диск
+SYNC_ACTION_TYPES = frozenset(filter(None, os.environ.get(
+    "AUDIT_SYNC_ACTIONS", "delete,backup_restore,selective_restore,add_user,update_user_role,delete_user"
+).split(",")))
+
+# Размер пакета, интервал записи (секунды) и емкость очереди фоновой записи
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 0.2
+AUDIT_QUEUE_SIZE = 10000
+
+logger = logging.getLogger(__name__)
 
 
 def init_audit_system():
     """
     Инициализация системы аудита.
-    Создает файл аудита, если он не существует.
+    Переносит журнал из прежнего формата, если сегментов еще нет,
+    и подключает сводный отчет к журналу, чтобы он обновлялся при каждой записи.
     """
-    if not os.path.exists(AUDIT_LOG_FILE):
-        with open(AUDIT_LOG_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f, ensure_ascii=False, indent=4)
+    if not os.path.isdir(AUDIT_LOG_DIR) and _audit_store().is_empty():
+        for legacy_file in (JSONL_AUDIT_LOG_FILE, LEGACY_AUDIT_LOG_FILE):
+            if os.path.exists(legacy_file):
+                convert_legacy_audit_log(legacy_file)
+                break
+    get_audit_report(_audit_store())
     return True
 
 
+def _audit_store():
+    """Хранилище сегментов текущего каталога аудита"""
+    return get_audit_store(AUDIT_LOG_DIR)
+
+
+def convert_legacy_audit_log(legacy_file=None):
+    """
+    Однократный перенос журнала из одного файла (массив JSON или JSON Lines) в сегменты.
+
+    Прежний файл не удаляется. Поврежденный массив дает пустой журнал,
+    поврежденные строки JSON Lines пропускаются.
+
+    :param legacy_file: Файл в прежнем формате (по умолчанию LEGACY_AUDIT_LOG_FILE)
+    :return: Количество перенесенных записей
+    """
+    legacy_file = legacy_file or LEGACY_AUDIT_LOG_FILE
+    try:
+        with open(legacy_file, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        text = ""
+    if text.lstrip().startswith("["):
+        try:
+            logs = json.loads(text)
+        except json.JSONDecodeError:
+            logs = []
+    else:
+        logs = []
+        for line in text.splitlines():
+            try:
+                logs.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    logs = [log for log in logs if isinstance(log, dict)] if isinstance(logs, list) else []
+    _write_audit_logs(logs)
+    return len(logs)
+
+
+def _write_audit_logs(logs):
+    """Заменяет журнал аудита списком записей"""
+    # Действия из очереди должны попасть в журнал до его замены
+    audit_writer.flush()
+    _audit_store().rewrite(logs)
+
+
+def _append_audit_records(log_entries, fsync=False):
+    """Дописывает записи в сегменты их месяцев"""
+    _audit_store().append(log_entries, fsync=fsync or AUDIT_FSYNC)
+
+
+class AuditWriter:
+    """
+    Фоновая запись аудита.
+
+    Действия попадают в ограниченную очередь, а поток записи дописывает их в файл
+    пакетами: по AUDIT_BATCH_SIZE записей или раз в AUDIT_FLUSH_INTERVAL секунд.
+    При заполненной очереди log_action ждет освобождения места, поэтому записи
+    не теряются. Синхронная запись проходит через ту же очередь и ждет записи
+    своего пакета, так что порядок строк в журнале сохраняется.
+    """
+
+    def __init__(self, batch_size=AUDIT_BATCH_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL, max_queue=AUDIT_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        # Блокировка состояния потока (не захватывается потоком записи) и блокировка счетчиков
+        self._state_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._stats = {
+            "written": 0,
+            "batches": 0,
+            "sync_writes": 0,
+            "backpressure_waits": 0,
+            "errors": 0,
+            "max_queue_depth": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def submit(self, log_entry, sync=False):
+        """
+        Ставит запись в очередь.
+
+        :param log_entry: Запись аудита (None — только дождаться записи предыдущих)
+        :param sync: Дождаться записи на диск (с fsync)
+        """
+        done = threading.Event() if sync else None
+        with self._state_lock:
+            if self._closed:
+                # После остановки потока записи (завершение процесса) пишем сразу
+                if log_entry is not None:
+                    self._write([(log_entry, done)])
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+            try:
+                self._queue.put_nowait((log_entry, done))
+            except queue.Full:
+                with self._stats_lock:
+                    self._stats["backpressure_waits"] += 1
+                self._queue.put((log_entry, done))
+            depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+        if done is not None:
+            done.wait()
+
+    def flush(self):
+        """Дожидается записи всех действий, поставленных в очередь до вызова"""
+        if self._thread is not None:
+            self.submit(None, sync=True)
+
+    def close(self):
+        """Записывает оставшиеся действия и останавливает поток записи"""
+        with self._state_lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        """Счетчики записи: глубина очереди, число пакетов и время их записи"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                batch.append(item)
+                # Синхронная запись не ждет заполнения пакета
+                if len(batch) >= self.batch_size or item[1] is not None:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            if item is None:
+                return
+
+    def _write(self, batch):
+        log_entries = [log_entry for log_entry, _ in batch if log_entry is not None]
+        sync = any(done is not None for _, done in batch)
+        started = time.perf_counter()
+        try:
+            if log_entries:
+                _append_audit_records(log_entries, fsync=sync)
+        except Exception:
+            logger.exception("Не удалось записать %d действий в журнал аудита", len(log_entries))
+            with self._stats_lock:
+                self._stats["errors"] += 1
+        else:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                self._stats["sync_writes"] += sum(1 for log_entry, done in batch
+                                                  if done is not None and log_entry is not None)
+                if log_entries:
+                    self._stats["written"] += len(log_entries)
+                    self._stats["batches"] += 1
+                    self._stats["last_flush_ms"] = elapsed
+                    self._stats["max_flush_ms"] = max(self._stats["max_flush_ms"], elapsed)
+                    self._stats["total_flush_ms"] += elapsed
+        finally:
+            for _, done in batch:
+                if done is not None:
+                    done.set()
+
+
+audit_writer = AuditWriter()
+atexit.register(audit_writer.close)
+
+
 def log_action(username, action_type, target, details=None, old_value=None, new_value=None, entry_id=None):
     """
     Записывает действие в систему аудита.
@@ -44,32 +265,88 @@ def log_action(username, action_type, target, details=None, old_value=None, new_
         log_entry["old_value"] = old_value
         log_entry["new_value"] = new_value
 
-    # Загружаем существующие логи
-    logs = load_audit_logs()
+    # Запись дописывается в конец файла фоновым потоком; важные для безопасности действия — до ответа
+    sync = AUDIT_DURABILITY == "sync" or action_type in SYNC_ACTION_TYPES
+    audit_writer.submit(log_entry, sync=sync)
 
-    # Добавляем новую запись
-    logs.append(log_entry)
 
-    # Сохраняем обновленные логи
-    with open(AUDIT_LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(logs, f, ensure_ascii=False, indent=4)
+def iter_audit_logs(date_from=None, date_to=None, flush=False):
+    """
+    Построчно читает логи аудита (по месяцам, внутри месяца — в порядке записи).
+
+    Поврежденные и недописанные строки пропускаются. При указании диапазона дат
+    читаются только сегменты месяцев, пересекающихся с ним. Действия, которые фоновый
+    поток еще не записал (не дольше AUDIT_FLUSH_INTERVAL), видны только при flush.
 
+    :param date_from: Первый день диапазона (YYYY-MM-DD, включительно)
+    :param date_to: Последний день диапазона (YYYY-MM-DD, включительно)
+    :param flush: Дождаться записи действий из очереди (когда нужны только что записанные)
+    :return: Генератор записей аудита
+    """
+    if flush:
+        audit_writer.flush()
+    yield from _audit_store().iter_logs(_valid_day(date_from), _valid_day(date_to))
+
+
+def _valid_day(value):
+    """Дата YYYY-MM-DD или None для пустого и неразборчивого значения"""
+    if not value:
+        return None
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+    return value
+
+
+def restore_audit_logs(source_dir):
+    """
+    Заменяет журнал аудита сегментами из каталога резервной копии (под блокировкой хранилища)
+
+    :param source_dir: Каталог с сегментами и catalog.json
+    """
+    audit_writer.flush()
+    _audit_store().restore(source_dir)
+
+
+def query_audit_logs(username=None, action_type=None, text=None, date_from=None, date_to=None,
+                     target=None, entry_id=None, limit=50, after=None):
+    """
+    Страница записей аудита по индексу (новые сначала).
+
+    :param username: Имя пользователя
+    :param action_type: Тип действия
+    :param text: Подстрока в деталях, цели или имени пользователя (без учета регистра)
+    :param date_from: Первый день диапазона (YYYY-MM-DD, включительно)
+    :param date_to: Последний день диапазона (YYYY-MM-DD, включительно)
+    :param target: Цель действия
+    :param entry_id: ID записи
+    :param limit: Размер страницы
+    :param after: Курсор последней показанной записи
+    :return: Словарь {"logs": записи страницы, "next_cursor": курсор следующей страницы, "total": всего записей}
+    """
+    return get_audit_query_index(_audit_store()).query(
+        username=username, action_type=action_type, target=target, entry_id=entry_id, text=text,
+        date_from=date_from, date_to=date_to, limit=limit, after=after)
+
+
+def get_audit_catalog():
+    """
+    Каталог сегментов журнала аудита.
 
-def load_audit_logs():
+    :return: Список описаний сегментов (месяц, файл, сжатие, диапазон времени, счетчики)
+    """
+    return _audit_store().catalog()
+
+
+def load_audit_logs(flush=False):
     """
     Загружает логи аудита из файла.
 
+    :param flush: Дождаться записи действий из очереди
     :return: Список записей аудита
     """
-    if os.path.exists(AUDIT_LOG_FILE):
-        try:
-            with open(AUDIT_LOG_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            # Если файл поврежден, создаем новый
-            init_audit_system()
-            return []
-    return []
+    return list(iter_audit_logs(flush=flush))
 
 
 def get_user_actions(username, limit=None):
@@ -80,8 +357,7 @@ def get_user_actions(username, limit=None):
     :param limit: Ограничение количества записей
     :return: Список действий пользователя
     """
-    logs = load_audit_logs()
-    user_logs = [log for log in logs if log["username"] == username]
+    user_logs = [log for log in iter_audit_logs() if log["username"] == username]
 
     # Сортируем по времени (новые сначала)
     user_logs.sort(key=lambda x: x["timestamp"], reverse=True)
@@ -112,8 +388,7 @@ def get_actions_by_type(action_type, limit=None):
     :param limit: Ограничение количества записей
     :return: Список действий указанного типа
     """
-    logs = load_audit_logs()
-    filtered_logs = [log for log in logs if log["action_type"] == action_type]
+    filtered_logs = [log for log in iter_audit_logs() if log["action_type"] == action_type]
 
     # Сортируем по времени (новые сначала)
     filtered_logs.sort(key=lambda x: x["timestamp"], reverse=True)
@@ -190,8 +465,7 @@ def clear_audit_logs():
 
     :return: True, если успешно
     """
-    with open(AUDIT_LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump([], f, ensure_ascii=False, indent=4)
+    _write_audit_logs([])
     return True
 
 
@@ -202,7 +476,7 @@ def export_audit_logs(filename):
     :param filename: Имя файла для экспорта
     :return: True, если успешно
     """
-    logs = load_audit_logs()
+    logs = load_audit_logs(flush=True)
     with open(filename, "w", encoding="utf-8") as f:
         json.dump(logs, f, ensure_ascii=False, indent=4)
     return True
@@ -227,8 +501,7 @@ def import_audit_logs(filename):
             return False
 
         # Сохраняем импортированные логи
-        with open(AUDIT_LOG_FILE, "w", encoding="utf-8") as f:
-            json.dump(logs, f, ensure_ascii=False, indent=4)
+        _write_audit_logs(logs)
 
         return True
     except:
@@ -242,8 +515,7 @@ def get_changes_for_entry(entry_title):
     :param entry_title: Название записи
     :return: Список изменений
     """
-    logs = load_audit_logs()
-    entry_logs = [log for log in logs if log["target"] == entry_title]
+    entry_logs = [log for log in iter_audit_logs() if log["target"] == entry_title]
 
     # Сортируем по времени (новые сначала)
     entry_logs.sort(key=lambda x: x["timestamp"], reverse=True)
@@ -255,38 +527,19 @@ def generate_audit_report():
     """
     Генерирует отчет по аудиту.
 
+    Счетчики обновляются при каждой записи и хранятся рядом с журналом,
+    поэтому отчет выдается без чтения журнала и без ожидания фоновой записи.
+
     :return: Словарь с данными отчета
     """
-    logs = load_audit_logs()
+    return get_audit_report(_audit_store()).report()
+
 
-    # Подсчитываем общее количество действий
-    total_actions = len(logs)
-
-    # Подсчитываем действия по типам
-    actions_by_type = {}
-    for log in logs:
-        action_type = log["action_type"]
-        actions_by_type[action_type] = actions_by_type.get(action_type, 0) + 1
-
-    # Подсчитываем действия по пользователям
-    actions_by_user = {}
-    for log in logs:
-        username = log["username"]
-        actions_by_user[username] = actions_by_user.get(username, 0) + 1
-
-    # Находим самую активную запись
-    entries_by_count = {}
-    for log in logs:
-        if log["action_type"] in ["add", "edit", "delete"]:
-            target = log["target"]
-            entries_by_count[target] = entries_by_count.get(target, 0) + 1
-
-    most_active_entry = max(entries_by_count, key=entries_by_count.get) if entries_by_count else None
-
-    return {
-        "total_actions": total_actions,
-        "actions_by_type": actions_by_type,
-        "actions_by_user": actions_by_user,
-        "most_active_entry": most_active_entry,
-        "recent_actions": logs[-10:] if len(logs) > 10 else logs
-    }
\ No newline at end of file
+def rebuild_audit_report():
+    """
+    Пересчитывает отчет по аудиту по всему журналу (для проверки сохраненных счетчиков).
+
+    :return: Словарь с данными отчета
+    """
+    audit_writer.flush()
+    return get_audit_report(_audit_store()).rebuild()
@@ -5,12 +5,22 @@ from datetime import datetime, timedelta
 import zipfile
 from pathlib import Path
 
+import audit_system
+from document_store import get_document_store
+from storage import JournaledJsonStorage, journal_path_for
+
 
 class BackupSystem:
-    def __init__(self, data_file="knowledge_base.json", backup_dir="backups"):
+    def __init__(self, data_file="knowledge_base.json", backup_dir="backups", store=None):
         self.data_file = data_file
         self.backup_dir = Path(backup_dir)
         self.backup_dir.mkdir(exist_ok=True)
+        self._store = store
+
+    @property
+    def store(self):
+        """Document store whose active storage backend (JSON, journal or SQLite) is backed up"""
+        return self._store or get_document_store(self.data_file)
         
     def create_backup(self):
         """Create a backup of the entire database with timestamp"""
@@ -20,14 +30,17 @@ class BackupSystem:
         
         # Create a zip archive containing the data file and other important files
         with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Add the main data file
-            if os.path.exists(self.data_file):
-                zipf.write(self.data_file, os.path.basename(self.data_file))
+            # Add a consistent JSON export of the knowledge base, whatever backend stores it
+            entries = list(self.store.snapshot().entries)
+            zipf.writestr(os.path.basename(self.data_file), json.dumps(entries, ensure_ascii=False, indent=4))
             
-            # Add audit logs
-            audit_file = "audit_logs.json"
-            if os.path.exists(audit_file):
-                zipf.write(audit_file, os.path.basename(audit_file))
+            # Add audit log segments and their catalog
+            audit_system.audit_writer.flush()
+            audit_dir = Path(audit_system.AUDIT_LOG_DIR)
+            if audit_dir.is_dir():
+                for audit_file in sorted(audit_dir.iterdir()):
+                    if audit_file.is_file() and not audit_file.name.startswith("."):
+                        zipf.write(audit_file, f"{audit_dir.name}/{audit_file.name}")
                 
             # Add users file
             users_file = "users.json"
@@ -67,14 +80,49 @@ class BackupSystem:
             with zipfile.ZipFile(backup_path, 'r') as zipf:
                 # Extract to temporary location first
                 temp_extract_dir = self.backup_dir / "temp_restore"
-                temp_extract_dir.mkdir(exist_ok=True)
+                if temp_extract_dir.exists():
+                    # Leftovers of an interrupted restore must not be mixed into this one
+                    shutil.rmtree(temp_extract_dir)
+                temp_extract_dir.mkdir()
                 
                 zipf.extractall(temp_extract_dir)
+
+                # The knowledge base is loaded back through the active storage backend;
+                # older backups may also carry a change journal to replay over the data file
+                data_name = os.path.basename(self.data_file)
+                journal_name = os.path.basename(journal_path_for(self.data_file))
+                if data_name in zipf.namelist():
+                    entries = JournaledJsonStorage(str(temp_extract_dir / data_name),
+                                                   str(temp_extract_dir / journal_name)).load_all()
+                    if entries is None:
+                        raise ValueError(f"{data_name} in {backup_filename} is corrupted")
+                    self.store.replace_all(entries)
                 
-                # Copy files back to original location
+                # Copy the remaining files back to original location
+                audit_dir = Path(audit_system.AUDIT_LOG_DIR)
                 for extracted_file in temp_extract_dir.glob("*"):
                     destination = Path(extracted_file.name)
-                    shutil.copy2(extracted_file, destination)
+                    if extracted_file.name in (data_name, journal_name):
+                        continue
+                    if extracted_file.is_dir():
+                        # The audit log is swapped under its store lock, so other workers
+                        # neither write into it mid-restore nor lose the lock file
+                        if destination.name == audit_dir.name:
+                            audit_system.restore_audit_logs(str(extracted_file))
+                            continue
+                        if destination.exists():
+                            shutil.rmtree(destination)
+                        shutil.copytree(extracted_file, destination)
+                    else:
+                        shutil.copy2(extracted_file, destination)
+
+                # Backups made before the segmented audit log contain a single audit file
+                names = zipf.namelist()
+                if not any(name.startswith(audit_dir.name + "/") for name in names):
+                    for legacy_file in (audit_system.JSONL_AUDIT_LOG_FILE, audit_system.LEGACY_AUDIT_LOG_FILE):
+                        if legacy_file in names:
+                            audit_system.convert_legacy_audit_log(legacy_file)
+                            break
                     
                 # Clean up temporary directory
                 shutil.rmtree(temp_extract_dir)
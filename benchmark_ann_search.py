@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк приближенного поиска (IVF) против точного: recall@k и время ответа
+для разных значений n_probe на синтетических эмбеддингах.
+
+Запуск: python benchmark_ann_search.py [количество_документов] [размерность]
+"""
+import sys
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex, normalize_rows
+
+
+def make_embeddings(count, dimension, clusters=200, seed=0):
+    """Синтетические эмбеддинги: смесь нормальных распределений вокруг случайных центров"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(count, dimension)).astype(np.float32)
+    return normalize_rows(vectors)
+
+
+def exact_search(embeddings, query, top_k):
+    """Точный поиск так, как его выполняет AdvancedSemanticSearchEngine: полное сходство и argsort"""
+    similarities = embeddings @ normalize_rows(query)[0]
+    return similarities.argsort()[-top_k:][::-1]
+
+
+def run_benchmark(count=100000, dimension=384, top_k=10, queries=200):
+    embeddings = make_embeddings(count, dimension)
+    rng = np.random.default_rng(1)
+    query_vectors = embeddings[rng.choice(count, queries, replace=False)] + \
+        0.3 * rng.normal(size=(queries, dimension)).astype(np.float32)
+
+    started = time.perf_counter()
+    index = IVFIndex().build(embeddings)
+    print(f"Документов: {count}, размерность: {dimension}, кластеров: {len(index.centroids)}, "
+          f"построение: {time.perf_counter() - started:.1f} с")
+
+    started = time.perf_counter()
+    truth = [set(exact_search(embeddings, query, top_k).tolist()) for query in query_vectors]
+    exact_ms = (time.perf_counter() - started) * 1000 / queries
+    print(f"{'Поиск':<16}{'recall@' + str(top_k):>12}{'мс/запрос':>12}")
+    print(f"{'точный':<16}{1.0:>12.3f}{exact_ms:>12.2f}")
+
+    for n_probe in (1, 2, 4, 8, 16, 32, 64):
+        if n_probe > len(index.centroids):
+            break
+        started = time.perf_counter()
+        found = [index.search(query, top_k, n_probe=n_probe) for query in query_vectors]
+        elapsed_ms = (time.perf_counter() - started) * 1000 / queries
+        recall = np.mean([len(expected & {idx for idx, _ in result}) / top_k
+                          for expected, result in zip(truth, found)])
+        print(f"{'IVF n_probe=' + str(n_probe):<16}{recall:>12.3f}{elapsed_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+                  int(sys.argv[2]) if len(sys.argv) > 2 else 384)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк оценки документов TF-IDF: cosine_similarity + полный argsort
+против общего ядра (столбцы терминов запроса + argpartition), а также
+пакетный поиск (batch_semantic_search) против запросов по одному.
+
+Запуск: python benchmark_sparse_scoring.py [размеры через запятую]
+"""
+import sys
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from sparse_scoring import search_top_k, to_scoring_matrix
+
+VOCABULARY = 50000
+TERMS_PER_DOCUMENT = 40
+
+
+def make_matrix(count, seed=0):
+    """Синтетическая нормированная матрица TF-IDF с распределением слов по закону Ципфа"""
+    rng = np.random.default_rng(seed)
+    columns = (rng.zipf(1.2, size=count * TERMS_PER_DOCUMENT) - 1) % VOCABULARY
+    rows = np.repeat(np.arange(count), TERMS_PER_DOCUMENT)
+    values = rng.random(count * TERMS_PER_DOCUMENT).astype(np.float32) + 0.1
+    matrix = csr_matrix((values, (rows, columns)), shape=(count, VOCABULARY), dtype=np.float32)
+    matrix.sum_duplicates()
+    return normalize(matrix)
+
+
+def make_queries(count, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(count):
+        # Запрос из 3 слов: одно частое и два более редких
+        columns = np.unique(np.concatenate(([rng.integers(0, 50)], rng.integers(50, 5000, size=2))))
+        queries.append(normalize(csr_matrix((np.ones(len(columns)), (np.zeros(len(columns)), columns)),
+                                            shape=(1, VOCABULARY))))
+    return queries
+
+
+def legacy_search(query_vector, matrix, top_k):
+    similarities = cosine_similarity(query_vector, matrix).flatten()
+    top_indices = similarities.argsort()[-top_k:][::-1]
+    return [(idx, similarities[idx]) for idx in top_indices if similarities[idx] > 0]
+
+
+def measure(function, queries):
+    started = time.perf_counter()
+    for query in queries:
+        function(query)
+    return (time.perf_counter() - started) * 1000 / len(queries)
+
+
+def run_benchmark(sizes=(10000, 100000, 1000000), top_k=10, queries=20):
+    query_vectors = make_queries(queries)
+    print(f"{'Документов':>12}{'cosine+argsort':>18}{'ядро':>12}{'ускорение':>12}")
+    for size in sizes:
+        matrix = make_matrix(size)
+        scoring_matrix = to_scoring_matrix(matrix)
+        for query in query_vectors[:3]:
+            expected = [score for _, score in legacy_search(query, matrix, top_k)]
+            found = [score for _, score in search_top_k(query, scoring_matrix, top_k)]
+            assert np.allclose(expected, found)
+        legacy_ms = measure(lambda query: legacy_search(query, matrix, top_k), query_vectors)
+        kernel_ms = measure(lambda query: search_top_k(query, scoring_matrix, top_k), query_vectors)
+        print(f"{size:>12}{legacy_ms:>16.2f}мс{kernel_ms:>10.2f}мс{legacy_ms / kernel_ms:>11.1f}x")
+
+
+def run_batch_benchmark(size=20000, top_k=10, queries=500, seed=2):
+    from simple_semantic_search_integration import SimpleIntegratedSearchSystem
+
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(5000)]
+
+    def text(length):
+        return " ".join(words[i] for i in (rng.zipf(1.2, size=length) - 1) % len(words))
+
+    system = SimpleIntegratedSearchSystem()
+    system.load_documents([{"id": i, "title": "", "content": text(TERMS_PER_DOCUMENT)} for i in range(size)])
+    query_texts = [text(3) for _ in range(queries)]
+
+    started = time.perf_counter()
+    single = [system.semantic_search(query, top_k) for query in query_texts]
+    single_s = time.perf_counter() - started
+    started = time.perf_counter()
+    batch = system.batch_semantic_search(query_texts, top_k)
+    batch_s = time.perf_counter() - started
+    assert single == batch
+    print(f"\nПакет из {queries} запросов по {size} документам: по одному {queries / single_s:.0f} запр/с, "
+          f"пакетом {queries / batch_s:.0f} запр/с")
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(size) for size in sys.argv[1].split(",")) if len(sys.argv) > 1 else (10000, 100000, 1000000)
+    run_benchmark(sizes)
+    run_batch_benchmark()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк синтаксического поиска: разбор запроса для каждого документа
+(прежняя реализация) против однократной компиляции запроса и против
+инвертированного индекса.
+
+Запуск: python benchmark_syntax_search.py [количество_документов]
+"""
+import random
+import re
+import sys
+import time
+
+from inverted_index import SyntaxSearchIndex
+from syntax_query import compile_query
+
+WORDS = ("школа урок класс учитель ученик математика физика химия история литература "
+         "задача проект олимпиада экзамен расписание журнал оценка программа методика "
+         "quick brown fox lazy dog sample text").split()
+
+QUERIES = [
+    "математика",
+    "урок AND класс",
+    "физика OR химия",
+    "учитель NOT экзамен",
+    "\"lazy dog\" AND fox",
+    "(история OR литература) AND проект NOT олимпиада",
+]
+
+
+def legacy_syntax_aware_search(text, query):
+    """Прежняя реализация из app.py: запрос разбирается заново для каждого документа"""
+    text_lower = text.lower()
+    query = query.strip()
+
+    quoted_phrases = re.findall(r'"([^"]*)"', query)
+    query_without_quotes = re.sub(r'"[^"]*"', '', query)
+
+    for phrase in quoted_phrases:
+        phrase = phrase.strip().lower()
+        if phrase and phrase not in text_lower:
+            return False
+
+    terms = query_without_quotes.strip()
+    if not terms:
+        return len(quoted_phrases) > 0
+
+    parts = re.split(r'\s+(AND|OR|NOT)\s+', terms, flags=re.IGNORECASE)
+
+    i = 0
+    result = True
+    operator = 'AND'
+
+    while i < len(parts):
+        part = parts[i].strip()
+
+        if part.upper() in ['AND', 'OR', 'NOT']:
+            operator = part.upper()
+        else:
+            term = part.strip().lower()
+            if term:
+                term_exists = term in text_lower
+
+                if operator == 'AND':
+                    result = result and term_exists
+                elif operator == 'OR':
+                    if i == 0:
+                        result = term_exists
+                    else:
+                        result = result or term_exists
+                elif operator == 'NOT':
+                    result = result and not term_exists
+
+        i += 1
+
+    return result
+
+
+def make_corpus(size, seed=42):
+    """Синтетические записи базы знаний"""
+    rng = random.Random(seed)
+    return [
+        {
+            "id": str(i),
+            "title": " ".join(rng.choices(WORDS, k=4)).capitalize(),
+            "content": " ".join(rng.choices(WORDS, k=60))
+        }
+        for i in range(size)
+    ]
+
+
+def measure(function, repeats=3):
+    """Лучшее время из нескольких запусков (в миллисекундах) и результат последнего"""
+    best = None
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmark(size=5000):
+    entries = make_corpus(size)
+    index = SyntaxSearchIndex()
+    started = time.perf_counter()
+    index.build(entries)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Документов: {size}, построение индекса: {build_ms:.1f} мс")
+    print(f"{'Запрос':<52}{'разбор/док':>12}{'компиляция':>12}{'индекс':>10}{'найдено':>9}")
+
+    for query in QUERIES:
+        legacy_ms, _ = measure(lambda: [
+            entry for entry in entries
+            if legacy_syntax_aware_search(entry["title"], query)
+            or legacy_syntax_aware_search(entry["content"], query)
+        ])
+
+        def compiled_scan():
+            compiled = compile_query(query)
+            return [entry for entry in entries
+                    if compiled.matches(entry["title"]) or compiled.matches(entry["content"])]
+
+        compiled_ms, compiled_result = measure(compiled_scan)
+        index_ms, index_result = measure(lambda: index.search(query))
+        assert index_result == compiled_result, query
+
+        print(f"{query:<52}{legacy_ms:>10.1f}мс{compiled_ms:>10.1f}мс{index_ms:>8.1f}мс{len(index_result):>9}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -1,6 +1,6 @@
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sparse_scoring import search_top_k, to_scoring_matrix
 import re
 
 class ConceptualSemanticSearch:
@@ -29,25 +29,15 @@ class ConceptualSemanticSearch:
         self.documents = [self.simple_preprocess(doc) for doc in docs]
         # Создание TF-IDF матрицы
         self.vectorizer = TfidfVectorizer()
-        self.tfidf_matrix = self.vectorizer.fit_transform(self.documents)
+        self.tfidf_matrix = to_scoring_matrix(self.vectorizer.fit_transform(self.documents))
     
     def search(self, query, top_k=3):
         """Поиск по запросу"""
         processed_query = self.simple_preprocess(query)
         query_vec = self.vectorizer.transform([processed_query])
         
-        # Вычисление косинусного сходства
-        similarities = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
-        
-        # Получение топ-k результатов
-        top_indices = similarities.argsort()[-top_k:][::-1]
-        
-        results = []
-        for idx in top_indices:
-            if similarities[idx] > 0:
-                results.append((idx, similarities[idx]))
-        
-        return results
+        # Косинусное сходство (строки нормированы) и топ-k результатов
+        return search_top_k(query_vec, self.tfidf_matrix, top_k)
 
 def demonstrate_semantic_search():
     """Демонстрация работы семантического поиска"""
@@ -0,0 +1,412 @@
+"""
+Общее для всего процесса хранилище записей базы знаний
+"""
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from storage import create_storage
+
+DATA_FILE = "knowledge_base.json"
+
+
+def generate_title_from_content(content):
+    """Генерирует заголовок из первых слов содержания"""
+    if not content:
+        return "Без заголовка"
+    words = content.strip().split()[:10]
+    title = " ".join(words)
+    return title[:100] + "..." if len(title) > 100 else title
+
+
+def normalize_entry(entry: dict) -> dict:
+    """
+    Дополняет запись обязательными полями (даты, тема, заголовок)
+
+    Args:
+        entry: запись базы знаний
+
+    Returns:
+        Та же запись с заполненными полями
+    """
+    if "created_at" not in entry:
+        entry["created_at"] = datetime.now().isoformat()
+    if "updated_at" not in entry:
+        entry["updated_at"] = entry["created_at"]
+    if "topic" not in entry or entry["topic"] is None:
+        entry["topic"] = "Без темы"
+    if "title" not in entry or not entry["title"]:
+        entry["title"] = generate_title_from_content(entry.get("content", ""))
+    return entry
+
+
+def normalize_title(title) -> str:
+    """Ключ заголовка для поиска дубликатов: без учета регистра и лишних пробелов"""
+    return " ".join(str(title or "").split()).casefold()
+
+
+def prepare_entry(entry: dict) -> dict:
+    """
+    Подготавливает запись к сохранению: нормализует поля,
+    проставляет автора и ID, если их нет
+
+    Args:
+        entry: запись базы знаний
+
+    Returns:
+        Та же запись с заполненными полями
+    """
+    normalize_entry(entry)
+    if "author" not in entry or not entry["author"]:
+        entry["author"] = "system"
+    if not entry.get("id"):
+        entry["id"] = str(uuid.uuid4())
+    return entry
+
+
+class ReadOnlyEntry(dict):
+    """
+    Запись базы знаний, выданная хранилищем.
+
+    Один и тот же объект записи общий для всех срезов и индексов хранилища,
+    поэтому изменение на месте запрещено (TypeError). Для правки нужна копия:
+    dict(entry) или entry.copy() возвращают обычный словарь. Вложенные значения
+    (например, education_info) не копируются и тоже не должны изменяться.
+    """
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Запись хранилища нельзя изменять на месте; используйте dict(entry)")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    update = pop = popitem = setdefault = clear = _read_only
+
+    def __reduce__(self):
+        return ReadOnlyEntry, (dict(self),)
+
+
+class DocumentSnapshot:
+    """
+    Срез базы знаний, помеченный номером версии.
+
+    Записи среза — ReadOnlyEntry: их нельзя изменять на месте, все изменения
+    проходят через методы DocumentStore, которые создают новые объекты записей.
+    """
+
+    __slots__ = ("version", "entries")
+
+    def __init__(self, version: int, entries: tuple):
+        self.version = version
+        self.entries = entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DocumentStore:
+    """
+    Хранилище записей базы знаний, общее для всех модулей процесса.
+
+    Данные читаются один раз и перечитываются, только если их изменил кто-то другой
+    (например, восстановление из резервной копии или другой процесс).
+    Физическое хранение выполняет подсистема из модуля storage (JSON или SQLite).
+    Каждое изменение увеличивает монотонный номер версии и передается подписчикам
+    (например, поисковому индексу) в виде операции add/update/delete или reload.
+
+    Вместе с кортежем записей поддерживаются словари ID -> позиция и
+    нормализованный заголовок -> множество ID; они заменяются одновременно
+    с записями, поэтому поиск по ID и проверка дубликатов выполняются за O(1).
+    """
+
+    def __init__(self, data_file=DATA_FILE, storage=None):
+        """
+        Инициализация хранилища
+
+        Args:
+            data_file: путь к файлу с базой знаний
+            storage: подсистема хранения (по умолчанию выбирается storage.create_storage)
+        """
+        self.data_file = data_file
+        self.storage = storage or create_storage(data_file)
+        self._lock = threading.RLock()
+        self._entries = ()
+        self._positions = {}
+        self._titles = {}
+        self._version = 0
+        self._file_signature = None
+        self._loaded = False
+        self._listeners = []
+
+    def subscribe(self, listener):
+        """
+        Подписывает обработчик на изменения данных
+
+        Args:
+            listener: функция listener(op, old_entry, new_entry, snapshot),
+                где op — "add", "update", "delete" или "reload"
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    @property
+    def version(self) -> int:
+        """Текущая версия данных"""
+        with self._lock:
+            self._refresh_if_changed()
+            return self._version
+
+    def snapshot(self) -> DocumentSnapshot:
+        """
+        Возвращает актуальный срез данных
+
+        Returns:
+            DocumentSnapshot с кортежем записей и номером версии
+        """
+        with self._lock:
+            self._refresh_if_changed()
+            return DocumentSnapshot(self._version, self._entries)
+
+    def get_entry(self, entry_id) -> Optional[dict]:
+        """Находит запись по её ID"""
+        with self._lock:
+            self._refresh_if_changed()
+            position = self._positions.get(str(entry_id))
+            return self._entries[position] if position is not None else None
+
+    def find_id_by_title(self, title, exclude_id=None) -> Optional[str]:
+        """
+        Находит ID записи с таким же заголовком (без учета регистра и лишних пробелов)
+
+        Args:
+            title: заголовок
+            exclude_id: ID записи, которую не нужно учитывать (например, редактируемой)
+
+        Returns:
+            ID найденной записи или None
+        """
+        with self._lock:
+            self._refresh_if_changed()
+            for entry_id in self._titles.get(normalize_title(title), ()):
+                if exclude_id is None or entry_id != str(exclude_id):
+                    return entry_id
+            return None
+
+    def title_exists(self, title, exclude_id=None) -> bool:
+        """Проверяет, есть ли запись с таким заголовком"""
+        return self.find_id_by_title(title, exclude_id) is not None
+
+    def add_entry(self, entry: dict) -> dict:
+        """
+        Добавляет новую запись и сохраняет базу
+
+        Args:
+            entry: новая запись
+
+        Returns:
+            Добавленная запись
+        """
+        with self._lock:
+            self._refresh_if_changed()
+            entry = ReadOnlyEntry(prepare_entry(dict(entry)))
+            entries = self._entries + (entry,)
+            self.storage.insert(entry, entries)
+            self._positions[str(entry["id"])] = len(entries) - 1
+            self._index_title(self._titles, entry)
+            self._commit(entries, self._positions, self._titles)
+            self._notify("add", None, entry)
+            return entry
+
+    def update_entry(self, entry_id, changes: Dict) -> Optional[dict]:
+        """
+        Обновляет поля записи, создавая новый объект записи
+
+        Args:
+            entry_id: ID записи
+            changes: словарь изменяемых полей
+
+        Returns:
+            Обновленная запись или None, если запись не найдена
+        """
+        with self._lock:
+            self._refresh_if_changed()
+            position = self._positions.get(str(entry_id))
+            if position is None:
+                return None
+            previous = self._entries[position]
+            updated = ReadOnlyEntry(prepare_entry({**previous, **changes}))
+            entries = list(self._entries)
+            entries[position] = updated
+            changes = {key: value for key, value in updated.items() if previous.get(key) != value}
+            self.storage.update(updated, entries, changes)
+            if normalize_title(previous.get("title")) != normalize_title(updated.get("title")):
+                self._unindex_title(self._titles, previous)
+                self._index_title(self._titles, updated)
+            self._commit(tuple(entries), self._positions, self._titles)
+            self._notify("update", previous, updated)
+            return updated
+
+    def delete_entry(self, entry_id) -> Optional[dict]:
+        """
+        Удаляет запись по её ID
+
+        Args:
+            entry_id: ID записи
+
+        Returns:
+            Удаленная запись или None, если запись не найдена
+        """
+        with self._lock:
+            self._refresh_if_changed()
+            position = self._positions.get(str(entry_id))
+            if position is None:
+                return None
+            removed = self._entries[position]
+            entries = self._entries[:position] + self._entries[position + 1:]
+            self.storage.delete(removed["id"], entries)
+            # Сдвигаются только позиции записей после удаленной
+            del self._positions[str(removed["id"])]
+            for shifted in range(position, len(entries)):
+                if entries[shifted].get("id") is not None:
+                    self._positions[str(entries[shifted]["id"])] = shifted
+            self._unindex_title(self._titles, removed)
+            self._commit(entries, self._positions, self._titles)
+            self._notify("delete", removed, None)
+            return removed
+
+    def replace_all(self, entries: List[dict]):
+        """
+        Полностью заменяет содержимое базы (массовые операции, восстановление)
+
+        Args:
+            entries: новый список записей
+        """
+        with self._lock:
+            prepared = tuple(ReadOnlyEntry(prepare_entry(dict(entry))) for entry in entries)
+            self.storage.write_all(prepared)
+            self._commit(prepared)
+            self._notify("reload", None, None)
+
+    def compact(self) -> bool:
+        """
+        Переносит журнал изменений в новый снимок (если подсистема хранения его ведет)
+
+        Returns:
+            True, если сжатие выполнено
+        """
+        if not hasattr(self.storage, "compact"):
+            return False
+        with self._lock:
+            self._refresh_if_changed()
+            compacted = self.storage.compact()
+            if compacted is None:
+                return False
+            entries, signature = compacted
+            # Если другой процесс успел дописать журнал, срез перечитается при следующем обращении
+            if [normalize_entry(entry) for entry in entries] == list(self._entries):
+                self._file_signature = signature
+            return True
+
+    @staticmethod
+    def _index_title(titles: dict, entry: dict) -> dict:
+        if entry.get("id") is not None:
+            key = normalize_title(entry.get("title"))
+            titles[key] = titles.get(key, frozenset()) | {str(entry["id"])}
+        return titles
+
+    @staticmethod
+    def _unindex_title(titles: dict, entry: dict) -> dict:
+        key = normalize_title(entry.get("title"))
+        remaining = titles.get(key, frozenset()) - {str(entry.get("id"))}
+        if remaining:
+            titles[key] = remaining
+        else:
+            titles.pop(key, None)
+        return titles
+
+    @classmethod
+    def _build_indexes(cls, entries: tuple):
+        positions = {}
+        titles = {}
+        for position, entry in enumerate(entries):
+            if entry.get("id") is not None:
+                positions[str(entry["id"])] = position
+            cls._index_title(titles, entry)
+        return positions, titles
+
+    def _refresh_if_changed(self):
+        signature = self.storage.signature()
+        if self._loaded and signature == self._file_signature:
+            return
+        entries = self.storage.load_all()
+        if entries is None:
+            # Поврежденные данные — оставляем прежний срез
+            if self._loaded:
+                return
+            entries = []
+        self._entries = tuple(ReadOnlyEntry(normalize_entry(entry)) for entry in entries)
+        self._positions, self._titles = self._build_indexes(self._entries)
+        self._file_signature = signature
+        self._loaded = True
+        self._version += 1
+        self._notify("reload", None, None)
+
+    def _commit(self, entries: tuple, positions=None, titles=None):
+        if positions is None or titles is None:
+            positions, titles = self._build_indexes(entries)
+        # Записи и индексы меняются вместе, под блокировкой хранилища и только после успешной записи
+        self._entries = entries
+        self._positions = positions
+        self._titles = titles
+        self._file_signature = self.storage.signature()
+        self._loaded = True
+        self._version += 1
+
+    def _notify(self, op, old_entry, new_entry):
+        snapshot = DocumentSnapshot(self._version, self._entries)
+        for listener in self._listeners:
+            try:
+                listener(op, old_entry, new_entry, snapshot)
+            except Exception as e:
+                # Ошибка подписчика не должна отменять уже сохраненное изменение
+                print(f"[ERROR] Обработчик изменений хранилища завершился с ошибкой: {e}")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_document_store(data_file=DATA_FILE) -> DocumentStore:
+    """
+    Возвращает единственный экземпляр хранилища для указанного файла
+
+    Args:
+        data_file: путь к файлу с базой знаний
+    """
+    key = os.path.abspath(data_file)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = DocumentStore(data_file)
+            _stores[key] = store
+        return store
+
+
+# Глобальное хранилище основной базы знаний
+document_store = get_document_store(DATA_FILE)
+
+
+def compact_knowledge_base():
+    """Фоновое сжатие журнала изменений основной базы знаний (задача планировщика)"""
+    try:
+        if document_store.compact():
+            print("Журнал изменений базы знаний перенесен в снимок")
+        return True
+    except Exception as e:
+        print(f"Не удалось сжать журнал изменений: {e}")
+        return False
@@ -0,0 +1,234 @@
+"""
+Постоянный кэш эмбеддингов документов.
+
+Эмбеддинги хранятся на диске в виде массива float32, отображаемого в память
+(numpy.memmap), а таблица смещений связывает ключ документа со строкой массива.
+Ключ — хэш от названия модели и нормализованного текста, поэтому повторная
+загрузка базы вычисляет эмбеддинги только для новых или измененных записей.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterable, List
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: кэш защищен только от параллельных потоков одного процесса
+    fcntl = None
+
+DTYPE = np.float32
+
+
+def normalize_text(text: str) -> str:
+    """Нормализация текста перед хэшированием: без лишних пробелов"""
+    return " ".join(str(text or "").split())
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    """
+    Ключ эмбеддинга в кэше
+
+    Args:
+        model_name: название модели
+        text: текст документа
+
+    Returns:
+        Хэш SHA-1 от пары (модель, нормализованный текст)
+    """
+    payload = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Кэш эмбеддингов одной модели в каталоге cache_dir.
+
+    Файлы кэша:
+    - <модель>.f32 — строки эмбеддингов, дописываемые в конец файла;
+    - <модель>.offsets.json — размерность и таблица ключ -> номер строки;
+    - <модель>.lock — файл блокировки между процессами.
+
+    Новые строки сначала дописываются в массив, и только затем атомарно
+    заменяется таблица смещений, поэтому оборванная запись не портит кэш.
+    Каталог кэша может быть общим для нескольких процессов (воркеров gunicorn):
+    дописывание и сжатие выполняются под блокировкой файла (fcntl.flock),
+    а таблица смещений перед изменением перечитывается с диска.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        """
+        Инициализация кэша
+
+        Args:
+            cache_dir: каталог для файлов кэша
+            model_name: название модели, для которой хранятся эмбеддинги
+        """
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        slug = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in model_name)
+        self.vectors_file = os.path.join(cache_dir, f"{slug}.f32")
+        self.offsets_file = os.path.join(cache_dir, f"{slug}.offsets.json")
+        self.lock_file = os.path.join(cache_dir, f"{slug}.lock")
+        self._lock = threading.Lock()
+        self.dimension = None
+        self.offsets = {}
+        self._vectors = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._file_lock():
+            self._load()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @contextmanager
+    def _file_lock(self):
+        """Исключительная блокировка кэша между процессами"""
+        with open(self.lock_file, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _load(self):
+        """Перечитывает таблицу смещений (вызывается под блокировкой файла)"""
+        if not os.path.exists(self.offsets_file):
+            return
+        try:
+            with open(self.offsets_file, "r", encoding="utf-8") as f:
+                table = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            # Поврежденная таблица — кэш начинается заново
+            return
+        if table.get("model") != self.model_name:
+            return
+        self.dimension = table.get("dimension")
+        rows = self._rows_on_disk()
+        self.offsets = {key: offset for key, offset in table.get("offsets", {}).items() if offset < rows}
+        self._open_vectors(rows)
+
+    def _rows_on_disk(self) -> int:
+        if not self.dimension or not os.path.exists(self.vectors_file):
+            return 0
+        return os.path.getsize(self.vectors_file) // (self.dimension * np.dtype(DTYPE).itemsize)
+
+    def _open_vectors(self, rows: int):
+        if rows == 0:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(self.vectors_file, dtype=DTYPE, mode="r", shape=(rows, self.dimension))
+
+    def _write_offsets(self):
+        fd, tmp_path = tempfile.mkstemp(prefix=".offsets_", suffix=".tmp", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model_name, "dimension": self.dimension, "offsets": self.offsets}, f)
+            os.replace(tmp_path, self.offsets_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _append(self, keys: List[str], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=DTYPE)
+        if self.dimension is None:
+            self.dimension = int(vectors.shape[1])
+        rows = self._rows_on_disk()
+        row_bytes = self.dimension * np.dtype(DTYPE).itemsize
+        with open(self.vectors_file, "ab") as f:
+            # Отбрасываем недописанный хвост после сбоя, чтобы строки не сместились
+            if f.tell() != rows * row_bytes:
+                f.truncate(rows * row_bytes)
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        for position, key in enumerate(keys):
+            self.offsets[key] = rows + position
+        self._write_offsets()
+        self._open_vectors(rows + len(keys))
+
+    def encode(self, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Возвращает эмбеддинги текстов, вычисляя только отсутствующие в кэше
+
+        Args:
+            texts: тексты документов
+            encoder: функция, вычисляющая эмбеддинги списка текстов (например, model.encode)
+
+        Returns:
+            Массив формы (len(texts), размерность)
+        """
+        keys = [embedding_key(self.model_name, text) for text in texts]
+        with self._lock:
+            missing = self._missing(keys, texts)
+            if missing:
+                # Эти эмбеддинги мог уже дописать другой процесс
+                with self._file_lock():
+                    self._load()
+                missing = self._missing(keys, texts)
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+            if missing:
+                # Вычисление идет без блокировки файла; перед дописыванием таблица перечитывается,
+                # и строки, которые успел дописать другой процесс, не дублируются
+                vectors = np.asarray(encoder(list(missing.values())))
+                with self._file_lock():
+                    self._load()
+                    fresh = [position for position, key in enumerate(missing) if key not in self.offsets]
+                    if fresh:
+                        self._append([list(missing)[position] for position in fresh], vectors[fresh])
+            if not keys:
+                return np.zeros((0, self.dimension or 0), dtype=DTYPE)
+            rows = np.fromiter((self.offsets[key] for key in keys), dtype=np.int64, count=len(keys))
+            # Копия в оперативную память: дальнейшие вычисления не зависят от файла
+            return np.array(self._vectors[rows])
+
+    def _missing(self, keys: List[str], texts: List[str]) -> dict:
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.offsets and key not in missing:
+                missing[key] = text
+        return missing
+
+    def compact(self, live_texts: Iterable[str]) -> int:
+        """
+        Переписывает кэш, оставляя только эмбеддинги указанных текстов
+
+        Args:
+            live_texts: тексты, эмбеддинги которых нужно сохранить
+
+        Returns:
+            Количество удаленных строк
+        """
+        with self._lock, self._file_lock():
+            self._load()
+            live_keys = [key for key in dict.fromkeys(embedding_key(self.model_name, text) for text in live_texts)
+                         if key in self.offsets]
+            removed = self._rows_on_disk() - len(live_keys)
+            if removed <= 0:
+                return 0
+            vectors = np.array(self._vectors[[self.offsets[key] for key in live_keys]]) if live_keys else None
+            self._vectors = None
+            self.offsets = {}
+            if os.path.exists(self.vectors_file):
+                os.remove(self.vectors_file)
+            if vectors is not None:
+                self._append(live_keys, vectors)
+            else:
+                self._write_offsets()
+            return removed
+
+    @property
+    def row_count(self) -> int:
+        """Количество строк в файле эмбеддингов (включая устаревшие)"""
+        return self._rows_on_disk()
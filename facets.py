@@ -0,0 +1,466 @@
+"""
+Фильтры поиска по фасетам записей (тема, класс, параллель, предмет, автор, дата создания).
+
+FacetIndex хранит для каждого значения фасета множество номеров строк индекса,
+поэтому поисковые движки получают допустимые строки пересечением готовых множеств
+и оценивают только их, а не проверяют каждую запись после поиска.
+
+StoreFacetIndex поддерживает такой индекс для всех записей хранилища (для фильтров
+главной страницы и списков значений фасетов) и обновляет его по изменениям хранилища.
+Даты создания и изменения разбираются один раз при добавлении строки, а строки
+хранятся упорядоченными по дате создания: диапазон дат находится двумя вызовами
+bisect, а порядок «новые сверху» и страницы по курсорам не требуют сортировки.
+"""
+import calendar
+import threading
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from pagination import PAGE_SIZE, decode_cursor, encode_cursor
+
+FACET_FIELDS = ("topic", "class", "parallel", "subject", "author")
+
+# Значения, означающие «без фильтра» (как в формах фильтрации главной страницы)
+ANY_VALUES = ("", "all", "Все темы")
+
+# Отметка времени записи, дата которой отсутствует или не разбирается
+NO_TIMESTAMP = -(2 ** 63)
+_MICROSECONDS = 1000000
+
+
+def entry_facets(entry: dict) -> Dict[str, Optional[str]]:
+    """Значения фасетов записи"""
+    education_info = entry.get("education_info") or {}
+    return {
+        "topic": entry.get("topic", "Без темы"),
+        "class": education_info.get("class"),
+        "parallel": education_info.get("parallel"),
+        "subject": education_info.get("subject"),
+        "author": entry.get("author"),
+    }
+
+
+def parse_timestamp(value) -> int:
+    """
+    Микросекунды от эпохи для даты в формате ISO
+
+    Часовой пояс отбрасывается: сравнивается время, записанное в строке,
+    как и при фильтрации по дате (datetime.fromisoformat(...).date()).
+
+    Returns:
+        Отметка времени или NO_TIMESTAMP
+    """
+    if not isinstance(value, str) or not value:
+        return NO_TIMESTAMP
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return NO_TIMESTAMP
+    return calendar.timegm(parsed.timetuple()) * _MICROSECONDS + parsed.microsecond
+
+
+def day_bounds(date_from: Optional[str], date_to: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Границы диапазона дат YYYY-MM-DD в микросекундах: начало date_from и начало дня после date_to
+
+    Неразборчивая граница не ограничивает диапазон.
+    """
+    def start_of(day: Optional[str], shift: int) -> Optional[int]:
+        if not day:
+            return None
+        try:
+            parsed = datetime.strptime(day, "%Y-%m-%d") + timedelta(days=shift)
+        except ValueError:
+            return None
+        return calendar.timegm(parsed.timetuple()) * _MICROSECONDS
+
+    return start_of(date_from, 0), start_of(date_to, 1)
+
+
+def entry_date_key(entry: dict) -> Optional[str]:
+    """Дата создания записи в виде YYYY-MM-DD (строки такого вида сравниваются как даты)"""
+    created_at = entry.get("created_at")
+    if not isinstance(created_at, str) or len(created_at) < 10:
+        return None
+    return created_at[:10]
+
+
+class SearchFilters:
+    """Набор фильтров поиска; пустые значения и «Все темы» / "all" означают отсутствие фильтра"""
+
+    def __init__(self, topic=None, class_name=None, parallel=None, subject=None, author=None,
+                 date_from=None, date_to=None):
+        values = {"topic": topic, "class": class_name, "parallel": parallel, "subject": subject, "author": author}
+        self.values = {
+            field: value for field, value in values.items() if value is not None and value not in ANY_VALUES
+        }
+        self.date_from = date_from or None
+        self.date_to = date_to or None
+
+    @classmethod
+    def from_args(cls, args) -> "SearchFilters":
+        """Фильтры из параметров запроса (topic, class, parallel, subject, author, date_from, date_to)"""
+        return cls(topic=args.get("topic"), class_name=args.get("class"), parallel=args.get("parallel"),
+                   subject=args.get("subject"), author=args.get("author"),
+                   date_from=args.get("date_from"), date_to=args.get("date_to"))
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.values and self.date_from is None and self.date_to is None
+
+    def key(self) -> tuple:
+        """Ключ фильтров для кэша результатов"""
+        return tuple(sorted(self.values.items())), self.date_from, self.date_to
+
+    def matches_date(self, date_key: Optional[str]) -> bool:
+        if self.date_from is None and self.date_to is None:
+            return True
+        if date_key is None:
+            return False
+        if self.date_from is not None and date_key < self.date_from:
+            return False
+        return self.date_to is None or date_key <= self.date_to
+
+    def without_dates(self) -> "SearchFilters":
+        """Те же фильтры без диапазона дат"""
+        filters = SearchFilters()
+        filters.values = dict(self.values)
+        return filters
+
+    def matches(self, entry: dict) -> bool:
+        """Проверка одной записи (для движков без индекса фасетов)"""
+        facets = entry_facets(entry)
+        if any(facets[field] != value for field, value in self.values.items()):
+            return False
+        return self.matches_date(entry_date_key(entry))
+
+
+def resolve_filters(filters: Optional[SearchFilters] = None, topic: Optional[str] = None) -> Optional[SearchFilters]:
+    """
+    Объединяет фильтры с отдельно переданной темой (прежний параметр topic движков)
+
+    Returns:
+        SearchFilters или None, если фильтров нет
+    """
+    if topic not in ANY_VALUES and topic is not None:
+        merged = SearchFilters(topic=topic)
+        if filters is not None:
+            merged.values = dict(filters.values, topic=topic)
+            merged.date_from, merged.date_to = filters.date_from, filters.date_to
+        filters = merged
+    if filters is None or filters.is_empty:
+        return None
+    return filters
+
+
+class FacetIndex:
+    """Списки строк для каждого значения фасета и даты создания строк"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._postings: Dict[str, Dict[str, Set[int]]] = {field: {} for field in FACET_FIELDS}
+        self._dates: Dict[int, Optional[str]] = {}
+
+    def add(self, row: int, entry: dict):
+        """Добавляет строку с фасетами записи"""
+        for field, value in entry_facets(entry).items():
+            if value is not None:
+                self._postings[field].setdefault(value, set()).add(row)
+        self._dates[row] = entry_date_key(entry)
+
+    def remove(self, row: int, entry: dict):
+        """Удаляет строку записи из списков"""
+        for field, value in entry_facets(entry).items():
+            rows = self._postings[field].get(value)
+            if rows is not None:
+                rows.discard(row)
+                if not rows:
+                    del self._postings[field][value]
+        self._dates.pop(row, None)
+
+    def values(self, field: str) -> Dict[str, int]:
+        """Количество строк для каждого значения фасета"""
+        return {value: len(rows) for value, rows in self._postings[field].items()}
+
+    def rows(self, filters: Optional[SearchFilters]) -> Optional[Set[int]]:
+        """
+        Строки, удовлетворяющие фильтрам
+
+        Returns:
+            Множество номеров строк или None, если фильтров нет (допустимы все строки)
+        """
+        if filters is None or filters.is_empty:
+            return None
+        # Пересечение начинается с самого короткого списка
+        postings = sorted((self._postings[field].get(value, set()) for field, value in filters.values.items()),
+                          key=len)
+        if postings:
+            result = set(postings[0])
+            for rows in postings[1:]:
+                result &= rows
+                if not result:
+                    return result
+            candidates = result
+        else:
+            candidates = self._dates.keys()
+        if filters.date_from is None and filters.date_to is None:
+            return set(candidates)
+        return {row for row in candidates if filters.matches_date(self._dates.get(row))}
+
+    def mask(self, filters: Optional[SearchFilters], size: int) -> Optional[np.ndarray]:
+        """Булев массив допустимых строк длины size (None — без фильтров)"""
+        rows = self.rows(filters)
+        if rows is None:
+            return None
+        mask = np.zeros(size, dtype=bool)
+        if rows:
+            mask[np.fromiter(rows, dtype=np.int64, count=len(rows))] = True
+        return mask
+
+
+class StoreFacetIndex:
+    """
+    Индекс фасетов всех записей хранилища.
+
+    Номера строк не меняются при удалении (удаленная строка остается пустой),
+    изменение записи заменяет ее строку, а новая запись добавляется в конец,
+    поэтому порядок живых строк совпадает с порядком записей в хранилище.
+
+    Отметки времени created_at и updated_at хранятся в массивах array("q")
+    по номерам строк, а список (created_at, -строка) поддерживается отсортированным:
+    при равных датах обратный обход дает строки в порядке хранилища, как и прежняя
+    устойчивая сортировка «новые сверху».
+    """
+
+    def __init__(self, store, tombstone_threshold=0.25):
+        """
+        Инициализация индекса
+
+        Args:
+            store: экземпляр document_store.DocumentStore
+            tombstone_threshold: доля удаленных строк, после которой индекс строится заново
+        """
+        self.store = store
+        self.tombstone_threshold = tombstone_threshold
+        self.version = None
+        self._lock = threading.RLock()
+        self._facets = FacetIndex()
+        self._rows = []
+        self._row_ids = {}
+        self._live = set()
+        self._created = array("q")
+        self._updated = array("q")
+        self._by_created = []
+        self._stale = True
+        store.subscribe(self.apply_change)
+
+    def _build(self, entries, version):
+        self._facets.clear()
+        self._rows = list(entries)
+        self._row_ids = {}
+        self._created = array("q", (parse_timestamp(entry.get("created_at")) for entry in self._rows))
+        self._updated = array("q", (parse_timestamp(entry.get("updated_at")) for entry in self._rows))
+        for row, entry in enumerate(self._rows):
+            self._facets.add(row, entry)
+            if entry.get("id") is not None:
+                self._row_ids[str(entry["id"])] = row
+        self._by_created = sorted((created, -row) for row, created in enumerate(self._created))
+        self._live = set(range(len(self._rows)))
+        self._stale = False
+        self.version = version
+
+    def _index_row(self, row: int, entry: dict):
+        created, updated = parse_timestamp(entry.get("created_at")), parse_timestamp(entry.get("updated_at"))
+        if row == len(self._created):
+            self._created.append(created)
+            self._updated.append(updated)
+        else:
+            self._created[row], self._updated[row] = created, updated
+        insort(self._by_created, (created, -row))
+        self._facets.add(row, entry)
+
+    def _unindex_row(self, row: int):
+        self._facets.remove(row, self._rows[row])
+        position = bisect_left(self._by_created, (self._created[row], -row))
+        del self._by_created[position]
+
+    def apply_change(self, op: str, old_entry: Optional[dict], new_entry: Optional[dict], snapshot):
+        """Применяет изменение хранилища к индексу"""
+        with self._lock:
+            if op == "reload" or self._stale:
+                self._stale = True
+                return
+            row = self._row_ids.get(str(old_entry.get("id"))) if old_entry is not None else None
+            if old_entry is not None and row is None:
+                # Запись без известной строки — индекс строится заново при следующем обращении
+                self._stale = True
+                return
+            if row is not None:
+                self._unindex_row(row)
+            if new_entry is None:
+                self._rows[row] = None
+                self._live.discard(row)
+                del self._row_ids[str(old_entry.get("id"))]
+            else:
+                if row is None:
+                    row = len(self._rows)
+                    self._rows.append(new_entry)
+                    self._live.add(row)
+                    self._row_ids[str(new_entry.get("id"))] = row
+                else:
+                    self._rows[row] = new_entry
+                self._index_row(row, new_entry)
+            self.version = snapshot.version
+            if self._rows and (len(self._rows) - len(self._live)) / len(self._rows) > self.tombstone_threshold:
+                self._build(snapshot.entries, snapshot.version)
+
+    def ensure_current(self):
+        """Перестраивает индекс, если он отстал от хранилища"""
+        snapshot = self.store.snapshot()
+        with self._lock:
+            if self._stale or self.version != snapshot.version:
+                self._build(snapshot.entries, snapshot.version)
+
+    def filter(self, filters: Optional[SearchFilters] = None, newest_first: bool = False) -> List[dict]:
+        """
+        Записи, удовлетворяющие фильтрам
+
+        Args:
+            filters: фильтры по фасетам (None или пустые — все записи)
+            newest_first: упорядочить по дате создания, новые сверху (иначе — порядок хранилища)
+        """
+        self.ensure_current()
+        with self._lock:
+            rows, start, end = self._split_filters(filters)
+            if start is None and end is None and not newest_first:
+                return [self._rows[row] for row in sorted(self._live if rows is None else rows)]
+
+            keys, low, high, rows = self._date_keys(rows, start, end)
+            ordered = [-row for _, row in keys[low:high] if rows is None or -row in rows]
+            if not newest_first:
+                ordered.sort()
+            else:
+                ordered.reverse()
+            return [self._rows[row] for row in ordered]
+
+    def page(self, filters: Optional[SearchFilters] = None, limit: int = PAGE_SIZE,
+             after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Страница записей, новые сверху, после курсора (created_at, строка, ID) последней показанной записи
+
+        Args:
+            filters: фильтры по фасетам
+            limit: размер страницы
+            after: курсор из предыдущей страницы (None — первая страница)
+
+        Returns:
+            (записи страницы, курсор следующей страницы или None)
+        """
+        self.ensure_current()
+        with self._lock:
+            rows, start, end = self._split_filters(filters)
+            keys, low, high, rows = self._date_keys(rows, start, end)
+            cursor = decode_cursor(after)
+            if cursor is not None:
+                created, position_text = cursor
+                row_text, _, entry_id = position_text.partition("-")
+                row = self._row_ids.get(entry_id)
+                if row is None or self._created[row] != created:
+                    # Запись курсора удалена или изменилась: продолжаем с ее прежнего места,
+                    # не пропуская записи с той же датой создания
+                    row = int(row_text) if row_text.isdigit() else None
+                key = (created, -row) if row is not None else (created,)
+                high = min(high, bisect_left(keys, key))
+
+            page = []
+            position = high - 1
+            while position >= low and len(page) <= limit:
+                row = -keys[position][1]
+                if rows is None or row in rows:
+                    page.append(row)
+                position -= 1
+            next_cursor = None
+            if len(page) > limit:
+                page.pop()
+                next_cursor = encode_cursor(self._created[page[-1]], f"{page[-1]}-{self._rows[page[-1]].get('id')}")
+            return [self._rows[row] for row in page], next_cursor
+
+    def count(self, filters: Optional[SearchFilters] = None) -> int:
+        """Количество записей, удовлетворяющих фильтрам (без построения списка записей)"""
+        self.ensure_current()
+        with self._lock:
+            rows, start, end = self._split_filters(filters)
+            if start is None and end is None:
+                return len(self._live if rows is None else rows)
+            keys, low, high, rows = self._date_keys(rows, start, end)
+            if rows is None:
+                return high - low
+            return sum(1 for position in range(low, high) if -keys[position][1] in rows)
+
+    def _split_filters(self, filters: Optional[SearchFilters]):
+        """Строки по фильтрам значений (None — все) и границы диапазона дат в микросекундах"""
+        if filters is None:
+            return None, None, None
+        start, end = day_bounds(filters.date_from, filters.date_to)
+        return self._facets.rows(filters.without_dates()), start, end
+
+    def _date_keys(self, rows: Optional[Set[int]], start: Optional[int], end: Optional[int]):
+        """
+        Отсортированные по дате создания ключи (created_at, -строка) и границы диапазона [start, end) в них
+
+        Returns:
+            (ключи, начало, конец, строки, которые еще нужно проверить при обходе, или None)
+        """
+        if start is None:
+            # С фильтром по датам записи без даты не показываются
+            start = NO_TIMESTAMP if end is None else NO_TIMESTAMP + 1
+        keys = self._by_created
+        low = bisect_left(keys, (start,))
+        high = len(keys) if end is None else bisect_left(keys, (end,))
+        if rows is not None and len(rows) * 8 < high - low:
+            # Немногие строки проще отсортировать, чем просматривать весь диапазон дат
+            keys = sorted((self._created[row], -row) for row in rows)
+            rows = None
+            low = bisect_left(keys, (start,))
+            high = len(keys) if end is None else bisect_left(keys, (end,))
+        return keys, low, high, rows
+
+    def timestamps(self, entry_id) -> Optional[Tuple[int, int]]:
+        """Отметки времени (created_at, updated_at) записи в микросекундах или None, если запись не найдена"""
+        self.ensure_current()
+        with self._lock:
+            row = self._row_ids.get(str(entry_id))
+            if row is None:
+                return None
+            return self._created[row], self._updated[row]
+
+    def counts(self, field: str) -> Dict[str, int]:
+        """Количество записей для каждого значения фасета (поле из FACET_FIELDS)"""
+        self.ensure_current()
+        with self._lock:
+            return self._facets.values(field)
+
+    def total(self) -> int:
+        """Количество записей"""
+        self.ensure_current()
+        with self._lock:
+            return len(self._live)
+
+
+_store_indexes = {}
+_store_indexes_lock = threading.Lock()
+
+
+def get_store_facets(store) -> StoreFacetIndex:
+    """Возвращает единственный индекс фасетов для указанного хранилища"""
+    with _store_indexes_lock:
+        index = _store_indexes.get(id(store))
+        if index is None or index.store is not store:
+            index = _store_indexes[id(store)] = StoreFacetIndex(store)
+        return index
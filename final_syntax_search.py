@@ -1,97 +1,8 @@
 #!/usr/bin/env python3
 # Final corrected version of syntax-aware search functionality
 
-import re
+from syntax_query import syntax_aware_search
 
-def syntax_aware_search(text, query):
-    """
-    Performs syntax-aware search supporting:
-    - AND operator: "word1 AND word2"
-    - OR operator: "word1 OR word2" 
-    - NOT operator: "word1 NOT word2"
-    - Phrase search: "word1 word2" (both words present)
-    - Quoted phrases: "\"exact phrase\""
-    """
-    # Normalize text and query to lowercase
-    text_lower = text.lower()
-    query = query.strip()
-    
-    # Handle quoted phrases first
-    quoted_phrases = re.findall(r'"([^"]*)"', query)
-    query_without_quotes = re.sub(r'"[^"]*"', ' QUOTED_PHRASE_PLACEHOLDER ', query)
-    
-    # Check if all quoted phrases are present in the text
-    for phrase in quoted_phrases:
-        phrase = phrase.strip().lower()
-        if phrase and phrase not in text_lower:
-            return False
-    
-    # Split by AND, OR, NOT operators while preserving them
-    parts = re.split(r'\s+(AND|OR|NOT)\s+', query_without_quotes, flags=re.IGNORECASE)
-    
-    # Process parts with operators
-    i = 0
-    result = None  # We'll initialize this based on the first term
-    operator = 'AND'  # Default operator
-    
-    while i < len(parts):
-        part = parts[i].strip()
-        
-        if part.upper() in ['AND', 'OR', 'NOT']:
-            operator = part.upper()
-        else:
-            term = part.strip().lower()
-            term_exists = False
-            
-            # Handle quoted phrases (they were already verified)
-            if 'QUOTED_PHRASE_PLACEHOLDER' in term:
-                # If this part contains the placeholder (even if mixed with other text), the quoted phrase validation was already done
-                # If the term is just the placeholder, then it's True
-                # If it has other content, we need to check the other content too
-                term_exists = True  # Start with True since quoted phrases were validated
-                
-                # Check for other non-placeholder content in the same part
-                other_content = re.sub(r'QUOTED_PHRASE_PLACEHOLDER', '', term).strip()
-                if other_content:
-                    # There's other content in this part, check it
-                    other_subterms = [t.strip() for t in other_content.split() if t.strip() and t.strip() != 'QUOTED_PHRASE_PLACEHOLDER']
-                    for subterm in other_subterms:
-                        if subterm:
-                            term_exists = term_exists and (subterm in text_lower)
-            else:
-                # Handle regular terms - for space-separated terms without operators, all should be present (AND logic)
-                subterms = [t.strip() for t in term.split() if t.strip()]
-                
-                if len(subterms) == 0:
-                    term_exists = True  # Empty term matches everything
-                elif len(subterms) == 1:
-                    # Single term - just check if it exists
-                    term_exists = (subterms[0] in text_lower)
-                else:
-                    # Multiple terms - all must exist (AND logic)
-                    term_exists = True
-                    for subterm in subterms:
-                        if subterm != 'QUOTED_PHRASE_PLACEHOLDER':  # Skip placeholder if it's mixed with other terms
-                            term_exists = term_exists and (subterm in text_lower)
-            
-            # Initialize result with the first term's value
-            if result is None:
-                result = term_exists
-            else:
-                if operator == 'AND':
-                    result = result and term_exists
-                elif operator == 'OR':
-                    result = result or term_exists
-                elif operator == 'NOT':
-                    result = result and not term_exists
-        
-        i += 1
-    
-    # If no terms were processed, return True (for edge cases)
-    if result is None:
-        return True
-    
-    return result
 
 def test_syntax_aware_search():
     test_text = "The quick brown fox jumps over the lazy dog. This is a sample text for testing."
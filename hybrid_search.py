@@ -0,0 +1,122 @@
+"""
+Гибридный поиск: параллельный запуск нескольких поисковых движков и объединение
+их выдачи методом взвешенного обратного ранга (Reciprocal Rank Fusion, RRF).
+
+Каждый движок выполняется в общем пуле потоков со своим бюджетом времени.
+Если движок не уложился в бюджет или завершился с ошибкой, ответ собирается
+из остальных движков и помечается как частичный (partial).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional
+
+# Сглаживающая константа RRF: вклад документа на месте r равен 1 / (RRF_K + r)
+RRF_K = 60
+
+# Максимальное число одновременно выполняемых задач движков. Движок, превысивший бюджет,
+# продолжает работать в пуле до завершения, поэтому размер пула ограничивает и такие задачи.
+MAX_ENGINE_WORKERS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Общий пул потоков движков (создается при первом гибридном поиске)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_ENGINE_WORKERS, thread_name_prefix="search-engine")
+    return _executor
+
+
+def entry_key(entry: dict) -> str:
+    """Ключ записи для объединения выдачи разных движков"""
+    if entry.get("id") is not None:
+        return f"id:{entry['id']}"
+    return f"title:{entry.get('title', '')}"
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[dict]], top_k: Optional[int] = None, k: int = RRF_K,
+                           weights: Optional[Dict[str, float]] = None) -> List[dict]:
+    """
+    Объединение ранжированных списков методом RRF
+
+    Args:
+        rankings: выдача каждого движка ({имя движка: список записей по убыванию релевантности})
+        top_k: количество возвращаемых записей (None — все)
+        k: сглаживающая константа RRF
+        weights: веса движков (по умолчанию 1)
+
+    Returns:
+        Копии записей с полями fusion_score и matched_by, по убыванию fusion_score;
+        при равенстве — в порядке первого появления
+    """
+    weights = weights or {}
+    fused = {}
+    for engine, entries in rankings.items():
+        weight = weights.get(engine, 1.0)
+        for rank, entry in enumerate(entries, start=1):
+            key = entry_key(entry)
+            item = fused.get(key)
+            if item is None:
+                item = fused[key] = {"entry": entry, "score": 0.0, "engines": [], "order": len(fused)}
+            elif "relevance_score" in entry and "relevance_score" not in item["entry"]:
+                # Сохраняем оценку семантического движка, если запись сначала пришла без нее
+                item["entry"] = entry
+            item["score"] += weight / (k + rank)
+            if engine not in item["engines"]:
+                item["engines"].append(engine)
+
+    ordered = sorted(fused.values(), key=lambda item: (-item["score"], item["order"]))
+    if top_k is not None:
+        ordered = ordered[:top_k]
+    results = []
+    for item in ordered:
+        entry = dict(item["entry"])
+        entry["fusion_score"] = item["score"]
+        entry["matched_by"] = item["engines"]
+        results.append(entry)
+    return results
+
+
+def run_hybrid_search(engines: Dict[str, Callable[[], List[dict]]], timeouts: Dict[str, float],
+                      top_k: Optional[int] = None, weights: Optional[Dict[str, float]] = None) -> dict:
+    """
+    Параллельный запуск движков и объединение их выдачи
+
+    Args:
+        engines: {имя движка: функция без аргументов, возвращающая список записей}
+        timeouts: бюджет времени каждого движка в секундах от начала запроса
+        top_k: количество возвращаемых записей
+        weights: веса движков для RRF
+
+    Returns:
+        Словарь {"entries": объединенная выдача, "partial": не все движки ответили,
+        "engines": {имя движка: "ok" | "timeout" | "error"}}
+    """
+    started = time.monotonic()
+    executor = _get_executor()
+    futures = {name: executor.submit(engine) for name, engine in engines.items()}
+
+    rankings, statuses = {}, {}
+    for name, future in futures.items():
+        remaining = timeouts.get(name, 0) - (time.monotonic() - started)
+        try:
+            rankings[name] = future.result(timeout=max(remaining, 0))
+            statuses[name] = "ok"
+        except FutureTimeoutError:
+            # Задачу нельзя прервать: она завершится в пуле, а ее результат будет отброшен
+            future.cancel()
+            statuses[name] = "timeout"
+        except Exception as e:
+            print(f"[ERROR] Движок поиска {name} завершился с ошибкой: {e}")
+            statuses[name] = "error"
+
+    return {
+        "entries": reciprocal_rank_fusion(rankings, top_k=top_k, weights=weights),
+        "partial": any(status != "ok" for status in statuses.values()),
+        "engines": statuses,
+    }
@@ -0,0 +1,279 @@
+"""
+Инвертированный индекс для синтаксического поиска (AND, OR, NOT и фразы в кавычках)
+"""
+import re
+import threading
+from typing import Dict, List, Optional, Set
+
+from facets import FacetIndex, SearchFilters, resolve_filters
+from syntax_query import Not, Phrase, Term, compile_query
+
+TOKEN_PATTERN = re.compile(r"\w+")
+FIELDS = ("title", "content")
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбивает текст на нормализованные (в нижнем регистре) слова"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SyntaxSearchIndex:
+    """
+    Инвертированный индекс по полям title и content.
+
+    Запрос вычисляется операциями над списками вхождений (пересечение, объединение,
+    разность), а точная проверка подстроки выполняется только для кандидатов.
+    Как и прежний поиск, слово запроса совпадает с любым словом текста, которое
+    его содержит, а запись найдена, если запрос выполняется для заголовка или для содержания.
+    Фильтры по фасетам ограничивают множество строк, по которому вычисляется запрос.
+    """
+
+    def __init__(self, tombstone_threshold=0.25):
+        """
+        Инициализация индекса
+
+        Args:
+            tombstone_threshold: доля удаленных строк, после которой индекс строится заново
+        """
+        self.tombstone_threshold = tombstone_threshold
+        self.version = None
+        self.store = None
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._rows = []
+        self._live = set()
+        self._positions = {}
+        self._texts = {field: [] for field in FIELDS}
+        self._row_tokens = {field: [] for field in FIELDS}
+        self._postings: Dict[str, Dict[str, Set[int]]] = {field: {} for field in FIELDS}
+        self._term_cache = {}
+        self._facets = FacetIndex()
+        self._stale = False
+
+    def build(self, data: List[dict], version: Optional[int] = None):
+        """
+        Полное построение индекса
+
+        Args:
+            data: список записей базы знаний
+            version: версия хранилища, соответствующая данным
+        """
+        with self._lock:
+            self._reset()
+            for entry in data:
+                self._append_row(entry)
+            self.version = version
+
+    def attach_store(self, store):
+        """
+        Подключает индекс к хранилищу: построение один раз, затем инкрементальные обновления
+
+        Args:
+            store: экземпляр document_store.DocumentStore
+        """
+        with self._lock:
+            self.store = store
+            store.subscribe(self.apply_change)
+            snapshot = store.snapshot()
+            self.build(snapshot.entries, snapshot.version)
+
+    def apply_change(self, op: str, old_entry: Optional[dict], new_entry: Optional[dict], snapshot):
+        """Применяет изменение хранилища к индексу"""
+        with self._lock:
+            if op == "reload" or self._stale:
+                self._stale = True
+                return
+            if old_entry is not None:
+                self._remove_row(old_entry)
+            if new_entry is not None:
+                self._append_row(new_entry)
+            self.version = snapshot.version
+            deleted = len(self._rows) - len(self._live)
+            if self._rows and deleted / len(self._rows) > self.tombstone_threshold:
+                self.build(snapshot.entries, snapshot.version)
+
+    def ensure_current(self):
+        """Перестраивает индекс, если он отстал от подключенного хранилища"""
+        if self.store is None:
+            return
+        snapshot = self.store.snapshot()
+        with self._lock:
+            if self._stale or self.version != snapshot.version:
+                self.build(snapshot.entries, snapshot.version)
+
+    def _append_row(self, entry: dict):
+        row = len(self._rows)
+        self._rows.append(entry)
+        self._live.add(row)
+        if entry.get("id") is not None:
+            self._positions[str(entry["id"])] = row
+        self._facets.add(row, entry)
+        for field in FIELDS:
+            text = str(entry.get(field) or "").lower()
+            tokens = set(TOKEN_PATTERN.findall(text))
+            self._texts[field].append(text)
+            self._row_tokens[field].append(tokens)
+            postings = self._postings[field]
+            for token in tokens:
+                postings.setdefault(token, set()).add(row)
+        self._term_cache.clear()
+
+    def _remove_row(self, entry: dict):
+        row = self._positions.pop(str(entry.get("id")), None)
+        if row is None:
+            return
+        self._live.discard(row)
+        self._facets.remove(row, self._rows[row])
+        self._rows[row] = None
+        for field in FIELDS:
+            postings = self._postings[field]
+            for token in self._row_tokens[field][row]:
+                rows = postings.get(token)
+                if rows is not None:
+                    rows.discard(row)
+                    if not rows:
+                        del postings[token]
+            self._row_tokens[field][row] = set()
+            self._texts[field][row] = ""
+        self._term_cache.clear()
+
+    def _word_rows(self, field: str, word: str) -> Set[int]:
+        """Строки, в поле которых есть слово, содержащее word (как подстрока)"""
+        key = (field, word)
+        cached = self._term_cache.get(key)
+        if cached is not None:
+            return cached
+        postings = self._postings[field]
+        rows = set(postings.get(word, ()))
+        # Подстрока внутри более длинных слов — просмотр словаря, а не текста корпуса
+        for token, token_rows in postings.items():
+            if word in token and token != word:
+                rows |= token_rows
+        self._term_cache[key] = rows
+        return rows
+
+    def _substring_rows(self, field: str, text: str, universe: Optional[Set[int]] = None) -> Set[int]:
+        """Строки, в поле которых встречается text как подстрока (только из universe, если задано)"""
+        pieces = TOKEN_PATTERN.findall(text)
+        if len(pieces) == 1 and pieces[0] == text:
+            return self._word_rows(field, text)
+        if pieces:
+            # Кандидаты — пересечение списков для всех слов фразы, начиная с самого короткого
+            candidate_sets = sorted((self._word_rows(field, piece) for piece in pieces), key=len)
+            candidates = set(candidate_sets[0])
+            for rows in candidate_sets[1:]:
+                candidates &= rows
+                if not candidates:
+                    break
+        else:
+            candidates = set(self._live)
+        if universe is not None and not (len(pieces) == 1 and pieces[0] == text):
+            candidates &= universe
+        texts = self._texts[field]
+        return {row for row in candidates if text in texts[row]}
+
+    def search_rows(self, query: str, filters: Optional[SearchFilters] = None) -> List[int]:
+        """
+        Номера строк индекса, удовлетворяющих запросу, в порядке записей базы
+
+        Args:
+            query: поисковый запрос
+            filters: фильтры по фасетам
+        """
+        compiled = compile_query(query)
+        if compiled.is_empty:
+            return []
+        with self._lock:
+            universe = self._facets.rows(filters)
+            universe = self._live if universe is None else universe & self._live
+            if not universe:
+                return []
+            rows = set()
+            for field in FIELDS:
+                rows |= compiled.evaluate(_FieldBackend(self, field, universe))
+            return sorted(rows & universe)
+
+    def search(self, query: str, topic: Optional[str] = None, filters: Optional[SearchFilters] = None) -> List[dict]:
+        """
+        Синтаксический поиск по заголовку и содержанию
+
+        Args:
+            query: поисковый запрос
+            topic: тема для фильтрации ("Все темы" или пусто — без фильтра)
+            filters: фильтры по фасетам (тема, класс, параллель, предмет, автор, даты)
+
+        Returns:
+            Список найденных записей в порядке базы знаний
+        """
+        self.ensure_current()
+        with self._lock:
+            return [self._rows[row] for row in self.search_rows(query, resolve_filters(filters, topic))]
+
+
+class _FieldBackend:
+    """
+    Исполнитель скомпилированного запроса по одному полю индекса: операции над множествами строк.
+
+    AND начинает с самого узкого операнда и прекращает вычисление, как только
+    пересечение стало пустым; NOT внутри AND вычитается из уже найденных строк.
+    Отрицание и проверка фраз ограничены строками universe (живые строки, прошедшие фильтры).
+    """
+
+    def __init__(self, index: SyntaxSearchIndex, field: str, universe: Set[int]):
+        self.index = index
+        self.field = field
+        self.universe = universe
+
+    def empty(self) -> Set[int]:
+        return set()
+
+    def term(self, word: str) -> Set[int]:
+        return self.index._substring_rows(self.field, word)
+
+    def phrase(self, text: str) -> Set[int]:
+        return self.index._substring_rows(self.field, text, self.universe)
+
+    def and_(self, children) -> Set[int]:
+        positive = [child for child in children if not isinstance(child, Not)]
+        negative = [child.child for child in children if isinstance(child, Not)]
+        if positive:
+            # Сначала простые операнды (слова и фразы), затем составные подвыражения
+            positive.sort(key=lambda child: not isinstance(child, (Term, Phrase)))
+            result = None
+            for child in positive:
+                rows = child.evaluate(self)
+                result = set(rows) if result is None else result & rows
+                if not result:
+                    return set()
+        else:
+            result = set(self.universe)
+        for child in negative:
+            result -= child.evaluate(self)
+            if not result:
+                break
+        return result
+
+    def or_(self, children) -> Set[int]:
+        result = set()
+        for child in children:
+            result |= child.evaluate(self)
+        return result
+
+    def not_(self, child) -> Set[int]:
+        return self.universe - child.evaluate(self)
+
+
+# Глобальный индекс синтаксического поиска
+syntax_index = SyntaxSearchIndex()
+
+
+def attach_syntax_index(store):
+    """
+    Однократное построение индекса по хранилищу с последующими инкрементальными обновлениями
+
+    Args:
+        store: экземпляр document_store.DocumentStore
+    """
+    syntax_index.attach_store(store)
@@ -0,0 +1,97 @@
+"""
+Ленивый доступ к ресурсам NLTK без обращения к сети.
+
+Ресурсы (стоп-слова, лемматизатор, токенизатор) ищутся только локально.
+Если ресурс не установлен, используется простая замена, а скачивание
+выполняется лишь явным вызовом download_nltk_resources (например, из демо-скриптов).
+"""
+import re
+import threading
+from functools import lru_cache
+
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    "stopwords": "corpora/stopwords",
+    "wordnet": "corpora/wordnet",
+}
+
+WORD_PATTERN = re.compile(r"\w+")
+
+_tokenizer_lock = threading.Lock()
+_nltk_tokenizer_available = None
+
+
+@lru_cache(maxsize=None)
+def has_nltk_resource(name: str) -> bool:
+    """
+    Проверяет, установлен ли ресурс NLTK локально (без скачивания)
+
+    Args:
+        name: ключ из NLTK_RESOURCES
+    """
+    try:
+        import nltk
+        nltk.data.find(NLTK_RESOURCES[name])
+        return True
+    except (ImportError, LookupError):
+        return False
+
+
+def download_nltk_resources(names=tuple(NLTK_RESOURCES)):
+    """
+    Явное скачивание недостающих ресурсов NLTK (обращается к сети)
+
+    Args:
+        names: ключи ресурсов из NLTK_RESOURCES
+    """
+    import nltk
+
+    for name in names:
+        if not has_nltk_resource(name):
+            nltk.download(name)
+    has_nltk_resource.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_stop_words() -> frozenset:
+    """Стоп-слова английского и русского языков (пустое множество, если корпус не установлен)"""
+    if not has_nltk_resource("stopwords"):
+        return frozenset()
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english')).union(stopwords.words('russian'))
+
+
+class _IdentityLemmatizer:
+    """Замена лемматизатора, когда WordNet не установлен"""
+
+    def lemmatize(self, word: str) -> str:
+        return word
+
+
+def get_lemmatizer():
+    """Лемматизатор WordNet или замена, возвращающая слово без изменений"""
+    if not has_nltk_resource("wordnet"):
+        return _IdentityLemmatizer()
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer()
+
+
+def word_tokenize(text: str) -> list:
+    """
+    Токенизация текста: nltk.word_tokenize, если его модели установлены,
+    иначе разбиение по регулярному выражению
+    """
+    global _nltk_tokenizer_available
+    if _nltk_tokenizer_available is None:
+        with _tokenizer_lock:
+            if _nltk_tokenizer_available is None:
+                _nltk_tokenizer_available = has_nltk_resource("punkt") or has_nltk_resource("punkt_tab")
+    if _nltk_tokenizer_available:
+        from nltk.tokenize import word_tokenize as nltk_word_tokenize
+        try:
+            return nltk_word_tokenize(text)
+        except LookupError:
+            # Установлена только часть моделей токенизатора
+            _nltk_tokenizer_available = False
+    return WORD_PATTERN.findall(text)
@@ -0,0 +1,73 @@
+"""
+Постраничный вывод записей с курсорами (keyset pagination).
+
+Курсор указывает на последнюю показанную запись: ключ сортировки и ID записи.
+Следующая страница начинается сразу после этой записи, поэтому ее стоимость
+не зависит от номера страницы, а добавление и удаление записей не сдвигает
+уже показанные страницы.
+"""
+import os
+from typing import List, Optional, Tuple
+
+PAGE_SIZE = int(os.environ.get("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = 200
+
+
+def page_size(value=None) -> int:
+    """Размер страницы из параметра запроса, ограниченный MAX_PAGE_SIZE"""
+    try:
+        size = int(value) if value else PAGE_SIZE
+    except (TypeError, ValueError):
+        size = PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(key: int, entry_id) -> str:
+    """Курсор вида <ключ>_<ID записи>"""
+    return f"{key}_{entry_id}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[int, str]]:
+    """
+    Разбор курсора
+
+    Returns:
+        (ключ, ID записи) или None для пустого и поврежденного курсора
+    """
+    if not cursor:
+        return None
+    key, _, entry_id = cursor.partition("_")
+    try:
+        return int(key), entry_id
+    except ValueError:
+        return None
+
+
+def page_ranked(entries: List[dict], limit: int, after: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Страница упорядоченной по релевантности выдачи
+
+    Ключом курсора служит позиция записи в выдаче. Если выдача была
+    пересчитана и запись сместилась, страница продолжается после нее.
+
+    Args:
+        entries: вся выдача поиска
+        limit: размер страницы
+        after: курсор последней показанной записи
+
+    Returns:
+        (записи страницы, курсор следующей страницы или None)
+    """
+    start = 0
+    cursor = decode_cursor(after)
+    if cursor is not None:
+        position, entry_id = cursor
+        if 0 <= position < len(entries) and str(entries[position].get("id")) == entry_id:
+            start = position + 1
+        else:
+            ids = [str(entry.get("id")) for entry in entries]
+            start = ids.index(entry_id) + 1 if entry_id in ids else min(max(position + 1, 0), len(entries))
+    page = entries[start:start + limit]
+    if start + limit >= len(entries):
+        return page, None
+    return page, encode_cursor(start + limit - 1, page[-1].get("id"))
@@ -0,0 +1,96 @@
+"""
+Разбиение длинных текстов записей на перекрывающиеся фрагменты (passages).
+
+Содержание записи в базе знаний остается кратким (предпросмотр), а полный текст
+прикрепленного документа хранится в закрытом каталоге full_texts (вне static,
+чтобы он не раздавался как загруженный файл) в виде <файл>.txt и читается только
+при построении индекса поиска. Каждый фрагмент индексируется отдельно и ссылается
+на свою запись.
+"""
+import os
+import tempfile
+from typing import List, Optional
+
+# Длина фрагмента и перекрытие соседних фрагментов в словах
+PASSAGE_WORDS = 150
+PASSAGE_OVERLAP = 30
+
+FULL_TEXT_SUFFIX = ".txt"
+UPLOAD_FOLDER = "static/uploads"
+FULL_TEXT_FOLDER = "full_texts"
+
+
+def split_passages(text: str, size: int = PASSAGE_WORDS, overlap: int = PASSAGE_OVERLAP) -> List[str]:
+    """
+    Разбиение текста на фрагменты по словам с перекрытием
+
+    Args:
+        text: исходный текст
+        size: количество слов во фрагменте
+        overlap: количество слов, общих для соседних фрагментов
+
+    Returns:
+        Список фрагментов (пустой текст дает один пустой фрагмент)
+    """
+    words = text.split()
+    if len(words) <= size:
+        return [" ".join(words)]
+    step = max(size - overlap, 1)
+    passages = []
+    for start in range(0, len(words), step):
+        passages.append(" ".join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+    return passages
+
+
+def full_text_path(file_path: str, folder: str = FULL_TEXT_FOLDER) -> str:
+    """Путь к файлу с полным текстом прикрепленного документа (по имени вложения)"""
+    return os.path.join(folder, os.path.basename(file_path) + FULL_TEXT_SUFFIX)
+
+
+def has_full_text(file_path: str, folder: str = FULL_TEXT_FOLDER) -> bool:
+    """Сохранен ли полный текст документа и не старше ли он самого документа"""
+    try:
+        return os.path.getmtime(full_text_path(file_path, folder)) >= os.path.getmtime(file_path)
+    except OSError:
+        return False
+
+
+def save_full_text(file_path: str, text: str, folder: str = FULL_TEXT_FOLDER):
+    """Атомарно сохраняет полный текст прикрепленного документа"""
+    path = full_text_path(file_path, folder)
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".full_text_", suffix=FULL_TEXT_SUFFIX, dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def remove_full_text(file_path: str, folder: str = FULL_TEXT_FOLDER):
+    """Удаляет полный текст документа вместе с самим файлом"""
+    path = full_text_path(file_path, folder)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def read_full_text(entry: dict, folder: str = FULL_TEXT_FOLDER) -> Optional[str]:
+    """
+    Полный текст прикрепленного к записи документа
+
+    Returns:
+        Текст или None, если у записи нет файла или полный текст не извлекался
+    """
+    filename = entry.get("file")
+    if not filename:
+        return None
+    try:
+        with open(full_text_path(filename, folder), encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
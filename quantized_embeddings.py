@@ -0,0 +1,186 @@
+"""
+Квантованная матрица эмбеддингов в файле, общем для всех рабочих процессов.
+
+Нормированные эмбеддинги сохраняются в формате .npy как float16 или int8
+(со своим масштабом для каждого вектора) и открываются через np.load(mmap_mode="r").
+Страницы файла находятся в общем кэше операционной системы, поэтому процессы
+gunicorn не держат собственные копии матрицы float32. Сходство вычисляется прямо
+по квантованным данным блоками, без полного восстановления матрицы.
+
+Имя файла содержит отпечаток эмбеддингов: новая версия данных записывается
+в новый файл, а процессы, открывшие старую версию, продолжают её читать.
+"""
+import glob
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from ann_index import embeddings_fingerprint, normalize_rows
+
+QUANTIZATION_MODES = ("int8", "float16")
+
+# Количество строк, восстанавливаемых во float32 за один шаг при полном просмотре
+SCORE_CHUNK_ROWS = 16384
+
+
+def quantize(vectors: np.ndarray, mode: str):
+    """
+    Квантует нормированные векторы
+
+    Args:
+        vectors: массив float32 формы (количество, размерность)
+        mode: "int8" или "float16"
+
+    Returns:
+        Кортеж (коды, масштабы); для float16 масштабы равны None
+    """
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    if mode != "int8":
+        raise ValueError(f"Неизвестный режим квантования: {mode}")
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _save_npy(path: str, array: np.ndarray):
+    """Атомарная запись массива в формате .npy"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".quantized_", suffix=".npy", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class QuantizedEmbeddings:
+    """Квантованные нормированные эмбеддинги, отображенные в память только для чтения"""
+
+    def __init__(self, codes: np.ndarray, scales: Optional[np.ndarray], mode: str, fingerprint: str = None):
+        self.codes = codes
+        self.scales = scales
+        self.mode = mode
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        """Объем данных (для сравнения с матрицей float32)"""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    @staticmethod
+    def path_for(prefix: str, fingerprint: str, mode: str) -> str:
+        """Путь к файлу кодов для указанной версии эмбеддингов"""
+        return f"{prefix}.{fingerprint[:16]}.{mode}.npy"
+
+    @classmethod
+    def from_embeddings(cls, embeddings: np.ndarray, mode: str = "int8") -> "QuantizedEmbeddings":
+        """Квантует эмбеддинги в памяти (без файла)"""
+        codes, scales = quantize(normalize_rows(embeddings), mode)
+        return cls(codes, scales, mode, embeddings_fingerprint(embeddings))
+
+    @classmethod
+    def open_or_create(cls, prefix: str, embeddings: np.ndarray, mode: str = "int8") -> "QuantizedEmbeddings":
+        """
+        Открывает файл квантованных эмбеддингов этой версии данных или создает его
+
+        Args:
+            prefix: путь к файлам без расширения (например, рядом с кэшем эмбеддингов)
+            embeddings: эмбеддинги документов float32
+            mode: "int8" или "float16"
+
+        Returns:
+            QuantizedEmbeddings, отображенные в память
+        """
+        fingerprint = embeddings_fingerprint(embeddings)
+        codes_file = cls.path_for(prefix, fingerprint, mode)
+        scales_file = codes_file[:-len(".npy")] + ".scales.npy"
+        if not os.path.exists(codes_file):
+            codes, scales = quantize(normalize_rows(embeddings), mode)
+            # Масштабы пишутся первыми: наличие файла кодов означает, что версия записана целиком
+            if scales is not None:
+                _save_npy(scales_file, scales)
+            _save_npy(codes_file, codes)
+            cls._remove_old_versions(prefix, mode, keep=codes_file)
+        codes = np.load(codes_file, mmap_mode="r")
+        scales = np.load(scales_file, mmap_mode="r") if mode == "int8" else None
+        return cls(codes, scales, mode, fingerprint)
+
+    @staticmethod
+    def _remove_old_versions(prefix: str, mode: str, keep: str):
+        keep_prefix = keep[:-len(".npy")]
+        for path in glob.glob(f"{glob.escape(prefix)}.*.{mode}*.npy"):
+            if not path.startswith(keep_prefix):
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Файл еще открыт другим процессом (Windows) — он будет удален при следующей смене версии
+                    pass
+
+    def score(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Косинусное сходство запроса с документами
+
+        Args:
+            query: эмбеддинг запроса
+            rows: номера документов (по умолчанию — все)
+
+        Returns:
+            Массив float32 со сходством для каждого документа
+        """
+        query = normalize_rows(query)[0]
+        if rows is not None:
+            return self._score_block(self.codes[rows], None if self.scales is None else self.scales[rows], query)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_CHUNK_ROWS):
+            end = start + SCORE_CHUNK_ROWS
+            scales = None if self.scales is None else self.scales[start:end]
+            scores[start:end] = self._score_block(self.codes[start:end], scales, query)
+        return scores
+
+    def score_batch(self, queries: np.ndarray) -> np.ndarray:
+        """
+        Косинусное сходство пакета запросов со всеми документами (одно матричное произведение на блок)
+
+        Args:
+            queries: эмбеддинги запросов формы (количество запросов, размерность)
+
+        Returns:
+            Массив float32 формы (количество запросов, количество документов)
+        """
+        queries = normalize_rows(queries)
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_CHUNK_ROWS):
+            end = start + SCORE_CHUNK_ROWS
+            block = self.codes[start:end].astype(np.float32) @ queries.T
+            if self.scales is not None:
+                block *= np.asarray(self.scales[start:end])[:, None]
+            scores[:, start:end] = block.T
+        return scores
+
+    @staticmethod
+    def _score_block(codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        scores = codes.astype(np.float32) @ query
+        if scales is not None:
+            scores *= scales
+        return scores
+
+    def to_array(self) -> np.ndarray:
+        """Восстанавливает нормированные эмбеддинги float32"""
+        vectors = np.asarray(self.codes, dtype=np.float32)
+        if self.scales is not None:
+            vectors = vectors * np.asarray(self.scales)[:, None]
+        return vectors
@@ -0,0 +1,101 @@
+"""
+Кэш результатов поиска в памяти процесса (LRU с необязательным сроком жизни).
+
+Ключ включает версию хранилища записей: любое изменение базы знаний увеличивает
+версию, и старые результаты перестают находиться без явной очистки кэша.
+Устаревшие записи вытесняются по мере заполнения как наименее используемые.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+
+def normalize_query(query: str) -> str:
+    """Нормализация запроса для ключа кэша: регистр и лишние пробелы не влияют на результат поиска"""
+    return " ".join(query.split()).lower()
+
+
+class ResultCache:
+    """Потокобезопасный LRU-кэш результатов со счетчиками попаданий и промахов"""
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None):
+        """
+        Инициализация кэша
+
+        Args:
+            max_entries: максимальное количество хранимых результатов
+            ttl: срок жизни результата в секундах (None — без ограничения)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable):
+        """
+        Результат по ключу (учитывается в счетчиках)
+
+        Returns:
+            Сохраненное значение или None
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[1] > self.ttl:
+                del self._entries[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value):
+        """Сохраняет результат, вытесняя наименее используемые при переполнении"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable):
+        """
+        Результат из кэша или вычисленный и сохраненный
+
+        Вычисление выполняется вне блокировки: одновременные промахи по одному ключу
+        могут посчитать результат дважды, но не задерживают другие запросы.
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Удаляет все результаты (счетчики сохраняются)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Счетчики кэша для мониторинга"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
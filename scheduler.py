@@ -4,6 +4,7 @@ import time
 import threading
 from flask import current_app
 from backup_system import create_daily_backup
+from document_store import compact_knowledge_base
 
 def background_job(app):
     with app.app_context():  # Явно передаем и используем app
@@ -13,12 +14,15 @@ def background_job(app):
 
 def start_scheduler(app):
     # Регистрация задач
-    from utils import sync_edsoo
+    from utils import backfill_full_texts, sync_edsoo
     schedule.every().monday.at("00:00").do(sync_edsoo)
     
     # Ежедневное резервное копирование в полночь
     schedule.every().day.at("00:00").do(create_daily_backup)
 
+    # Перенос журнала изменений базы знаний в снимок
+    schedule.every(10).minutes.do(compact_knowledge_base)
+
     # Запуск в отдельном потоке
     def run_scheduler():
         with app.app_context():  # Убедимся, что контекст доступен
@@ -27,4 +31,7 @@ def start_scheduler(app):
                 time.sleep(60)
 
     thread = threading.Thread(target=run_scheduler, daemon=True)
-    thread.start()
\ No newline at end of file
+    thread.start()
+
+    # Однократное извлечение полных текстов вложений, добавленных до поиска по фрагментам
+    threading.Thread(target=backfill_full_texts, daemon=True).start()
\ No newline at end of file
@@ -3,29 +3,10 @@ from typing import List, Dict, Tuple
 import re
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
 import string
 import pickle
 import os
-
-# Загрузка необходимых ресурсов NLTK
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet')
+from nlp_resources import download_nltk_resources, get_lemmatizer, get_stop_words, word_tokenize
 
 class SemanticSearchEngine:
     """
@@ -38,8 +19,9 @@ class SemanticSearchEngine:
         self.processed_docs = []
         self.vectorizer = None
         self.doc_vectors = None
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english')).union(set(stopwords.words('russian')))
+        # Ресурсы NLTK ищутся только локально; при их отсутствии используется простая замена
+        self.lemmatizer = get_lemmatizer()
+        self.stop_words = get_stop_words()
         
     def preprocess_text(self, text: str) -> str:
         """
@@ -174,4 +156,6 @@ def main():
             print("Не найдено релевантных документов.")
 
 if __name__ == "__main__":
+    # Скачивание недостающих ресурсов NLTK выполняется только при явном запуске демонстрации
+    download_nltk_resources()
     main()
\ No newline at end of file
@@ -1,9 +1,14 @@
 """
 Модуль интеграции семантического поиска в основное приложение
 """
+import threading
 import numpy as np
-from typing import List, Tuple
-from advanced_semantic_search import AdvancedSemanticSearchEngine
+from typing import Dict, List, Optional, Tuple
+from syntax_query import syntax_aware_search  # noqa: F401
+from facets import FacetIndex, SearchFilters, resolve_filters
+from hybrid_search import run_hybrid_search
+from inverted_index import syntax_index
+from simple_semantic_search_integration import COMBINED_TIMEOUTS
 
 
 class IntegratedSearchSystem:
@@ -18,10 +23,15 @@ class IntegratedSearchSystem:
         Args:
             data_file: путь к файлу с базой знаний
         """
+        # Трансформерная модель импортируется и загружается только при создании системы
+        from advanced_semantic_search import AdvancedSemanticSearchEngine, EMBEDDING_CACHE_DIR
+
         self.data_file = data_file
-        self.semantic_search_engine = AdvancedSemanticSearchEngine()
+        self.semantic_search_engine = AdvancedSemanticSearchEngine(cache_dir=EMBEDDING_CACHE_DIR,
+                                                                   local_files_only=True)
         self.documents = []
         self.data = []
+        self._facets = FacetIndex()
         
     def load_documents(self, data: List[dict]):
         """
@@ -39,15 +49,20 @@ class IntegratedSearchSystem:
             semantic_docs.append(combined_text.strip())
         
         self.documents = semantic_docs
+        self._facets.clear()
+        for position, entry in enumerate(data):
+            self._facets.add(position, entry)
         self.semantic_search_engine.add_documents(semantic_docs)
         
-    def semantic_search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+    def semantic_search(self, query: str, top_k: int = 5,
+                        filters: Optional[SearchFilters] = None) -> List[Tuple[int, float]]:
         """
         Выполнение семантического поиска
         
         Args:
             query: поисковый запрос
             top_k: количество возвращаемых результатов
+            filters: фильтры по фасетам (сходство считается только для прошедших их документов)
             
         Returns:
             Список кортежей (индекс документа, оценка релевантности)
@@ -55,7 +70,28 @@ class IntegratedSearchSystem:
         if not self.documents:
             return []
         
-        return self.semantic_search_engine.search(query, top_k)
+        rows = self._facets.rows(filters)
+        if rows is None:
+            return self.semantic_search_engine.search(query, top_k)
+        if not rows:
+            return []
+        return self.semantic_search_engine.search(query, top_k, rows=np.fromiter(rows, dtype=np.int64))
+    
+    def batch_semantic_search(self, queries: List[str], top_k: int = 5) -> List[List[Tuple[int, float]]]:
+        """
+        Семантический поиск по пакету запросов
+        
+        Args:
+            queries: список поисковых запросов
+            top_k: количество возвращаемых результатов на запрос
+            
+        Returns:
+            Для каждого запроса список кортежей (индекс документа, оценка релевантности)
+        """
+        if not self.documents:
+            return [[] for _ in queries]
+        
+        return self.semantic_search_engine.batch_search(queries, top_k)
     
     def get_document_by_index(self, idx: int) -> dict:
         """
@@ -72,8 +108,31 @@ class IntegratedSearchSystem:
         return None
 
 
-# Глобальная переменная для хранения системы поиска
-search_system = IntegratedSearchSystem()
+# Система поиска создается при первом обращении (см. get_search_system)
+_search_system = None
+_search_system_lock = threading.Lock()
+
+
+def get_search_system():
+    """
+    Возвращает систему поиска, создавая её при первом обращении
+    
+    Если трансформерная модель или её зависимости недоступны локально,
+    используется система на основе TF-IDF (модель не скачивается из сети).
+    
+    Returns:
+        IntegratedSearchSystem или SimpleIntegratedSearchSystem
+    """
+    global _search_system
+    with _search_system_lock:
+        if _search_system is None:
+            try:
+                _search_system = IntegratedSearchSystem()
+            except Exception as e:
+                from simple_semantic_search_integration import SimpleIntegratedSearchSystem
+                print(f"[WARNING] Трансформерная модель недоступна ({e}), используется поиск TF-IDF")
+                _search_system = SimpleIntegratedSearchSystem()
+        return _search_system
 
 
 def initialize_search_system(data: List[dict]):
@@ -83,10 +142,11 @@ def initialize_search_system(data: List[dict]):
     Args:
         data: список документов из базы знаний
     """
-    search_system.load_documents(data)
+    get_search_system().load_documents(data)
 
 
-def perform_integrated_search(query: str, search_type: str = "semantic", top_k: int = 10) -> List[dict]:
+def perform_integrated_search(query: str, search_type: str = "semantic", top_k: int = 10,
+                              topic: Optional[str] = None, filters: Optional[SearchFilters] = None) -> List[dict]:
     """
     Выполнение интегрированного поиска
     
@@ -94,13 +154,17 @@ def perform_integrated_search(query: str, search_type: str = "semantic", top_k:
         query: поисковый запрос
         search_type: тип поиска ("semantic", "syntax", "combined")
         top_k: количество возвращаемых результатов
+        topic: тема для фильтрации ("Все темы" или пусто — без фильтра)
+        filters: фильтры по фасетам (тема, класс, параллель, предмет, автор, даты)
         
     Returns:
         Список найденных документов
     """
+    filters = resolve_filters(filters, topic)
     if search_type == "semantic":
         # Семантический поиск
-        results = search_system.semantic_search(query, top_k)
+        search_system = get_search_system()
+        results = search_system.semantic_search(query, top_k, filters)
         found_entries = []
         for idx, score in results:
             entry = search_system.get_document_by_index(idx)
@@ -111,68 +175,65 @@ def perform_integrated_search(query: str, search_type: str = "semantic", top_k:
                 found_entries.append(entry_with_score)
         return found_entries
     
-    # Здесь можно добавить другие типы поиска (синтаксический, комбинированный)
+    if search_type == "syntax":
+        return syntax_index.search(query, filters=filters)[:top_k]
+    
+    if search_type == "combined":
+        return perform_combined_search(query, top_k, filters=filters)["entries"]
+    
     return []
 
 
-# Функция для синтаксического поиска (скопирована из app.py для полноты)
-def syntax_aware_search(text, query):
-    """
-    Performs syntax-aware search supporting:
-    - AND operator: "word1 AND word2"
-    - OR operator: "word1 OR word2" 
-    - NOT operator: "word1 NOT word2"
-    - Phrase search: "word1 word2" (both words present)
-    - Quoted phrases: "\"exact phrase\""
+def perform_combined_search(query: str, top_k: int = 10, topic: Optional[str] = None,
+                            timeouts: Optional[Dict[str, float]] = None,
+                            filters: Optional[SearchFilters] = None) -> dict:
     """
-    import re
-    # Normalize text and query to lowercase
-    text_lower = text.lower()
-    query = query.strip()
-    
-    # Handle quoted phrases first
-    quoted_phrases = re.findall(r'\"([^\"]*)\"', query)
-    query_without_quotes = re.sub(r'\"[^\"]*\"', '', query)
-    
-    # Check if all quoted phrases are present in the text
-    for phrase in quoted_phrases:
-        phrase = phrase.strip().lower()
-        if phrase and phrase not in text_lower:
-            return False
+    Комбинированный поиск: синтаксический и семантический движки выполняются параллельно,
+    а их выдача объединяется методом обратного ранга (RRF)
     
-    # Process the remaining query without quotes
-    terms = query_without_quotes.strip()
-    if not terms:
-        return len(quoted_phrases) > 0  # If only quotes were provided, return True if they matched
-    
-    # Split by AND, OR, NOT operators while preserving them
-    parts = re.split(r'\s+(AND|OR|NOT)\s+', terms, flags=re.IGNORECASE)
-    
-    # Process parts with operators
-    i = 0
-    result = True  # Start with True for AND logic
-    operator = 'AND'  # Default operator
-    
-    while i < len(parts):
-        part = parts[i].strip()
+    Args:
+        query: поисковый запрос
+        top_k: количество возвращаемых результатов
+        topic: тема для фильтрации ("Все темы" или пусто — без фильтра)
+        timeouts: бюджет времени движков в секундах (по умолчанию COMBINED_TIMEOUTS)
+        filters: фильтры по фасетам
         
-        if part.upper() in ['AND', 'OR', 'NOT']:
-            operator = part.upper()
-        else:
-            term = part.strip().lower()
-            if term:
-                term_exists = term in text_lower
-                
-                if operator == 'AND':
-                    result = result and term_exists
-                elif operator == 'OR':
-                    if i == 0:  # First term, initialize result
-                        result = term_exists
-                    else:
-                        result = result or term_exists
-                elif operator == 'NOT':
-                    result = result and not term_exists
+    Returns:
+        Словарь {"entries": найденные документы, "partial": ответили не все движки,
+        "engines": состояние каждого движка}
+    """
+    filters = resolve_filters(filters, topic)
+    engines = {
+        "syntax": lambda: perform_integrated_search(query, "syntax", top_k, filters=filters),
+        "semantic": lambda: perform_integrated_search(query, "semantic", top_k, filters=filters),
+    }
+    return run_hybrid_search(engines, timeouts or COMBINED_TIMEOUTS, top_k=top_k)
+
+
+def perform_batch_search(queries: List[str], search_type: str = "semantic", top_k: int = 10) -> List[List[dict]]:
+    """
+    Выполнение интегрированного поиска по пакету запросов
+    
+    Args:
+        queries: список поисковых запросов
+        search_type: тип поиска ("semantic", "syntax", "combined")
+        top_k: количество возвращаемых результатов на запрос
         
-        i += 1
+    Returns:
+        Для каждого запроса список найденных документов (в том же порядке, что и запросы)
+    """
+    if search_type != "semantic":
+        return [[] for _ in queries]
     
-    return result
\ No newline at end of file
+    search_system = get_search_system()
+    batch_results = []
+    for results in search_system.batch_semantic_search(queries, top_k):
+        found_entries = []
+        for idx, score in results:
+            entry = search_system.get_document_by_index(idx)
+            if entry:
+                entry_with_score = entry.copy()
+                entry_with_score['relevance_score'] = float(score)
+                found_entries.append(entry_with_score)
+        batch_results.append(found_entries)
+    return batch_results
@@ -1,38 +1,14 @@
 import numpy as np
 from typing import List, Tuple
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
+from sparse_scoring import search_top_k, to_scoring_matrix
 import string
 import pickle
 import os
+from nlp_resources import download_nltk_resources, get_lemmatizer, get_stop_words, word_tokenize
 import warnings
 warnings.filterwarnings('ignore')
 
-# Загрузка необходимых ресурсов NLTK
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-
-try:
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    nltk.download('punkt_tab')
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet')
-
 class SimpleSemanticSearchEngine:
     """
     Простой класс для реализации семантического поиска, который анализирует смысл и контекст запроса,
@@ -44,8 +20,9 @@ class SimpleSemanticSearchEngine:
         self.processed_docs = []
         self.vectorizer = None
         self.doc_vectors = None
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english')).union(set(stopwords.words('russian')))
+        # Ресурсы NLTK ищутся только локально; при их отсутствии используется простая замена
+        self.lemmatizer = get_lemmatizer()
+        self.stop_words = get_stop_words()
         
     def preprocess_text(self, text: str) -> str:
         """
@@ -76,7 +53,7 @@ class SimpleSemanticSearchEngine:
         
         # Создание векторизатора и векторов документов
         self.vectorizer = TfidfVectorizer()
-        self.doc_vectors = self.vectorizer.fit_transform(self.processed_docs)
+        self.doc_vectors = to_scoring_matrix(self.vectorizer.fit_transform(self.processed_docs))
     
     def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
         """
@@ -95,16 +72,8 @@ class SimpleSemanticSearchEngine:
         processed_query = self.preprocess_text(query)
         query_vector = self.vectorizer.transform([processed_query])
         
-        # Вычисление косинусного сходства между запросом и документами
-        similarities = cosine_similarity(query_vector, self.doc_vectors).flatten()
-        
-        # Получение индексов топ-K наиболее похожих документов
-        top_indices = similarities.argsort()[-top_k:][::-1]
-        
-        # Возврат пар (индекс, сходство) для топ-K результатов
-        results = [(idx, similarities[idx]) for idx in top_indices if similarities[idx] > 0]
-        
-        return results
+        # Косинусное сходство (строки нормированы) и пары (индекс, сходство) для топ-K результатов
+        return search_top_k(query_vector, self.doc_vectors, top_k)
     
     def save_model(self, filepath: str):
         """
@@ -132,7 +101,7 @@ class SimpleSemanticSearchEngine:
         self.documents = model_data['documents']
         self.processed_docs = model_data['processed_docs']
         self.vectorizer = model_data['vectorizer']
-        self.doc_vectors = model_data['doc_vectors']
+        self.doc_vectors = to_scoring_matrix(model_data['doc_vectors'])
 
 def demo_simple_search():
     """
@@ -202,5 +171,7 @@ def compare_approaches():
     print("Семантический поиск найдет этот документ благодаря пониманию смысла!")
 
 if __name__ == "__main__":
+    # Скачивание недостающих ресурсов NLTK выполняется только при явном запуске демонстрации
+    download_nltk_resources()
     demo_simple_search()
     compare_approaches()
\ No newline at end of file
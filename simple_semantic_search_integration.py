@@ -2,29 +2,89 @@
 Модуль интеграции упрощенного семантического поиска в основное приложение
 """
 import numpy as np
-from typing import List, Tuple
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
 import re
+from syntax_query import syntax_aware_search  # noqa: F401
+from facets import FacetIndex, SearchFilters, resolve_filters
+from hybrid_search import run_hybrid_search
+from inverted_index import syntax_index
+from passages import FULL_TEXT_FOLDER, PASSAGE_OVERLAP, PASSAGE_WORDS, read_full_text, split_passages
+
+# Бюджет времени движков комбинированного поиска (секунды от начала запроса)
+COMBINED_TIMEOUTS = {
+    "syntax": float(os.environ.get("COMBINED_SYNTAX_TIMEOUT", "0.5")),
+    "semantic": float(os.environ.get("COMBINED_SEMANTIC_TIMEOUT", "1.5")),
+}
 
 
 class SimpleIntegratedSearchSystem:
     """
-    Упрощенная интегрированная система поиска, объединяющая синтаксический и семантический подходы
+    Упрощенная интегрированная система поиска, объединяющая синтаксический и семантический подходы.
+
+    Индекс строится один раз, а добавление, изменение и удаление записей применяются
+    как изменения отдельных строк матрицы. Строки новых записей накапливаются в буфере
+    и присоединяются к матрице одной операцией — при переполнении буфера или перед
+    ближайшим поиском. Полное переобучение векторайзера выполняется, только когда
+    доля новых слов или удаленных строк превышает порог.
+
+    Строки матрицы — перекрывающиеся фрагменты записей (для записей с прикрепленным
+    документом — фрагменты его полного текста). Оценки фрагментов объединяются
+    в оценку записи максимумом или суммой. Фильтры по фасетам превращаются в маску
+    допустимых строк до выбора лучших k.
+
+    scikit-learn импортируется при первом построении индекса; флаг ready
+    устанавливается, когда индекс построен и поиск не будет ждать его построения.
     """
     
-    def __init__(self, data_file="knowledge_base.json"):
+    def __init__(self, data_file="knowledge_base.json", drift_threshold=0.1, tombstone_threshold=0.25,
+                 merge_threshold=256, pooling="max", passage_words=PASSAGE_WORDS, passage_overlap=PASSAGE_OVERLAP,
+                 full_text_folder=FULL_TEXT_FOLDER):
         """
         Инициализация системы поиска
         
         Args:
             data_file: путь к файлу с базой знаний
+            drift_threshold: доля новых (отсутствующих в словаре) терминов относительно
+                размера словаря, после которой индекс строится заново
+            tombstone_threshold: доля удаленных строк матрицы, после которой индекс строится заново
+            merge_threshold: количество строк в буфере новых записей, после которого они
+                присоединяются к матрице, не дожидаясь поиска
+            pooling: объединение оценок фрагментов записи ("max" или "sum")
+            passage_words: длина фрагмента в словах
+            passage_overlap: перекрытие соседних фрагментов в словах
+            full_text_folder: каталог полных текстов прикрепленных документов
         """
         self.data_file = data_file
-        self.vectorizer = TfidfVectorizer()
+        self.drift_threshold = drift_threshold
+        self.tombstone_threshold = tombstone_threshold
+        self.merge_threshold = merge_threshold
+        self.pooling = pooling
+        self.passage_words = passage_words
+        self.passage_overlap = passage_overlap
+        self.full_text_folder = full_text_folder
+        self.vectorizer = None
         self.tfidf_matrix = None
         self.documents = []
         self.data = []
+        self.version = None
+        self.store = None
+        self.refit_count = 0
+        self._positions = {}
+        self._row_mask = np.zeros(0, dtype=bool)
+        self._row_entries = np.zeros(0, dtype=np.int64)
+        self._entry_rows = []
+        self._pending_rows = []
+        self._pending_mask = []
+        self._pending_entries = []
+        # Количество живых строк (фрагментов неудаленных записей) в матрице и буфере
+        self._live_rows = 0
+        self._facets = FacetIndex()
+        self._unseen_terms = set()
+        self._stale = False
+        self._lock = threading.RLock()
+        self.ready = threading.Event()
         
     def simple_preprocess(self, text):
         """Упрощенная предобработка текста"""
@@ -36,57 +96,246 @@ class SimpleIntegratedSearchSystem:
         text = ' '.join(text.split())
         return text
         
-    def load_documents(self, data: List[dict]):
+    def entry_passages(self, entry: dict) -> List[str]:
+        """
+        Фрагменты записи для индексации: полный текст прикрепленного документа
+        (или содержание записи), разбитый на части; заголовок добавляется к каждой части
+        """
+        body = read_full_text(entry, self.full_text_folder) or entry.get('content', '') or ''
+        title = entry.get('title', '') or ''
+        # Заголовок объединяется с каждым фрагментом для лучшего понимания контекста
+        return [
+            self.simple_preprocess(f"{title} {passage}".strip())
+            for passage in split_passages(body, self.passage_words, self.passage_overlap)
+        ]
+
+    def load_documents(self, data: List[dict], version: Optional[int] = None):
         """
-        Загрузка документов из базы знаний для семантического поиска
+        Загрузка документов из базы знаний для семантического поиска (полное построение индекса)
         
         Args:
             data: список документов из базы знаний
+            version: версия хранилища, соответствующая данным
+        """
+        with self._lock:
+            self.data = list(data)
+            # Подготовка фрагментов для семантического поиска
+            semantic_docs, row_entries, self._entry_rows = [], [], []
+            self._facets.clear()
+            for position, entry in enumerate(self.data):
+                self._facets.add(position, entry)
+                passages = self.entry_passages(entry)
+                self._entry_rows.append((len(semantic_docs), len(semantic_docs) + len(passages)))
+                semantic_docs.extend(passages)
+                row_entries.extend([position] * len(passages))
+            
+            self.documents = semantic_docs
+            self._positions = {
+                str(entry["id"]): position for position, entry in enumerate(self.data) if entry.get("id") is not None
+            }
+            self._row_mask = np.ones(len(semantic_docs), dtype=bool)
+            self._live_rows = len(semantic_docs)
+            self._row_entries = np.array(row_entries, dtype=np.int64)
+            self._pending_rows, self._pending_mask, self._pending_entries = [], [], []
+            self._unseen_terms = set()
+            self._stale = False
+            self.version = version
+            
+            # Создание TF-IDF матрицы
+            from sklearn.feature_extraction.text import TfidfVectorizer
+
+            self.vectorizer = TfidfVectorizer()
+            self.tfidf_matrix = None
+            if semantic_docs:
+                try:
+                    from sparse_scoring import to_scoring_matrix
+
+                    # Матрица хранится по столбцам: при поиске читаются только столбцы терминов запроса
+                    self.tfidf_matrix = to_scoring_matrix(self.vectorizer.fit_transform(semantic_docs))
+                except ValueError:
+                    # Пустой словарь (например, только стоп-символы)
+                    self.tfidf_matrix = None
+            self.refit_count += 1
+            self.ready.set()
+
+    def attach_store(self, store, build=True):
         """
-        self.data = data
-        # Подготовка документов для семантического поиска
-        # Объединяем заголовок и содержание для лучшего понимания контекста
-        semantic_docs = []
-        for entry in data:
-            combined_text = f"{entry.get('title', '')} {entry.get('content', '')}"
-            processed_text = self.simple_preprocess(combined_text.strip())
-            semantic_docs.append(processed_text)
+        Подключает систему поиска к хранилищу записей: индекс строится один раз,
+        а дальнейшие изменения применяются инкрементально
         
-        self.documents = semantic_docs
+        Args:
+            store: экземпляр document_store.DocumentStore
+            build: построить индекс сразу; иначе он строится при прогреве (warm_up) или первом поиске
+        """
+        with self._lock:
+            self.store = store
+            store.subscribe(self.apply_change)
+            if not build:
+                self._stale = True
+                return
+            snapshot = store.snapshot()
+            self.load_documents(snapshot.entries, snapshot.version)
+
+    def warm_up(self) -> bool:
+        """
+        Строит индекс заранее, чтобы первый поиск не ждал его построения
         
-        # Создание TF-IDF матрицы
-        if semantic_docs:
-            self.tfidf_matrix = self.vectorizer.fit_transform(semantic_docs)
+        Returns:
+            Значение флага готовности
+        """
+        self.ensure_current()
+        return self.ready.is_set()
+
+    def apply_change(self, op: str, old_entry: Optional[dict], new_entry: Optional[dict], snapshot):
+        """
+        Применяет изменение хранилища к индексу
         
-    def semantic_search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        Args:
+            op: тип изменения ("add", "update", "delete", "reload")
+            old_entry: запись до изменения
+            new_entry: запись после изменения
+            snapshot: срез хранилища после изменения
+        """
+        with self._lock:
+            if op == "reload" or self.tfidf_matrix is None or self._stale:
+                # Полная перестройка откладывается до ближайшего поиска
+                self._stale = True
+                return
+            if old_entry is not None:
+                self._remove_row(old_entry)
+            if new_entry is not None:
+                self._append_row(new_entry)
+            self.version = snapshot.version
+            if self._needs_refit():
+                self.load_documents(snapshot.entries, snapshot.version)
+            elif len(self._pending_mask) >= self.merge_threshold:
+                self._merge_pending()
+
+    def _append_row(self, entry: dict):
+        passages = self.entry_passages(entry)
+        vocabulary = self.vectorizer.vocabulary_
+        analyzer = self.vectorizer.build_analyzer()
+        for text in passages:
+            self._unseen_terms.update(term for term in analyzer(text) if term not in vocabulary)
+        # Строки копятся в буфере: присоединение к матрице стоит O(nnz) и выполняется один раз на пакет
+        self._pending_rows.append(self.vectorizer.transform(passages))
+        position = len(self.data)
+        self._entry_rows.append((len(self.documents), len(self.documents) + len(passages)))
+        self.documents.extend(passages)
+        self.data.append(entry)
+        self._facets.add(position, entry)
+        self._pending_mask.extend([True] * len(passages))
+        self._live_rows += len(passages)
+        self._pending_entries.extend([position] * len(passages))
+        if entry.get("id") is not None:
+            self._positions[str(entry["id"])] = position
+
+    def invalidate(self):
+        """Помечает индекс устаревшим (например, после извлечения полных текстов): он перестроится при поиске"""
+        with self._lock:
+            self._stale = True
+
+    def _remove_row(self, entry: dict):
+        position = self._positions.pop(str(entry.get("id")), None)
+        if position is not None:
+            start, end = self._entry_rows[position]
+            merged = len(self._row_mask)
+            # Строки записи живы, пока она не удалена: позиция снимается с учета один раз
+            self._live_rows -= end - start
+            self._row_mask[start:min(end, merged)] = False
+            for row in range(max(start, merged), end):
+                self._pending_mask[row - merged] = False
+            self._facets.remove(position, self.data[position])
+            self.data[position] = None
+
+    def _merge_pending(self):
+        """Присоединяет накопленные строки новых записей к матрице одной операцией"""
+        if not self._pending_rows:
+            return
+        from scipy.sparse import vstack
+
+        self.tfidf_matrix = vstack([self.tfidf_matrix] + self._pending_rows, format="csc")
+        self._row_mask = np.concatenate([self._row_mask, np.array(self._pending_mask, dtype=bool)])
+        self._row_entries = np.concatenate([self._row_entries, np.array(self._pending_entries, dtype=np.int64)])
+        self._pending_rows, self._pending_mask, self._pending_entries = [], [], []
+
+    def _needs_refit(self) -> bool:
+        vocabulary_size = max(len(self.vectorizer.vocabulary_), 1)
+        if len(self._unseen_terms) / vocabulary_size > self.drift_threshold:
+            return True
+        rows = len(self._row_mask) + len(self._pending_mask)
+        return rows > 0 and (rows - self._live_rows) / rows > self.tombstone_threshold
+
+    def ensure_current(self):
+        """Перестраивает индекс, если он отстал от подключенного хранилища"""
+        if self.store is None:
+            return
+        snapshot = self.store.snapshot()
+        with self._lock:
+            if self._stale or self.version != snapshot.version:
+                self.load_documents(snapshot.entries, snapshot.version)
+        
+    def _search_mask(self, filters: Optional[SearchFilters]) -> np.ndarray:
+        """Маска допустимых строк матрицы: живые фрагменты записей, прошедших фильтры"""
+        entry_mask = self._facets.mask(filters, len(self.data))
+        if entry_mask is None:
+            return self._row_mask
+        return self._row_mask & entry_mask[self._row_entries]
+
+    def semantic_search(self, query: str, top_k: int = 5,
+                        filters: Optional[SearchFilters] = None) -> List[Tuple[int, float]]:
         """
         Выполнение семантического поиска
         
         Args:
             query: поисковый запрос
             top_k: количество возвращаемых результатов
+            filters: фильтры по фасетам (применяются до выбора лучших k)
             
         Returns:
             Список кортежей (индекс документа, оценка релевантности)
         """
-        if not self.documents or self.tfidf_matrix is None:
-            return []
-        
-        processed_query = self.simple_preprocess(query)
-        query_vec = self.vectorizer.transform([processed_query])
-        
-        # Вычисление косинусного сходства
-        similarities = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
-        
-        # Получение топ-k результатов
-        top_indices = similarities.argsort()[-top_k:][::-1]
-        
-        results = []
-        for idx in top_indices:
-            if similarities[idx] > 0:
-                results.append((idx, similarities[idx]))
+        self.ensure_current()
+        with self._lock:
+            if not self.documents or self.tfidf_matrix is None:
+                return []
+            
+            from sparse_scoring import search_top_k
+
+            self._merge_pending()
+            processed_query = self.simple_preprocess(query)
+            query_vec = self.vectorizer.transform([processed_query])
+            
+            # Косинусное сходство фрагментов (строки нормированы), объединение в оценки записей
+            # и выбор топ-k; фрагменты удаленных записей не участвуют в выдаче
+            return search_top_k(query_vec, self.tfidf_matrix, top_k, self._search_mask(filters),
+                                self._row_entries, len(self.data), self.pooling)
+    
+    def batch_semantic_search(self, queries: List[str], top_k: int = 5,
+                              filters: Optional[SearchFilters] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Семантический поиск по пакету запросов: все запросы векторизуются одним вызовом
+        и оцениваются под одной блокировкой индекса
         
-        return results
+        Args:
+            queries: список поисковых запросов
+            top_k: количество результатов на запрос
+            filters: фильтры по фасетам, общие для всех запросов
+            
+        Returns:
+            Для каждого запроса список кортежей (индекс документа, оценка релевантности)
+        """
+        self.ensure_current()
+        with self._lock:
+            if not queries or not self.documents or self.tfidf_matrix is None:
+                return [[] for _ in queries]
+            
+            from sparse_scoring import batch_search_top_k
+
+            self._merge_pending()
+            query_matrix = self.vectorizer.transform([self.simple_preprocess(query) for query in queries])
+            return batch_search_top_k(query_matrix, self.tfidf_matrix, top_k, self._search_mask(filters),
+                                      self._row_entries, len(self.data), self.pooling)
     
     def get_document_by_index(self, idx: int) -> dict:
         """
@@ -117,7 +366,48 @@ def initialize_search_system(data: List[dict]):
     search_system.load_documents(data)
 
 
-def perform_integrated_search(query: str, search_type: str = "semantic", top_k: int = 10) -> List[dict]:
+def attach_search_system(store, build=True):
+    """
+    Однократное построение индекса по хранилищу с последующими инкрементальными обновлениями
+    
+    Args:
+        store: экземпляр document_store.DocumentStore
+        build: построить индекс сразу (False — отложить до warm_up_search_system или первого поиска)
+    """
+    search_system.attach_store(store, build=build)
+
+
+def warm_up_search_system(background=True):
+    """
+    Прогрев системы поиска: импорт scikit-learn и построение индекса
+    
+    Args:
+        background: выполнять прогрев в фоновом потоке, не задерживая запуск приложения
+        
+    Returns:
+        Поток прогрева или None при синхронном выполнении
+    """
+    def run():
+        try:
+            search_system.warm_up()
+        except Exception as e:
+            print(f"[ERROR] Не удалось прогреть систему семантического поиска: {e}")
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="search-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def is_search_system_ready() -> bool:
+    """Флаг готовности: индекс семантического поиска построен"""
+    return search_system.ready.is_set()
+
+
+def perform_integrated_search(query: str, search_type: str = "semantic", top_k: int = 10,
+                              topic: Optional[str] = None, filters: Optional[SearchFilters] = None) -> List[dict]:
     """
     Выполнение интегрированного поиска
     
@@ -125,13 +415,16 @@ def perform_integrated_search(query: str, search_type: str = "semantic", top_k:
         query: поисковый запрос
         search_type: тип поиска ("semantic", "syntax", "combined")
         top_k: количество возвращаемых результатов
+        topic: тема для фильтрации ("Все темы" или пусто — без фильтра)
+        filters: фильтры по фасетам (тема, класс, параллель, предмет, автор, даты)
         
     Returns:
         Список найденных документов
     """
+    filters = resolve_filters(filters, topic)
     if search_type == "semantic":
-        # Семантический поиск
-        results = search_system.semantic_search(query, top_k)
+        # Семантический поиск: фильтры применяются в движке до выбора лучших k
+        results = search_system.semantic_search(query, top_k, filters)
         found_entries = []
         for idx, score in results:
             entry = search_system.get_document_by_index(idx)
@@ -142,68 +435,73 @@ def perform_integrated_search(query: str, search_type: str = "semantic", top_k:
                 found_entries.append(entry_with_score)
         return found_entries
     
-    # Здесь можно добавить другие типы поиска (синтаксический, комбинированный)
+    if search_type == "syntax":
+        return syntax_index.search(query, filters=filters)[:top_k]
+    
+    if search_type == "combined":
+        return perform_combined_search(query, top_k, filters=filters)["entries"]
+    
     return []
 
 
-# Функция для синтаксического поиска (скопирована из app.py для полноты)
-def syntax_aware_search(text, query):
-    """
-    Performs syntax-aware search supporting:
-    - AND operator: "word1 AND word2"
-    - OR operator: "word1 OR word2" 
-    - NOT operator: "word1 NOT word2"
-    - Phrase search: "word1 word2" (both words present)
-    - Quoted phrases: "\"exact phrase\""
+def perform_combined_search(query: str, top_k: int = 10, topic: Optional[str] = None,
+                            timeouts: Optional[Dict[str, float]] = None,
+                            filters: Optional[SearchFilters] = None) -> dict:
     """
-    import re
-    # Normalize text and query to lowercase
-    text_lower = text.lower()
-    query = query.strip()
-    
-    # Handle quoted phrases first
-    quoted_phrases = re.findall(r'\"([^\"]*)\"', query)
-    query_without_quotes = re.sub(r'\"[^\"]*\"', '', query)
-    
-    # Check if all quoted phrases are present in the text
-    for phrase in quoted_phrases:
-        phrase = phrase.strip().lower()
-        if phrase and phrase not in text_lower:
-            return False
+    Комбинированный поиск: синтаксический и семантический движки выполняются параллельно,
+    а их выдача объединяется методом обратного ранга (RRF)
     
-    # Process the remaining query without quotes
-    terms = query_without_quotes.strip()
-    if not terms:
-        return len(quoted_phrases) > 0  # If only quotes were provided, return True if they matched
-    
-    # Split by AND, OR, NOT operators while preserving them
-    parts = re.split(r'\s+(AND|OR|NOT)\s+', terms, flags=re.IGNORECASE)
+    Args:
+        query: поисковый запрос
+        top_k: количество возвращаемых результатов
+        topic: тема для фильтрации ("Все темы" или пусто — без фильтра)
+        timeouts: бюджет времени движков в секундах (по умолчанию COMBINED_TIMEOUTS)
+        filters: фильтры по фасетам
+        
+    Returns:
+        Словарь {"entries": найденные документы, "partial": ответили не все движки,
+        "engines": состояние каждого движка}
+    """
+    filters = resolve_filters(filters, topic)
+    engines = {
+        "syntax": lambda: perform_integrated_search(query, "syntax", top_k, filters=filters),
+        "semantic": lambda: perform_integrated_search(query, "semantic", top_k, filters=filters),
+    }
+    return run_hybrid_search(engines, timeouts or COMBINED_TIMEOUTS, top_k=top_k)
+
+
+def perform_batch_search(queries: List[str], search_type: str = "semantic", top_k: int = 10) -> List[List[dict]]:
+    """
+    Выполнение интегрированного поиска по пакету запросов
     
-    # Process parts with operators
-    i = 0
-    result = True  # Start with True for AND logic
-    operator = 'AND'  # Default operator
+    Семантические запросы оцениваются одним матричным произведением; синтаксический
+    и комбинированный поиск выполняются по каждому запросу теми же движками,
+    что и в perform_integrated_search.
     
-    while i < len(parts):
-        part = parts[i].strip()
-        
-        if part.upper() in ['AND', 'OR', 'NOT']:
-            operator = part.upper()
-        else:
-            term = part.strip().lower()
-            if term:
-                term_exists = term in text_lower
-                
-                if operator == 'AND':
-                    result = result and term_exists
-                elif operator == 'OR':
-                    if i == 0:  # First term, initialize result
-                        result = term_exists
-                    else:
-                        result = result or term_exists
-                elif operator == 'NOT':
-                    result = result and not term_exists
-        
-        i += 1
+    Args:
+        queries: список поисковых запросов
+        search_type: тип поиска ("semantic", "syntax", "combined")
+        top_k: количество возвращаемых результатов на запрос
+        
+    Returns:
+        Для каждого запроса список найденных документов (в том же порядке, что и запросы)
+        
+    Raises:
+        ValueError: неизвестный тип поиска
+    """
+    if search_type in ("syntax", "combined"):
+        return [perform_integrated_search(query, search_type, top_k) if query.strip() else [] for query in queries]
+    if search_type != "semantic":
+        raise ValueError(f"Неизвестный тип поиска: {search_type}")
     
-    return result
\ No newline at end of file
+    batch_results = []
+    for results in search_system.batch_semantic_search(queries, top_k):
+        found_entries = []
+        for idx, score in results:
+            entry = search_system.get_document_by_index(idx)
+            if entry:
+                entry_with_score = entry.copy()
+                entry_with_score['relevance_score'] = float(score)
+                found_entries.append(entry_with_score)
+        batch_results.append(found_entries)
+    return batch_results
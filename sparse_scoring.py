@@ -0,0 +1,192 @@
+"""
+Общее ядро оценки документов для поиска по TF-IDF.
+
+Строки матрицы TF-IDF и вектор запроса нормированы (L2), поэтому косинусное
+сходство равно скалярному произведению. Матрица хранится по столбцам (CSC),
+и вклад в оценки вносят только столбцы терминов запроса. Лучшие k документов
+выбираются через argpartition без сортировки всего корпуса.
+
+Если строки матрицы — фрагменты записей, оценки фрагментов объединяются
+в оценку записи (максимум или сумма) перед выбором лучших k.
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csc_matrix, issparse
+
+
+def to_scoring_matrix(matrix) -> csc_matrix:
+    """Приводит матрицу документов к формату CSC, в котором выполняется оценка"""
+    return matrix if matrix.format == "csc" else matrix.tocsc()
+
+
+def sparse_scores(query_vector, doc_matrix: csc_matrix) -> np.ndarray:
+    """
+    Оценки всех документов по запросу (скалярное произведение)
+
+    Args:
+        query_vector: разреженный вектор запроса (1 x размер словаря)
+        doc_matrix: матрица документов в формате CSC
+
+    Returns:
+        Массив оценок длины "количество документов"
+    """
+    if issparse(query_vector):
+        query_vector = query_vector.tocoo()
+        columns, weights = query_vector.col, query_vector.data
+    else:
+        query_vector = np.asarray(query_vector).ravel()
+        columns = np.flatnonzero(query_vector)
+        weights = query_vector[columns]
+    return _column_scores(columns, weights, doc_matrix)
+
+
+def _column_scores(columns, weights, doc_matrix: csc_matrix) -> np.ndarray:
+    scores = np.zeros(doc_matrix.shape[0], dtype=np.float64)
+    indptr, indices, data = doc_matrix.indptr, doc_matrix.indices, doc_matrix.data
+    for column, weight in zip(columns, weights):
+        start, end = indptr[column], indptr[column + 1]
+        # Номера строк внутри одного столбца не повторяются, поэтому достаточно обычного +=
+        scores[indices[start:end]] += weight * data[start:end]
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int, mask: Optional[np.ndarray] = None,
+          min_score: float = 0.0) -> List[Tuple[int, float]]:
+    """
+    Выбор k документов с наибольшими оценками
+
+    Равные оценки упорядочиваются по номеру документа, в том числе на границе
+    k-го места, поэтому результат не зависит от реализации argpartition.
+
+    Args:
+        scores: оценки документов
+        k: количество результатов
+        mask: булев массив допустимых документов (например, без удаленных строк)
+        min_score: документы с оценкой не выше этого значения не возвращаются
+
+    Returns:
+        Список кортежей (номер документа, оценка) по убыванию оценки
+    """
+    if k <= 0:
+        return []
+    selected = scores > min_score
+    if mask is not None:
+        selected &= mask
+    candidates = np.flatnonzero(selected)
+    return select_top_k(candidates, scores[candidates], k)
+
+
+def select_top_k(candidates: np.ndarray, values: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """
+    Выбор k лучших среди кандидатов с известными оценками
+
+    Args:
+        candidates: номера документов по возрастанию
+        values: оценки этих документов
+        k: количество результатов
+
+    Returns:
+        Список кортежей (номер документа, оценка) по убыванию оценки, равные — по номеру документа
+    """
+    if len(candidates) > k:
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        # Оценок строго больше k-й не более k - 1, остальные места занимают равные ей с меньшими номерами
+        keep = np.concatenate((np.flatnonzero(values > kth), np.flatnonzero(values == kth)))[:k]
+        candidates, values = candidates[keep], values[keep]
+    order = np.lexsort((candidates, -values))
+    return [(int(candidates[i]), float(values[i])) for i in order]
+
+
+POOLING_MODES = ("max", "sum")
+
+
+def pool_scores(scores: np.ndarray, row_groups: np.ndarray, group_count: int, pooling: str = "max",
+                mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Объединение оценок строк (фрагментов) в оценки групп (записей)
+
+    Обрабатываются только строки с положительной оценкой, поэтому время
+    зависит от числа совпавших фрагментов, а не от размера индекса.
+
+    Args:
+        scores: оценки строк
+        row_groups: номер группы для каждой строки
+        group_count: количество групп
+        pooling: "max" — лучший фрагмент, "sum" — сумма оценок фрагментов
+        mask: булев массив допустимых строк
+
+    Returns:
+        Массив оценок групп длины group_count
+    """
+    selected = scores > 0
+    if mask is not None:
+        selected &= mask
+    rows = np.flatnonzero(selected)
+    if pooling == "sum":
+        return np.bincount(row_groups[rows], weights=scores[rows], minlength=group_count)
+    if pooling != "max":
+        raise ValueError(f"Неизвестный способ объединения оценок: {pooling}")
+    pooled = np.zeros(group_count, dtype=np.float64)
+    np.maximum.at(pooled, row_groups[rows], scores[rows])
+    return pooled
+
+
+def _select_top_k(scores: np.ndarray, k: int, mask: Optional[np.ndarray], row_groups: Optional[np.ndarray],
+                  group_count: int, pooling: str) -> List[Tuple[int, float]]:
+    if row_groups is None:
+        return top_k(scores, k, mask)
+    return top_k(pool_scores(scores, row_groups, group_count, pooling, mask), k)
+
+
+def search_top_k(query_vector, doc_matrix: csc_matrix, k: int, mask: Optional[np.ndarray] = None,
+                 row_groups: Optional[np.ndarray] = None, group_count: int = 0,
+                 pooling: str = "max") -> List[Tuple[int, float]]:
+    """
+    Оценка документов и выбор k лучших (документы с нулевой оценкой не возвращаются)
+
+    Args:
+        query_vector: разреженный вектор запроса
+        doc_matrix: матрица документов в формате CSC
+        k: количество результатов
+        mask: булев массив допустимых документов (строк матрицы)
+        row_groups: номер записи для каждой строки, если строки — фрагменты записей
+        group_count: количество записей
+        pooling: способ объединения оценок фрагментов ("max" или "sum")
+
+    Returns:
+        Список кортежей (номер документа или записи, оценка)
+    """
+    return _select_top_k(sparse_scores(query_vector, doc_matrix), k, mask, row_groups, group_count, pooling)
+
+
+def batch_search_top_k(query_matrix, doc_matrix: csc_matrix, k: int, mask: Optional[np.ndarray] = None,
+                       row_groups: Optional[np.ndarray] = None, group_count: int = 0,
+                       pooling: str = "max") -> List[List[Tuple[int, float]]]:
+    """
+    Оценка пакета запросов, уже векторизованных в одну разреженную матрицу
+
+    Каждая строка оценивается по столбцам своих терминов: для разреженных запросов
+    это дешевле общего произведения матриц (scipy умножает разреженные матрицы
+    в одном потоке и строит плотный по числу совпадений результат).
+
+    Args:
+        query_matrix: разреженная матрица запросов (количество запросов x размер словаря)
+        doc_matrix: матрица документов в формате CSC
+        k: количество результатов на запрос
+        mask: булев массив допустимых документов (строк матрицы)
+        row_groups: номер записи для каждой строки, если строки — фрагменты записей
+        group_count: количество записей
+        pooling: способ объединения оценок фрагментов ("max" или "sum")
+
+    Returns:
+        Для каждого запроса список кортежей (номер документа или записи, оценка)
+    """
+    query_matrix = query_matrix.tocsr()
+    indptr, indices, data = query_matrix.indptr, query_matrix.indices, query_matrix.data
+    return [
+        _select_top_k(_column_scores(indices[indptr[row]:indptr[row + 1]], data[indptr[row]:indptr[row + 1]],
+                                     doc_matrix),
+                      k, mask, row_groups, group_count, pooling)
+        for row in range(query_matrix.shape[0])
+    ]
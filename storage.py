@@ -0,0 +1,394 @@
+"""
+Подсистемы хранения записей базы знаний: JSON-файл (по умолчанию),
+JSON-файл с журналом изменений и SQLite
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: журнал защищен только от параллельных потоков одного процесса
+    fcntl = None
+
+# Выбор подсистемы хранения: "json", "journal" или "sqlite"
+STORAGE_BACKEND = os.environ.get("KNOWLEDGE_STORAGE", "json")
+
+
+class JsonStorage:
+    """
+    Хранение всей базы в одном JSON-файле.
+
+    Файл перезаписывается целиком, но атомарно: данные пишутся во временный
+    файл рядом с основным и подменяют его через os.replace.
+    """
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+
+    def signature(self):
+        """Признак изменения файла другим процессом (время модификации и размер)"""
+        try:
+            stat = os.stat(self.data_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load_all(self) -> Optional[List[dict]]:
+        """
+        Читает все записи
+
+        Returns:
+            Список записей или None, если файл поврежден
+        """
+        if not os.path.exists(self.data_file):
+            return []
+        try:
+            with open(self.data_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return None
+
+    def write_all(self, entries: List[dict]):
+        """Атомарно перезаписывает файл"""
+        directory = os.path.dirname(os.path.abspath(self.data_file))
+        fd, tmp_path = tempfile.mkstemp(prefix=".knowledge_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(list(entries), f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, self.data_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def insert(self, entry: dict, entries: List[dict]):
+        self.write_all(entries)
+
+    def update(self, entry: dict, entries: List[dict], changes: Optional[dict] = None):
+        self.write_all(entries)
+
+    def delete(self, entry_id, entries: List[dict]):
+        self.write_all(entries)
+
+    def close(self):
+        pass
+
+
+class JournaledJsonStorage(JsonStorage):
+    """
+    JSON-файл как последний снимок базы плюс журнал изменений в формате JSON Lines.
+
+    Добавление, изменение и удаление дописывают в журнал одну короткую строку
+    (op, id, fields, timestamp), поэтому стоимость записи зависит только от размера
+    изменения. При чтении журнал применяется поверх снимка; метод compact переносит
+    накопленные изменения в новый снимок и очищает журнал.
+
+    Дописывание в журнал и замена снимка с очисткой журнала выполняются под блокировкой
+    файла <журнал>.lock, поэтому запись другого процесса не теряется между записью
+    снимка и удалением журнала.
+    """
+
+    def __init__(self, data_file, journal_file=None, fsync=True):
+        """
+        Args:
+            data_file: путь к JSON-файлу со снимком базы
+            journal_file: путь к журналу (по умолчанию рядом со снимком)
+            fsync: сбрасывать ли каждую запись журнала на диск
+        """
+        super().__init__(data_file)
+        self.journal_file = journal_file or journal_path_for(data_file)
+        self.lock_file = self.journal_file + ".lock"
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _exclusive(self):
+        """Блокировка потоков и процессов на время изменения журнала или снимка"""
+        with self._lock:
+            with open(self.lock_file, "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                # Закрытие файла снимает блокировку
+                yield
+
+    def signature(self):
+        """Признак изменения снимка или журнала другим процессом"""
+        try:
+            stat = os.stat(self.journal_file)
+            journal_signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            journal_signature = None
+        return super().signature(), journal_signature
+
+    def load_all(self) -> Optional[List[dict]]:
+        """Читает снимок и применяет к нему журнал"""
+        entries = super().load_all()
+        if entries is None:
+            return None
+        records = list(self.read_journal())
+        if not records:
+            return entries
+
+        entries = list(entries)
+        positions = {str(entry.get("id")): i for i, entry in enumerate(entries)}
+        for record in records:
+            entry_id = str(record["id"])
+            position = positions.get(entry_id)
+            if record["op"] == "add":
+                if position is None:
+                    positions[entry_id] = len(entries)
+                    entries.append(record["fields"])
+                else:
+                    entries[position] = record["fields"]
+            elif record["op"] == "update" and position is not None:
+                entries[position] = {**entries[position], **record["fields"]}
+            elif record["op"] == "delete" and position is not None:
+                entries[position] = None
+                del positions[entry_id]
+        return [entry for entry in entries if entry is not None]
+
+    def read_journal(self):
+        """
+        Построчно читает журнал изменений
+
+        Недописанная последняя строка (сбой во время записи) пропускается.
+        """
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def journal_length(self) -> int:
+        """Количество записей в журнале"""
+        return sum(1 for _ in self.read_journal())
+
+    def write_all(self, entries: List[dict]):
+        """Записывает новый снимок и очищает журнал"""
+        with self._exclusive():
+            self._write_snapshot(entries)
+
+    def _write_snapshot(self, entries: List[dict]):
+        super().write_all(entries)
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+
+    def insert(self, entry: dict, entries: List[dict]):
+        self._append("add", entry["id"], entry)
+
+    def update(self, entry: dict, entries: List[dict], changes: Optional[dict] = None):
+        self._append("update", entry["id"], changes if changes is not None else entry)
+
+    def delete(self, entry_id, entries: List[dict]):
+        self._append("delete", entry_id, None)
+
+    def compact(self):
+        """
+        Переносит журнал в новый снимок
+
+        Снимок с примененным журналом читается с диска под блокировкой, поэтому
+        изменения, дописанные другим процессом, попадают в новый снимок.
+
+        Returns:
+            (записи нового снимка, признак файлов после сжатия) или None,
+            если журнал пуст или снимок поврежден
+        """
+        with self._exclusive():
+            if not os.path.exists(self.journal_file):
+                return None
+            entries = self.load_all()
+            if entries is None:
+                return None
+            self._write_snapshot(entries)
+            return entries, self.signature()
+
+    def _append(self, op, entry_id, fields):
+        record = {
+            "op": op,
+            "id": str(entry_id),
+            "fields": fields,
+            "timestamp": datetime.now().isoformat()
+        }
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._exclusive():
+            with open(self.journal_file, "ab+") as f:
+                # Если предыдущая запись оборвалась на середине, начинаем с новой строки
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = b"\n" + line
+                f.write(line)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+
+
+class SqliteStorage:
+    """
+    Хранение записей в SQLite (режим WAL).
+
+    Каждая запись — строка таблицы entries с первичным ключом id; заголовок,
+    тема и сведения об образовании вынесены в отдельные колонки, полная запись
+    хранится в колонке body в формате JSON. Изменение одной записи затрагивает
+    только её строку.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                title TEXT,
+                topic TEXT,
+                education_info TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                body TEXT NOT NULL
+            )
+            """
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_entries_title ON entries(title)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_entries_topic ON entries(topic)")
+        self._connection.commit()
+
+    def signature(self):
+        """Признак изменения базы другими соединениями (PRAGMA data_version)"""
+        with self._lock:
+            return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def load_all(self) -> List[dict]:
+        """Читает все записи в порядке добавления"""
+        with self._lock:
+            rows = self._connection.execute("SELECT body FROM entries ORDER BY seq").fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def write_all(self, entries: List[dict]):
+        """Полностью заменяет содержимое таблицы в одной транзакции"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries")
+            self._connection.executemany(
+                "INSERT INTO entries (id, title, topic, education_info, created_at, updated_at, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(entry) for entry in entries]
+            )
+
+    def insert(self, entry: dict, entries: List[dict]):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO entries (id, title, topic, education_info, created_at, updated_at, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._row(entry)
+            )
+
+    def update(self, entry: dict, entries: List[dict], changes: Optional[dict] = None):
+        row = self._row(entry)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE entries SET title = ?, topic = ?, education_info = ?, created_at = ?, "
+                "updated_at = ?, body = ? WHERE id = ?",
+                row[1:] + row[:1]
+            )
+
+    def delete(self, entry_id, entries: List[dict]):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries WHERE id = ?", (str(entry_id),))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def _row(entry: dict) -> tuple:
+        education_info = entry.get("education_info")
+        return (
+            str(entry["id"]),
+            entry.get("title"),
+            entry.get("topic"),
+            json.dumps(education_info, ensure_ascii=False) if education_info is not None else None,
+            entry.get("created_at"),
+            entry.get("updated_at"),
+            json.dumps(entry, ensure_ascii=False)
+        )
+
+
+def journal_path_for(data_file) -> str:
+    """Путь к журналу изменений рядом с JSON-файлом базы знаний"""
+    return os.path.splitext(data_file)[0] + ".journal.jsonl"
+
+
+def sqlite_path_for(data_file) -> str:
+    """Путь к файлу SQLite рядом с JSON-файлом базы знаний"""
+    return os.path.splitext(data_file)[0] + ".db"
+
+
+def migrate_json_to_sqlite(json_file, db_file) -> int:
+    """
+    Однократный перенос записей из JSON-файла в SQLite
+
+    Args:
+        json_file: путь к JSON-файлу базы знаний
+        db_file: путь к файлу SQLite
+
+    Returns:
+        Количество перенесенных записей
+    """
+    from document_store import prepare_entry
+
+    entries = JsonStorage(json_file).load_all()
+    if entries is None:
+        raise ValueError(f"Файл {json_file} поврежден и не может быть перенесен")
+    entries = [prepare_entry(dict(entry)) for entry in entries]
+    storage = SqliteStorage(db_file)
+    try:
+        storage.write_all(entries)
+    finally:
+        storage.close()
+    return len(entries)
+
+
+def create_storage(data_file, backend=None):
+    """
+    Создает подсистему хранения для базы знаний
+
+    Args:
+        data_file: путь к JSON-файлу базы знаний
+        backend: "json", "journal" или "sqlite" (по умолчанию — STORAGE_BACKEND)
+    """
+    backend = backend or STORAGE_BACKEND
+    if backend == "journal":
+        return JournaledJsonStorage(data_file)
+    if backend == "sqlite":
+        db_file = sqlite_path_for(data_file)
+        if not os.path.exists(db_file) and os.path.exists(data_file):
+            migrate_json_to_sqlite(data_file, db_file)
+        return SqliteStorage(db_file)
+    if backend != "json":
+        raise ValueError(f"Неизвестная подсистема хранения: {backend}")
+    return JsonStorage(data_file)
+
+
+if __name__ == "__main__":
+    from document_store import DATA_FILE
+
+    count = migrate_json_to_sqlite(DATA_FILE, sqlite_path_for(DATA_FILE))
+    print(f"Перенесено записей в {sqlite_path_for(DATA_FILE)}: {count}")
@@ -0,0 +1,263 @@
+"""
+Компилятор синтаксических поисковых запросов.
+
+Запрос разбирается один раз в дерево операторов с приоритетами
+NOT > AND > OR и группировкой скобками:
+
+- "word1 word2" или "word1 AND word2" — должны присутствовать оба слова
+- "word1 OR word2" — хотя бы одно слово
+- "word1 NOT word2" и "NOT word2" — исключение
+- "\"exact phrase\"" — точная фраза
+- "(word1 OR word2) AND word3" — группировка
+
+Скомпилированный запрос вычисляется либо по тексту одного документа
+(TextBackend), либо любым другим исполнителем с теми же методами
+(например, инвертированным индексом).
+"""
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+QUERY_TOKEN_PATTERN = re.compile(r'"[^"]*"|[()]|[^\s"()]+')
+OPERATORS = ("AND", "OR", "NOT")
+
+
+class Term:
+    """Слово запроса: совпадает с любым текстом, где оно встречается как подстрока"""
+
+    __slots__ = ("word",)
+
+    def __init__(self, word: str):
+        self.word = word
+
+    def evaluate(self, backend):
+        return backend.term(self.word)
+
+    def __repr__(self):
+        return f"Term({self.word!r})"
+
+
+class Phrase:
+    """Фраза в кавычках: должна встречаться в тексте целиком"""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def evaluate(self, backend):
+        return backend.phrase(self.text)
+
+    def __repr__(self):
+        return f"Phrase({self.text!r})"
+
+
+class And:
+    __slots__ = ("children",)
+
+    def __init__(self, children: list):
+        self.children = children
+
+    def evaluate(self, backend):
+        return backend.and_(self.children)
+
+    def __repr__(self):
+        return f"And({self.children!r})"
+
+
+class Or:
+    __slots__ = ("children",)
+
+    def __init__(self, children: list):
+        self.children = children
+
+    def evaluate(self, backend):
+        return backend.or_(self.children)
+
+    def __repr__(self):
+        return f"Or({self.children!r})"
+
+
+class Not:
+    __slots__ = ("child",)
+
+    def __init__(self, child):
+        self.child = child
+
+    def evaluate(self, backend):
+        return backend.not_(self.child)
+
+    def __repr__(self):
+        return f"Not({self.child!r})"
+
+
+class _Parser:
+    """Рекурсивный спуск по лексемам запроса"""
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[str]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def peek_operator(self) -> Optional[str]:
+        token = self.peek()
+        if token is not None and token.upper() in OPERATORS:
+            return token.upper()
+        return None
+
+    def advance(self) -> str:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        nodes = []
+        while self.peek() is not None:
+            node = self.parse_or()
+            if node is not None:
+                nodes.append(node)
+            elif self.peek() is not None:
+                # Лишняя закрывающая скобка или оператор без операнда
+                self.advance()
+        return _combine(And, nodes)
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek_operator() == "OR":
+            self.advance()
+            nodes.append(self.parse_and())
+        return _combine(Or, nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_unary()]
+        while True:
+            operator = self.peek_operator()
+            token = self.peek()
+            if operator == "AND":
+                self.advance()
+                nodes.append(self.parse_unary())
+            elif operator == "NOT":
+                # Бинарный NOT: "a NOT b" означает "a AND NOT b"
+                self.advance()
+                operand = self.parse_unary()
+                nodes.append(Not(operand) if operand is not None else None)
+            elif token is not None and operator is None and token != ")":
+                # Соседние операнды без оператора объединяются через AND
+                nodes.append(self.parse_unary())
+            else:
+                break
+        return _combine(And, nodes)
+
+    def parse_unary(self):
+        if self.peek_operator() == "NOT":
+            self.advance()
+            operand = self.parse_unary()
+            return Not(operand) if operand is not None else None
+        return self.parse_primary()
+
+    def parse_primary(self):
+        token = self.peek()
+        if token is None or token == ")" or token.upper() in OPERATORS:
+            return None
+        self.advance()
+        if token == "(":
+            node = self.parse_or()
+            if self.peek() == ")":
+                self.advance()
+            return node
+        if len(token) >= 2 and token.startswith('"') and token.endswith('"'):
+            phrase = token[1:-1].strip().lower()
+            return Phrase(phrase) if phrase else None
+        return Term(token.lower())
+
+
+def _combine(node_class, nodes: list):
+    nodes = [node for node in nodes if node is not None]
+    if not nodes:
+        return None
+    if len(nodes) == 1:
+        return nodes[0]
+    return node_class(nodes)
+
+
+class CompiledQuery:
+    """Скомпилированный запрос: дерево операторов, пригодное для повторного вычисления"""
+
+    __slots__ = ("query", "root")
+
+    def __init__(self, query: str, root):
+        self.query = query
+        self.root = root
+
+    @property
+    def is_empty(self) -> bool:
+        return self.root is None
+
+    def evaluate(self, backend):
+        """Вычисляет запрос указанным исполнителем"""
+        if self.root is None:
+            return backend.empty()
+        return self.root.evaluate(backend)
+
+    def matches(self, text: str) -> bool:
+        """Проверяет, удовлетворяет ли текст запросу (линейная проверка одного документа)"""
+        return self.evaluate(TextBackend(text))
+
+
+class TextBackend:
+    """Исполнитель для одного текста: операторы вычисляются с коротким замыканием"""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text.lower()
+
+    def empty(self):
+        return False
+
+    def term(self, word):
+        return word in self.text
+
+    def phrase(self, text):
+        return text in self.text
+
+    def and_(self, children):
+        return all(child.evaluate(self) for child in children)
+
+    def or_(self, children):
+        return any(child.evaluate(self) for child in children)
+
+    def not_(self, child):
+        return not child.evaluate(self)
+
+
+@lru_cache(maxsize=512)
+def compile_query(query: str) -> CompiledQuery:
+    """
+    Компилирует запрос в дерево операторов (результат кэшируется)
+
+    Args:
+        query: поисковый запрос
+
+    Returns:
+        CompiledQuery
+    """
+    tokens = QUERY_TOKEN_PATTERN.findall(query.strip())
+    return CompiledQuery(query, _Parser(tokens).parse())
+
+
+def syntax_aware_search(text, query):
+    """
+    Performs syntax-aware search supporting:
+    - AND operator: "word1 AND word2"
+    - OR operator: "word1 OR word2"
+    - NOT operator: "word1 NOT word2"
+    - Phrase search: "word1 word2" (both words present)
+    - Quoted phrases: "\"exact phrase\""
+    - Grouping: "(word1 OR word2) AND word3"
+    """
+    return compile_query(query).matches(text)
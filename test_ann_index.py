@@ -0,0 +1,55 @@
+"""
+Тестирование приближенного поиска по эмбеддингам (IVF)
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from ann_index import IVFIndex, normalize_rows
+
+
+def test_ivf_index():
+    print("Тестируем индекс IVF...")
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 32))
+    embeddings = normalize_rows(centers[rng.integers(0, 20, 2000)] + 0.5 * rng.normal(size=(2000, 32)))
+    queries = embeddings[:50] + 0.1 * rng.normal(size=(50, 32))
+
+    index = IVFIndex(n_lists=40, n_probe=8).build(embeddings)
+    assert index.list_offsets[-1] == len(embeddings)
+    assert sorted(index.list_ids.tolist()) == list(range(len(embeddings)))
+    print("✓ Каждый документ попадает ровно в один кластер")
+
+    def exact(query, k):
+        return set(np.argsort(-(embeddings @ normalize_rows(query)[0]))[:k].tolist())
+
+    # Просмотр всех кластеров дает точный результат
+    for query in queries[:10]:
+        assert {idx for idx, _ in index.search(query, 10, n_probe=40)} == exact(query, 10)
+    recall = np.mean([len(exact(query, 10) & {idx for idx, _ in index.search(query, 10)}) / 10
+                      for query in queries])
+    assert recall > 0.8, recall
+    print(f"✓ Полнота при n_probe=8: {recall:.2f}")
+
+    scores = [score for _, score in index.search(queries[0], 10)]
+    assert scores == sorted(scores, reverse=True)
+    print("✓ Результаты упорядочены по убыванию сходства")
+
+    fd, path = tempfile.mkstemp(suffix=".npz")
+    os.close(fd)
+    try:
+        index.save(path)
+        loaded = IVFIndex.load(path, embeddings)
+        assert loaded is not None
+        assert loaded.search(queries[0], 10) == index.search(queries[0], 10)
+        # Индекс, построенный по другим эмбеддингам, не используется
+        assert IVFIndex.load(path, embeddings[:-1]) is None
+        print("✓ Индекс сохраняется и проверяется по отпечатку эмбеддингов")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    test_ivf_index()
@@ -0,0 +1,132 @@
+"""
+Тестирование индекса запросов к журналу аудита
+"""
+import shutil
+import tempfile
+from datetime import datetime
+
+from audit_index import AuditQueryIndex
+from audit_segments import AuditSegmentStore
+
+USERS = ["admin", "ivanov", "petrov"]
+TYPES = ["add", "edit", "delete", "sync"]
+
+
+def make_logs(count, start=0):
+    return [{"timestamp": f"2024-{1 + n % 3:02d}-{1 + n % 28:02d}T{n % 24:02d}:00:00",
+             "username": USERS[n % 3], "action_type": TYPES[n % 4], "target": f"Запись {n % 7}",
+             "details": "Восстановлено элементов" if n % 5 == 0 else f"Изменено поле title-{n}",
+             "entry_id": str(n % 7)} for n in range(start, start + count)]
+
+
+def scan(logs, username="", action_type="", text="", date_from="", date_to=""):
+    """Прежняя фильтрация страницы /audit полным просмотром"""
+    if action_type:
+        logs = [log for log in logs if log["action_type"] == action_type]
+    if username:
+        logs = [log for log in logs if log["username"] == username]
+    if text:
+        logs = [log for log in logs if text in log["details"].lower() or text in log["target"].lower()
+                or text in log["username"].lower()]
+    if date_from:
+        from_date = datetime.strptime(date_from, "%Y-%m-%d")
+        logs = [log for log in logs if datetime.fromisoformat(log["timestamp"]) >= from_date]
+    if date_to:
+        to_date = datetime.strptime(date_to, "%Y-%m-%d")
+        logs = [log for log in logs if datetime.fromisoformat(log["timestamp"]).date() <= to_date.date()]
+    return sorted(logs, key=lambda log: log["timestamp"], reverse=True)
+
+
+def collect(index, limit, **filters):
+    logs, cursor = [], None
+    while True:
+        result = index.query(limit=limit, after=cursor, **filters)
+        logs.extend(result["logs"])
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return logs, result["total"]
+
+
+def test_audit_index():
+    print("Тестируем индекс запросов аудита...")
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = AuditSegmentStore(directory)
+        logs = make_logs(200)
+        store.append(logs)
+        index = AuditQueryIndex(store)
+        checks = [{}, {"username": "ivanov"}, {"action_type": "edit", "username": "admin"},
+                  {"text": "восстановлено"}, {"text": "title-1"}, {"text": "запись 3", "action_type": "sync"},
+                  {"text": "-1"}, {"text": "нет такого"}, {"date_from": "2024-02-01", "date_to": "2024-02-10"},
+                  {"username": "petrov", "date_to": "2024-01-15"}]
+        for filters in checks:
+            expected = scan(logs, **filters)
+            result = index.query(limit=500, **filters)
+            assert result["logs"] == expected and result["total"] == len(expected), filters
+        assert index.query(target="Запись 2", entry_id="2", limit=500)["total"] == 29
+        print("✓ Индекс выдает те же записи, что и полный просмотр")
+
+        found, total = collect(index, 7, username="admin")
+        assert found == scan(logs, username="admin") and total == len(found)
+        print("✓ Страницы по курсору складываются в полный результат")
+
+        first = index.query(limit=5, action_type="delete")
+        more = make_logs(40, start=200)
+        store.append(more)
+        second = index.query(limit=5, action_type="delete", after=first["next_cursor"])
+        assert second["logs"] == scan(logs + more, action_type="delete")[5:10]
+        assert index.query(limit=500)["logs"] == scan(logs + more)
+        # Запомненные слова запроса дополняются словами новых записей
+        assert index.query(text="особая", limit=500)["total"] == 0
+        extra = [dict(more[0], details="Особая пометка"), dict(more[1], details="неособая пометка")]
+        store.append(extra)
+        assert index.query(text="особая", limit=500)["logs"] == scan(logs + more + extra, text="особая")
+        assert len(index.query(text="особая", limit=500)["logs"]) == 2
+        store.rewrite(more)
+        assert index.query(limit=500)["logs"] == scan(more)
+        print("✓ Новые записи добавляются в индекс, замена журнала перестраивает его")
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_shared_directory():
+    print("Тестируем индекс над каталогом, общим для нескольких процессов...")
+
+    directory = tempfile.mkdtemp()
+    try:
+        # Два хранилища над одним каталогом, как в двух воркерах
+        store, other = AuditSegmentStore(directory), AuditSegmentStore(directory)
+        logs = make_logs(60)
+        store.append(logs)
+        index = AuditQueryIndex(store)
+        assert index.query(limit=500)["total"] == 60
+
+        # Записи другого процесса дочитываются из выросших сегментов, журнал целиком не читается
+        store.iter_logs = None
+        for start in (60, 75):
+            batch = make_logs(15, start=start)
+            other.append(batch)
+            logs += batch
+            assert index.query(limit=500)["logs"] == scan(logs)
+        batch = make_logs(5, start=90)
+        store.append(batch)
+        logs += batch
+        assert index.query(text="title-9", limit=500)["logs"] == scan(logs, text="title-9")
+        del store.iter_logs
+        print("✓ Записи другого процесса добавляются без перестроения индекса")
+
+        other.rewrite(logs[:10])
+        assert index.query(limit=500)["logs"] == scan(logs[:10])
+        # Новый журнал не короче прежнего ни в одном месяце: замену выдает поколение сегментов
+        replaced = make_logs(30, start=1000)
+        other.rewrite(replaced)
+        assert index.query(limit=500)["logs"] == scan(replaced)
+        print("✓ Замена журнала другим процессом перестраивает индекс")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_audit_index()
+    test_shared_directory()
@@ -0,0 +1,114 @@
+"""
+Тестирование сводного отчета по журналу аудита
+"""
+import json
+import os
+import shutil
+import tempfile
+
+from audit_report import REPORT_FILE, AuditReportAggregates
+from audit_segments import AuditSegmentStore
+
+
+def make_logs(targets, start=0):
+    return [{"timestamp": f"2024-{1 + (start + n) // 10 % 12:02d}-01T10:00:{n % 60:02d}",
+             "username": ["admin", "ivanov"][n % 2], "action_type": ["add", "edit", "sync"][n % 3],
+             "target": target} for n, target in enumerate(targets, start)]
+
+
+def full_report(logs):
+    """Прежний отчет: полный просмотр журнала"""
+    actions_by_type, actions_by_user, entries_by_count = {}, {}, {}
+    for log in logs:
+        actions_by_type[log["action_type"]] = actions_by_type.get(log["action_type"], 0) + 1
+        actions_by_user[log["username"]] = actions_by_user.get(log["username"], 0) + 1
+        if log["action_type"] in ["add", "edit", "delete"]:
+            entries_by_count[log["target"]] = entries_by_count.get(log["target"], 0) + 1
+    return {
+        "total_actions": len(logs),
+        "actions_by_type": actions_by_type,
+        "actions_by_user": actions_by_user,
+        "most_active_entry": max(entries_by_count, key=entries_by_count.get) if entries_by_count else None,
+        "recent_actions": logs[-10:],
+    }
+
+
+def test_audit_report():
+    print("Тестируем сводный отчет аудита...")
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = AuditSegmentStore(directory)
+        aggregates = AuditReportAggregates(store)
+        assert aggregates.report() == full_report([])
+
+        logs = []
+        # Запись «Б» догоняет «А», затем «А» снова впереди
+        for targets in (["А", "А", "Б"], ["Б", "В", "Б"], ["А", "А", "В", "Б"], list("ГДЕЖЗИКЛМН")):
+            batch = make_logs(targets, start=len(logs))
+            store.append(batch)
+            logs += batch
+            assert aggregates.report() == full_report(logs)
+        assert aggregates.report()["recent_actions"] == logs[-10:]
+        print("✓ Счетчики, самая активная запись и последние действия обновляются при записи")
+
+        # Новый экземпляр читает отчет из файла, не открывая сегменты
+        reopened = AuditReportAggregates(store)
+        store.iter_logs = None
+        assert reopened.report() == full_report(logs)
+        del store.iter_logs
+        assert reopened.rebuild() == aggregates.report()
+        print("✓ Отчет хранится рядом с журналом и совпадает с пересчетом")
+
+        # Отставший от журнала файл отчета пересчитывается
+        with open(os.path.join(directory, REPORT_FILE), encoding="utf-8") as f:
+            data = json.load(f)
+        data["count"] -= 1
+        with open(os.path.join(directory, REPORT_FILE), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        assert AuditReportAggregates(store).report() == full_report(logs)
+
+        store.rewrite(logs[:5])
+        assert aggregates.report() == full_report(logs[:5])
+        print("✓ Замена журнала и поврежденный файл отчета приводят к пересчету")
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_shared_report():
+    print("Тестируем общий отчет для нескольких процессов...")
+
+    directory = tempfile.mkdtemp()
+    try:
+        # Два хранилища над одним каталогом, как в двух воркерах
+        stores = [AuditSegmentStore(directory), AuditSegmentStore(directory)]
+        reports = [AuditReportAggregates(store) for store in stores]
+        # Запись не копирует каталог: ожидаемое количество записей берется из store.count()
+        for store in stores:
+            store.totals = None
+        logs = []
+        for n, targets in enumerate((["А", "Б"], ["Б", "Б"], ["В"], ["А", "А", "В"], list("ГДЕЖЗИКЛ"))):
+            batch = make_logs(targets, start=len(logs))
+            stores[n % 2].append(batch)
+            logs += batch
+            for report in reports:
+                assert report.report() == full_report(logs)
+        with open(os.path.join(directory, REPORT_FILE), encoding="utf-8") as f:
+            assert json.load(f)["count"] == len(logs)
+        for store in stores:
+            del store.totals
+        print("✓ Отчет каждого процесса учитывает записи другого, файл отчета не теряет записи")
+
+        stores[0].rewrite(logs[:3])
+        assert reports[1].report() == full_report(logs[:3])
+        batch = make_logs(["М"], start=3)
+        stores[1].append(batch)
+        assert reports[0].report() == full_report(logs[:3] + batch)
+        print("✓ Замена журнала другим процессом приводит к пересчету")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    test_audit_report()
+    test_shared_report()
@@ -0,0 +1,159 @@
+"""
+Тестирование помесячных сегментов журнала аудита
+"""
+import os
+import shutil
+import tempfile
+
+from audit_segments import CATALOG_FILE, LOCK_FILE, AuditSegmentStore
+
+
+def make_log(timestamp, username="admin", action_type="add"):
+    return {"timestamp": timestamp, "username": username, "action_type": action_type, "target": timestamp}
+
+
+LOGS = [
+    make_log("2024-01-05T10:00:00"),
+    make_log("2024-01-31T23:59:59", "ivanov", "edit"),
+    make_log("2024-02-10T09:00:00", "ivanov"),
+    make_log("2024-03-01T00:00:00", action_type="delete"),
+]
+
+
+def test_segments():
+    print("Тестируем сегменты журнала аудита...")
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = AuditSegmentStore(directory)
+        store.append(LOGS[:2])
+        store.append(LOGS[2:])
+        catalog = store.catalog()
+        assert [segment["month"] for segment in catalog] == ["2024-01", "2024-02", "2024-03"]
+        assert [segment["compression"] for segment in catalog] == ["gzip", "gzip", None]
+        assert sorted(os.listdir(directory)) == [
+            LOCK_FILE, "audit-2024-01.jsonl.gz", "audit-2024-02.jsonl.gz", "audit-2024-03.jsonl", CATALOG_FILE]
+        assert catalog[0]["start"] == "2024-01-05T10:00:00" and catalog[0]["end"] == "2024-01-31T23:59:59"
+        assert catalog[0]["users"] == {"admin": 1, "ivanov": 1} and catalog[0]["types"] == {"add": 1, "edit": 1}
+        assert store.totals() == {"count": 4, "users": {"admin": 2, "ivanov": 2},
+                                  "types": {"add": 2, "edit": 1, "delete": 1}}
+        assert list(store.iter_logs()) == LOGS
+        print("✓ Закрытые месяцы сжаты, каталог хранит диапазоны и счетчики")
+
+        opened = []
+        open_segment = store._open_segment
+        store._open_segment = lambda segment: opened.append(segment["month"]) or open_segment(segment)
+        assert list(store.iter_logs("2024-02-01", "2024-02-29")) == [LOGS[2]]
+        assert list(store.iter_logs("2024-01-31", "2024-02-10")) == LOGS[1:3]
+        assert list(store.iter_logs(date_from="2024-03-01")) == [LOGS[3]]
+        assert opened == ["2024-02", "2024-01", "2024-02", "2024-03"]
+        del store._open_segment
+        print("✓ Запрос с диапазоном дат открывает только пересекающиеся сегменты")
+
+        # Запись в уже сжатый месяц и восстановление каталога по файлам сегментов
+        late = make_log("2024-01-20T12:00:00", "petrov")
+        store.append([late])
+        assert list(store.iter_logs("2024-01-01", "2024-01-31")) == LOGS[:2] + [late]
+        os.remove(os.path.join(directory, CATALOG_FILE))
+        reopened = AuditSegmentStore(directory)
+        assert reopened.catalog() == store.catalog() and reopened.catalog()[0]["count"] == 3
+        print("✓ Сжатый сегмент дописывается, каталог восстанавливается по сегментам")
+
+        # Сбой при записи новых сегментов не затрагивает прежний журнал
+        before = list(reopened.iter_logs())
+        write_new_segment = reopened._write_new_segment
+        written = []
+
+        def failing_write(segment, data):
+            if written:
+                raise OSError("диск заполнен")
+            written.append(segment["month"])
+            write_new_segment(segment, data)
+
+        reopened._write_new_segment = failing_write
+        try:
+            reopened.rewrite(LOGS[2:])
+            assert False, "сбой записи не передан вызывающему"
+        except OSError:
+            pass
+        del reopened._write_new_segment
+        assert list(AuditSegmentStore(directory).iter_logs()) == before
+
+        reopened.rewrite(LOGS[2:])
+        names = [name for name in sorted(os.listdir(directory)) if not name.startswith(".new-")]
+        assert names == [LOCK_FILE, "audit-2024-02.jsonl.gz", "audit-2024-03.jsonl", CATALOG_FILE]
+        assert list(reopened.iter_logs()) == LOGS[2:]
+        print("✓ Замена журнала не удаляет старые сегменты до записи новых")
+    finally:
+        shutil.rmtree(directory)
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = AuditSegmentStore(directory, compression="lzma")
+        store.append(LOGS)
+        assert [segment["file"] for segment in store.catalog()][:2] == ["audit-2024-01.jsonl.xz",
+                                                                          "audit-2024-02.jsonl.xz"]
+        assert list(store.iter_logs()) == LOGS
+        print("✓ Сегменты сжимаются и lzma")
+    finally:
+        shutil.rmtree(directory)
+
+
+
+def test_shared_directory():
+    print("Тестируем общий каталог журнала для нескольких процессов...")
+
+    directory = tempfile.mkdtemp()
+    try:
+        # Два хранилища над одним каталогом, как в двух воркерах
+        first, second = AuditSegmentStore(directory), AuditSegmentStore(directory)
+        changes = []
+        second.subscribe(lambda op, logs: changes.append(op))
+        first.append(LOGS[:2])
+        second.append(LOGS[2:3])
+        first.append(LOGS[3:])
+        assert first.totals()["count"] == second.totals()["count"] == 4
+        assert first.count() == second.count() == 4
+        assert list(second.iter_logs()) == LOGS
+        assert AuditSegmentStore(directory).catalog() == first.catalog()
+        assert changes == ["append", "reload"]
+        print("✓ Каталог перечитывается после записи другим процессом, счетчики не затираются")
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_restore():
+    print("Тестируем восстановление журнала из копии...")
+
+    directory, backup = tempfile.mkdtemp(), tempfile.mkdtemp()
+    try:
+        source = AuditSegmentStore(backup)
+        source.append(LOGS[:3])
+        store, other = AuditSegmentStore(directory), AuditSegmentStore(directory)
+        store.append(LOGS[3:] + [make_log("2024-05-01T10:00:00", "petrov")])
+        lock_inode = os.stat(os.path.join(directory, LOCK_FILE)).st_ino
+        changes = []
+        store.subscribe(lambda op, logs: changes.append(op))
+        other.subscribe(lambda op, logs: changes.append("other " + op))
+        other.totals()
+
+        store.restore(backup)
+        assert changes == ["rewrite"]
+        assert list(store.iter_logs()) == LOGS[:3] and list(other.iter_logs()) == LOGS[:3]
+        assert changes == ["rewrite", "other reload"]
+        assert os.stat(os.path.join(directory, LOCK_FILE)).st_ino == lock_inode
+        assert sorted(os.listdir(directory)) == [LOCK_FILE, "audit-2024-01.jsonl.gz", "audit-2024-02.jsonl",
+                                                 CATALOG_FILE]
+        # Сегменты копии получают новое поколение
+        generations = {segment["month"]: segment["generation"] for segment in source.catalog()}
+        assert all(segment["generation"] != generations[segment["month"]] for segment in store.catalog())
+        print("✓ Журнал заменяется под блокировкой, файл блокировки сохраняется")
+    finally:
+        shutil.rmtree(directory)
+        shutil.rmtree(backup)
+
+
+if __name__ == "__main__":
+    test_segments()
+    test_shared_directory()
+    test_restore()
@@ -0,0 +1,115 @@
+"""
+Тестирование журнала аудита (построчные сегменты и фоновая запись)
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import audit_system
+from audit_segments import get_audit_store
+
+
+def test_audit_log():
+    print("Тестируем журнал аудита...")
+
+    directory = tempfile.mkdtemp()
+    legacy_file = os.path.join(directory, "audit_logs.json")
+    audit_dir = os.path.join(directory, "audit_logs")
+    # Сегмент текущего месяца, в который дописываются новые действия
+    audit_file = os.path.join(audit_dir, "audit-" + datetime.now().strftime("%Y-%m") + ".jsonl")
+    legacy = [{"timestamp": "2024-01-01T10:00:00", "username": "admin", "action_type": "add",
+               "target": "Старая запись", "details": "", "entry_id": "1"}]
+    with open(legacy_file, "w", encoding="utf-8") as f:
+        json.dump(legacy, f, ensure_ascii=False, indent=4)
+
+    files = audit_system.AUDIT_LOG_DIR, audit_system.LEGACY_AUDIT_LOG_FILE, audit_system.JSONL_AUDIT_LOG_FILE
+    audit_system.AUDIT_LOG_DIR, audit_system.LEGACY_AUDIT_LOG_FILE = audit_dir, legacy_file
+    audit_system.JSONL_AUDIT_LOG_FILE = os.path.join(directory, "audit_logs.jsonl")
+    try:
+        audit_system.init_audit_system()
+        assert audit_system.load_audit_logs() == legacy
+        # Повторная инициализация не переносит журнал заново
+        audit_system.log_action("ivanov", "edit", "Старая запись", old_value="a", new_value="b", entry_id="1")
+        audit_system.init_audit_system()
+        assert len(audit_system.load_audit_logs(flush=True)) == 2
+        print("✓ Журнал перенесен из массива JSON один раз")
+
+        audit_system.audit_writer.flush()
+        with open(audit_file, "rb") as f:
+            size_before = len(f.read())
+        audit_system.log_action("petrov", "add", "Новая запись", entry_id="2")
+        audit_system.audit_writer.flush()
+        with open(audit_file, "rb") as f:
+            data = f.read()
+        assert data.count(b"\n") == 2 and len(data) > size_before
+        assert json.loads(data.splitlines()[-1])["username"] == "petrov"
+        print("✓ Новое действие дописывается одной строкой")
+
+        # Оборванная при сбое строка пропускается, следующая запись начинается с новой строки
+        with open(audit_file, "ab") as f:
+            f.write(b'{"timestamp": "2024')
+        audit_system.log_action("admin", "delete", "Новая запись", entry_id="2")
+        # Чтение не ждет фоновой записи, пока его об этом не попросят
+        logs = audit_system.load_audit_logs(flush=True)
+        assert [log["action_type"] for log in logs] == ["add", "edit", "add", "delete"]
+        assert [log["username"] for log in audit_system.get_user_actions("admin")] == ["admin", "admin"]
+        assert len(audit_system.get_actions_by_type("add")) == 2
+        print("✓ Поврежденная строка не мешает чтению журнала")
+
+        export_file = os.path.join(directory, "export.json")
+        assert audit_system.export_audit_logs(export_file)
+        assert audit_system.clear_audit_logs() and audit_system.load_audit_logs() == []
+        assert audit_system.import_audit_logs(export_file) and audit_system.load_audit_logs() == logs
+        print("✓ Экспорт, очистка и импорт сохраняют записи")
+    finally:
+        audit_system.AUDIT_LOG_DIR, audit_system.LEGACY_AUDIT_LOG_FILE, audit_system.JSONL_AUDIT_LOG_FILE = files
+        shutil.rmtree(directory)
+
+
+def test_audit_writer():
+    print("Тестируем фоновую запись аудита...")
+
+    audit_dir = tempfile.mkdtemp()
+    audit_dir_before = audit_system.AUDIT_LOG_DIR
+    audit_system.AUDIT_LOG_DIR = audit_dir
+    store = get_audit_store(audit_dir)
+    writer = audit_system.AuditWriter(batch_size=1, flush_interval=0.05, max_queue=2)
+    try:
+        # Пока хранилище занято, поток записи держит одну запись, очередь вмещает еще две,
+        # а остальные действия ждут места в очереди
+        with store._lock:
+            producer = threading.Thread(target=lambda: [writer.submit({"n": n}) for n in range(5)])
+            producer.start()
+            deadline = time.monotonic() + 5
+            while writer.stats()["backpressure_waits"] == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert writer.stats()["backpressure_waits"] >= 1 and writer.stats()["max_queue_depth"] == 2
+        producer.join()
+        writer.submit({"n": 5}, sync=True)
+        assert [log["n"] for log in store.iter_logs()] == list(range(6))
+        stats = writer.stats()
+        assert stats["written"] == 6 and stats["sync_writes"] == 1 and stats["queue_depth"] == 0
+        assert stats["max_flush_ms"] >= stats["avg_flush_ms"] > 0
+        print("✓ Очередь ограничена, синхронная запись ждет записи всех предыдущих действий")
+
+        batched = audit_system.AuditWriter(batch_size=10, flush_interval=0.05)
+        for n in range(6, 30):
+            batched.submit({"n": n})
+        batched.close()
+        batched.submit({"n": 30})
+        assert [log["n"] for log in store.iter_logs()] == list(range(31))
+        assert batched.stats()["batches"] < 24
+        print("✓ Действия записываются пакетами, остаток дописывается при остановке")
+    finally:
+        writer.close()
+        audit_system.AUDIT_LOG_DIR = audit_dir_before
+        shutil.rmtree(audit_dir)
+
+
+if __name__ == "__main__":
+    test_audit_log()
+    test_audit_writer()
@@ -0,0 +1,127 @@
+"""
+Тестирование общего хранилища записей базы знаний
+"""
+import json
+import os
+import tempfile
+
+from document_store import DocumentStore
+
+
+def _make_store(entries):
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False)
+    return DocumentStore(path), path
+
+
+def test_document_store():
+    print("Тестируем хранилище записей...")
+
+    store, path = _make_store([
+        {"id": "1", "title": "Первая", "content": "текст", "author": "admin"},
+        {"id": "2", "title": "Вторая", "content": "текст", "topic": None}
+    ])
+    try:
+        first = store.snapshot()
+        assert len(first) == 2
+        assert first.entries[1]["topic"] == "Без темы"
+        print("✓ Данные загружаются и нормализуются")
+
+        # Повторный срез без изменений файла не перечитывает данные
+        assert store.snapshot().version == first.version
+        assert store.snapshot().entries is first.entries
+        print("✓ Файл не перечитывается без изменений")
+
+        store.add_entry({"id": "3", "title": "Третья", "content": "новое"})
+        added = store.snapshot()
+        assert added.version > first.version
+        assert len(first) == 2 and len(added) == 3
+        assert added.entries[2]["author"] == "system"
+        print("✓ Добавление увеличивает версию и не меняет старые срезы")
+
+        old_entry = store.get_entry("1")
+        store.update_entry("1", {"title": "Первая (изм.)"})
+        assert old_entry["title"] == "Первая"
+        assert store.get_entry("1")["title"] == "Первая (изм.)"
+        print("✓ Редактирование создает новый объект записи")
+
+        assert store.delete_entry("2")["title"] == "Вторая"
+        assert store.get_entry("2") is None
+        assert store.delete_entry("missing") is None
+        print("✓ Удаление работает")
+
+        # Внешнее изменение файла (например, восстановление из копии) подхватывается
+        before = store.snapshot().version
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"id": "9", "title": "Извне", "content": "файл заменен целиком"}], f, ensure_ascii=False)
+        reloaded = store.snapshot()
+        assert reloaded.version > before
+        assert [entry["id"] for entry in reloaded] == ["9"]
+        print("✓ Изменение файла приводит к перезагрузке")
+    finally:
+        os.remove(path)
+
+    print("\nВсе тесты хранилища пройдены!")
+
+
+def test_document_store_indexes():
+    print("Тестируем индексы ID и заголовков...")
+
+    store, path = _make_store([
+        {"id": str(i), "title": f"Запись {i}", "content": "текст"} for i in range(5)
+    ])
+    try:
+        assert store.get_entry("3")["title"] == "Запись 3"
+        assert store.find_id_by_title("  запись   3 ") == "3"
+        assert store.title_exists("Запись 3", exclude_id="3") is False
+        print("✓ Поиск по ID и нормализованному заголовку")
+
+        store.delete_entry("1")
+        assert [store.get_entry(str(i))["id"] for i in (0, 2, 3, 4)] == ["0", "2", "3", "4"]
+        assert store.get_entry("1") is None
+        assert not store.title_exists("Запись 1")
+        print("✓ Индексы согласованы после удаления")
+
+        store.update_entry("4", {"title": "Новый заголовок"})
+        assert not store.title_exists("Запись 4")
+        assert store.find_id_by_title("новый заголовок") == "4"
+        added = store.add_entry({"title": "Без ID", "content": "текст"})
+        assert store.get_entry(added["id"]) is added
+        assert store.find_id_by_title("без id") == added["id"]
+        print("✓ Индексы согласованы после изменения и добавления")
+    finally:
+        os.remove(path)
+
+
+def test_snapshot_entries_read_only():
+    print("Тестируем защиту записей среза от изменения...")
+
+    store, path = _make_store([{"id": "1", "title": "Первая", "content": "текст"}])
+    try:
+        entry = store.snapshot().entries[0]
+        for mutate in (lambda: entry.__setitem__("title", "Другая"), lambda: entry.update(title="Другая"),
+                       lambda: entry.pop("title"), lambda: entry.__delitem__("title")):
+            try:
+                mutate()
+                assert False, "запись среза изменена на месте"
+            except TypeError:
+                pass
+        assert store.get_entry("1")["title"] == "Первая"
+        assert store.find_id_by_title("первая") == "1"
+        print("✓ Записи среза нельзя изменить на месте")
+
+        copy = dict(entry)
+        copy["title"] = "Копия"
+        assert entry["title"] == "Первая" and json.loads(json.dumps(entry)) == dict(entry)
+        store.update_entry("1", copy)
+        assert store.get_entry("1")["title"] == "Копия" and entry["title"] == "Первая"
+        print("✓ Изменение через копию и update_entry")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    test_document_store()
+    test_document_store_indexes()
+    test_snapshot_entries_read_only()
@@ -0,0 +1,112 @@
+"""
+Тестирование постоянного кэша эмбеддингов
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+class CountingEncoder:
+    """Простой кодировщик: вектор из длины текста и числа пробелов, с подсчетом вызовов"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[len(text), text.count(" "), 1.0] for text in texts], dtype=np.float32)
+
+
+def test_embedding_cache():
+    print("Тестируем кэш эмбеддингов...")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        encoder = CountingEncoder()
+        cache = EmbeddingCache(cache_dir, "test-model")
+        documents = ["первый документ", "второй  документ", "третий"]
+        first = cache.encode(documents, encoder)
+        assert first.shape == (3, 3)
+        assert encoder.encoded == documents
+        print("✓ Эмбеддинги вычисляются при первом обращении")
+
+        # Повторная загрузка и нормализация пробелов не требуют вычислений
+        encoder.encoded.clear()
+        again = cache.encode(["первый документ", "второй документ", "третий"], encoder)
+        assert encoder.encoded == []
+        assert np.array_equal(first, again)
+        print("✓ Повторная загрузка берет эмбеддинги из кэша")
+
+        # После перезапуска кэш читается с диска, вычисляются только новые тексты
+        restarted = CountingEncoder()
+        cache = EmbeddingCache(cache_dir, "test-model")
+        result = cache.encode(["третий", "новый текст", "первый документ"], restarted)
+        assert restarted.encoded == ["новый текст"]
+        assert np.array_equal(result[0], first[2]) and np.array_equal(result[2], first[0])
+        print("✓ Кэш сохраняется между перезапусками")
+
+        # Эмбеддинги другой модели не используются
+        other = CountingEncoder()
+        EmbeddingCache(cache_dir, "other-model").encode(["третий"], other)
+        assert other.encoded == ["третий"]
+        print("✓ Ключ учитывает название модели")
+
+        assert cache.compact(["третий"]) == 3
+        assert cache.row_count == 1
+        assert np.array_equal(EmbeddingCache(cache_dir, "test-model").encode(["третий"], encoder)[0], first[2])
+        print("✓ Сжатие удаляет устаревшие эмбеддинги")
+
+        # Недописанный хвост файла после сбоя отбрасывается
+        with open(cache.vectors_file, "ab") as f:
+            f.write(b"\x00\x01")
+        recovered = EmbeddingCache(cache_dir, "test-model")
+        encoder.encoded.clear()
+        recovered.encode(["ещё один"], encoder)
+        assert os.path.getsize(recovered.vectors_file) == 2 * 3 * 4
+        assert np.array_equal(recovered.encode(["третий"], encoder)[0], first[2])
+        print("✓ Оборванная запись не портит кэш")
+    finally:
+        shutil.rmtree(cache_dir)
+
+    print("\nВсе тесты кэша эмбеддингов пройдены!")
+
+
+def test_shared_cache_dir():
+    print("Тестируем общий каталог кэша для нескольких процессов...")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        # Два экземпляра кэша открыты до записи, как в двух воркерах
+        encoder = CountingEncoder()
+        first = EmbeddingCache(cache_dir, "test-model")
+        second = EmbeddingCache(cache_dir, "test-model")
+        first.encode(["первый документ"], encoder)
+        second.encode(["второй документ", "первый документ"], encoder)
+        assert encoder.encoded == ["первый документ", "второй документ"]
+        print("✓ Таблица смещений перечитывается перед дописыванием, строки не дублируются")
+
+        # Свои строки одного экземпляра не затирают строки другого
+        third = EmbeddingCache(cache_dir, "test-model")
+        assert len(third) == 2 and third.row_count == 2
+        encoder.encoded.clear()
+        vectors = first.encode(["второй документ", "первый документ"], encoder)
+        assert encoder.encoded == []
+        assert np.array_equal(vectors, encoder(["второй документ", "первый документ"]))
+
+        assert second.compact(["второй документ"]) == 1
+        encoder.encoded.clear()
+        assert np.array_equal(first.encode(["третий"], encoder)[0], encoder(["третий"])[0])
+        assert EmbeddingCache(cache_dir, "test-model").row_count == 2
+        assert len(EmbeddingCache(cache_dir, "test-model")) == 2
+        print("✓ Сжатие другим экземпляром учитывается при следующей записи")
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    test_embedding_cache()
+    test_shared_cache_dir()
@@ -0,0 +1,154 @@
+"""
+Тестирование фильтров поиска по фасетам
+"""
+import json
+import os
+import tempfile
+
+from advanced_filter import AdvancedFilterManager
+from document_store import get_document_store
+from facets import NO_TIMESTAMP, FacetIndex, SearchFilters, get_store_facets, parse_timestamp, resolve_filters
+from Filter import FilterManager
+from inverted_index import SyntaxSearchIndex
+from simple_semantic_search_integration import SimpleIntegratedSearchSystem
+
+DATA = [
+    {"id": "1", "title": "Алгебра алгебра алгебра", "content": "уравнения", "topic": "Математика",
+     "author": "ivanov", "created_at": "2024-01-10T10:00:00",
+     "education_info": {"class": "7А", "parallel": "7", "subject": "Алгебра"}},
+    {"id": "2", "title": "Алгебра", "content": "история алгебры", "topic": "История",
+     "author": "petrov", "created_at": "2024-03-05T09:00:00",
+     "education_info": {"class": "8Б", "parallel": "8", "subject": "История"}},
+    {"id": "3", "title": "Геометрия и алгебра", "content": "треугольники", "topic": "Математика",
+     "author": "petrov", "created_at": "2024-05-20T12:00:00",
+     "education_info": {"class": "7Б", "parallel": "7", "subject": "Геометрия"}},
+    {"id": "4", "title": "Без даты", "content": "алгебра", "topic": "Математика"},
+]
+
+
+def test_facet_index():
+    print("Тестируем индекс фасетов...")
+
+    index = FacetIndex()
+    for row, entry in enumerate(DATA):
+        index.add(row, entry)
+
+    assert index.rows(SearchFilters()) is None
+    assert index.rows(SearchFilters(topic="Все темы", class_name="all")) is None
+    assert index.rows(SearchFilters(topic="Математика")) == {0, 2, 3}
+    assert index.rows(SearchFilters(topic="Математика", parallel="7")) == {0, 2}
+    assert index.rows(SearchFilters(author="petrov", subject="Геометрия")) == {2}
+    assert index.rows(SearchFilters(topic="Нет такой")) == set()
+    assert index.rows(SearchFilters(date_from="2024-03-01")) == {1, 2}
+    assert index.rows(SearchFilters(topic="Математика", date_to="2024-03-05")) == {0}
+    assert index.rows(SearchFilters(date_from="2024-03-05", date_to="2024-03-05")) == {1}
+    assert index.values("parallel") == {"7": 2, "8": 1}
+    print("✓ Списки строк пересекаются по всем фильтрам")
+
+    index.remove(2, DATA[2])
+    assert index.rows(SearchFilters(parallel="7")) == {0}
+    assert index.mask(SearchFilters(parallel="7"), 4).tolist() == [True, False, False, False]
+    assert all(SearchFilters(topic="Математика", parallel="7").matches(entry) == (row == 0)
+               for row, entry in enumerate(DATA[:2]))
+
+    filters = resolve_filters(SearchFilters(parallel="7", date_from="2024-01-01"), topic="Математика")
+    assert filters.values == {"topic": "Математика", "parallel": "7"} and filters.date_from == "2024-01-01"
+    assert resolve_filters(None, "Все темы") is None
+    print("✓ Удаление строки и объединение с темой")
+
+
+def test_filtered_search():
+    print("Тестируем поиск с фильтрами...")
+
+    syntax = SyntaxSearchIndex()
+    syntax.build(DATA)
+    assert [entry["id"] for entry in syntax.search("алгебра")] == ["1", "2", "3", "4"]
+    assert [entry["id"] for entry in syntax.search("алгебра", filters=SearchFilters(parallel="7"))] == ["1", "3"]
+    assert [entry["id"] for entry in syntax.search("алгебра", topic="История")] == ["2"]
+    # Отрицание вычисляется по каждому полю отдельно и только внутри отфильтрованных строк
+    assert [entry["id"] for entry in syntax.search("NOT треугольники", filters=SearchFilters(parallel="7"))] == ["1", "3"]
+    assert [entry["id"] for entry in syntax.search("NOT алгебр", filters=SearchFilters(topic="История"))] == []
+    assert [entry["id"] for entry in syntax.search('"история алгебры"', filters=SearchFilters(author="ivanov"))] == []
+    print("✓ Синтаксический поиск вычисляет запрос только по отфильтрованным строкам")
+
+    semantic = SimpleIntegratedSearchSystem()
+    semantic.load_documents(DATA)
+    # Без фильтра лучшая запись — «Алгебра алгебра алгебра» (Математика);
+    # с фильтром по теме топ-1 выбирается только среди записей темы «История»
+    assert semantic.semantic_search("алгебра", 1)[0][0] == 0
+    assert [idx for idx, _ in semantic.semantic_search("алгебра", 1, SearchFilters(topic="История"))] == [1]
+    assert {idx for idx, _ in semantic.semantic_search("алгебра", 5, SearchFilters(date_from="2024-02-01"))} == {1, 2}
+    assert semantic.semantic_search("алгебра", 5, SearchFilters(topic="Нет такой")) == []
+    assert semantic.batch_semantic_search(["алгебра"], 5, SearchFilters(parallel="7"))[0] == \
+        semantic.semantic_search("алгебра", 5, SearchFilters(parallel="7"))
+    print("✓ Семантический поиск выбирает лучшие записи после фильтрации")
+
+
+
+def test_store_facets():
+    print("Тестируем индекс фасетов хранилища...")
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(DATA, f, ensure_ascii=False)
+    filters_file = path + ".filters.json"
+    try:
+        store = get_document_store(path)
+        index = get_store_facets(store)
+
+        def expected(filters):
+            return [entry for entry in store.snapshot().entries if filters.matches(entry)]
+
+        checks = [SearchFilters(), SearchFilters(topic="Математика"), SearchFilters(parallel="7", topic="Математика"),
+                  SearchFilters(author="petrov"), SearchFilters(date_to="2024-04-01")]
+        assert all(index.filter(filters) == expected(filters) for filters in checks)
+
+        store.update_entry("1", {"education_info": {"class": "8А", "parallel": "8", "subject": "Алгебра"}})
+        store.delete_entry("2")
+        store.add_entry({"id": "5", "title": "Новая", "content": "текст", "topic": "Математика",
+                         "education_info": {"class": "7А", "parallel": "7"}})
+        assert all(index.filter(filters) == expected(filters) for filters in checks)
+        assert [entry["id"] for entry in index.filter(SearchFilters(parallel="7"))] == ["3", "5"]
+        assert index.counts("parallel") == {"8": 1, "7": 2} and index.total() == 4
+        print("✓ Изменения записей применяются к спискам без полного перестроения")
+
+        manager = AdvancedFilterManager(path, filters_file)
+        assert manager.facets is index
+        assert manager.filter_entries(selected_class="all", selected_topic="Математика") == \
+            expected(SearchFilters(topic="Математика"))
+        assert manager.get_unique_classes() == ["7А", "7Б", "8А"]
+        assert manager.get_unique_subjects() == ["Алгебра", "Геометрия"]
+        assert manager.get_unique_topics() == ["Без темы", "Все темы", "Математика"]
+
+        def newest_first(filters):
+            # Прежний порядок главной страницы: устойчивая сортировка по строке created_at
+            return sorted(expected(filters),
+                          key=lambda entry: entry["created_at"], reverse=True)
+
+        store.add_entry({"id": "6", "title": "Та же дата", "topic": "Математика", "created_at": "2024-05-20T12:00:00"})
+        store.add_entry({"id": "7", "title": "UTC", "topic": "История", "created_at": "2024-03-31T23:30:00Z"})
+        dated = [SearchFilters(date_from="2024-03-01"), SearchFilters(date_to="2024-03-31"),
+                 SearchFilters(topic="Математика", date_from="2024-01-10", date_to="2024-05-20"),
+                 SearchFilters(date_from="2024-06-01")]
+        assert all(index.filter(filters, newest_first=True) == newest_first(filters) for filters in dated)
+        assert all(index.filter(filters) == expected(filters) for filters in dated)
+        assert index.filter(newest_first=True) == newest_first(SearchFilters())
+        assert index.timestamps("7")[0] == parse_timestamp("2024-03-31T23:30:00") != NO_TIMESTAMP
+        assert manager.filter_entries(date_from="2024-03-01", date_to="bad", newest_first=True) == \
+            newest_first(SearchFilters(date_from="2024-03-01"))
+        print("✓ Диапазон дат и порядок «новые сверху» берутся из индекса дат")
+
+        topics = FilterManager(path)
+        assert topics.get_topic_statistics() == {"Все темы": 6, "Математика": 5, "История": 1}
+        assert topics.filter_by_topic("Все темы") == list(store.snapshot().entries)
+        print("✓ Менеджеры фильтров отвечают из индекса")
+    finally:
+        os.remove(path)
+        if os.path.exists(filters_file):
+            os.remove(filters_file)
+
+
+if __name__ == "__main__":
+    test_facet_index()
+    test_filtered_search()
+    test_store_facets()
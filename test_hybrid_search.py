@@ -0,0 +1,77 @@
+"""
+Тестирование гибридного поиска (параллельные движки + RRF)
+"""
+import time
+
+from hybrid_search import reciprocal_rank_fusion, run_hybrid_search
+
+
+def test_hybrid_search():
+    print("Тестируем гибридный поиск...")
+
+    a, b, c, d = ({"id": name, "title": name} for name in "abcd")
+    fused = reciprocal_rank_fusion({
+        "syntax": [a, b, c],
+        "semantic": [dict(c, relevance_score=0.9), d, a],
+    })
+    # a: 1/61 + 1/63, c: 1/63 + 1/61 — равны, a появился первым
+    assert [entry["id"] for entry in fused] == ["a", "c", "b", "d"]
+    assert fused[0]["matched_by"] == ["syntax", "semantic"]
+    assert fused[1]["relevance_score"] == 0.9
+    assert "fusion_score" not in a
+    assert [entry["id"] for entry in reciprocal_rank_fusion({"syntax": [a, b]}, top_k=1)] == ["a"]
+    print("✓ Выдача объединяется по обратному рангу")
+
+    def slow():
+        time.sleep(0.5)
+        return [a]
+
+    def broken():
+        raise RuntimeError("сбой")
+
+    started = time.monotonic()
+    result = run_hybrid_search({"syntax": lambda: [b], "semantic": slow}, {"syntax": 0.5, "semantic": 0.05})
+    assert time.monotonic() - started < 0.4
+    assert result["partial"] and result["engines"] == {"syntax": "ok", "semantic": "timeout"}
+    assert [entry["id"] for entry in result["entries"]] == ["b"]
+    print("✓ Медленный движок не задерживает ответ, результат помечен как частичный")
+
+    result = run_hybrid_search({"syntax": lambda: [b], "semantic": broken}, {"syntax": 1, "semantic": 1})
+    assert result["partial"] and result["engines"]["semantic"] == "error"
+
+    result = run_hybrid_search({"syntax": lambda: [b], "semantic": lambda: [a, b]}, {"syntax": 1, "semantic": 1})
+    assert not result["partial"] and [entry["id"] for entry in result["entries"]] == ["b", "a"]
+    print("✓ Ошибка движка также дает частичный результат")
+
+
+def test_combined_search():
+    print("Тестируем комбинированный поиск...")
+
+    from inverted_index import syntax_index
+    from simple_semantic_search_integration import initialize_search_system, perform_combined_search, search_system
+
+    data = [
+        {"id": "1", "title": "Машинное обучение", "content": "Нейронные сети и обучение моделей", "topic": "ИТ"},
+        {"id": "2", "title": "Базы данных", "content": "SQL и реляционные модели", "topic": "ИТ"},
+        {"id": "3", "title": "История", "content": "Древний мир", "topic": "История"},
+    ]
+    # Глобальные индексы могут быть подключены к хранилищу приложения, если оно уже импортировано
+    stores = search_system.store, syntax_index.store
+    search_system.store = syntax_index.store = None
+    try:
+        initialize_search_system(data)
+        syntax_index.build(data)
+
+        result = perform_combined_search("обучение", top_k=5, timeouts={"syntax": 5, "semantic": 5})
+        assert not result["partial"]
+        assert result["entries"][0]["id"] == "1"
+        assert result["entries"][0]["matched_by"] == ["syntax", "semantic"]
+        assert perform_combined_search("обучение", topic="История", timeouts={"syntax": 5, "semantic": 5})["entries"] == []
+    finally:
+        search_system.store, syntax_index.store = stores
+    print("✓ Синтаксический и семантический движки объединены")
+
+
+if __name__ == "__main__":
+    test_hybrid_search()
+    test_combined_search()
@@ -0,0 +1,87 @@
+"""
+Тестирование постраничного вывода с курсорами
+"""
+import json
+import os
+import tempfile
+
+from document_store import get_document_store
+from facets import SearchFilters, get_store_facets
+from pagination import MAX_PAGE_SIZE, PAGE_SIZE, decode_cursor, encode_cursor, page_ranked, page_size
+
+
+def collect_pages(index, filters, limit):
+    """Все страницы подряд, переходя по курсорам"""
+    pages, cursor = [], None
+    while True:
+        page, cursor = index.page(filters, limit=limit, after=cursor)
+        pages.append([entry["id"] for entry in page])
+        if cursor is None:
+            return pages
+
+
+def test_cursors():
+    print("Тестируем курсоры...")
+
+    assert decode_cursor(encode_cursor(1700000000000000, "a_b")) == (1700000000000000, "a_b")
+    assert decode_cursor(encode_cursor(-5, "x")) == (-5, "x")
+    assert decode_cursor(None) is None and decode_cursor("мусор") is None
+    assert page_size() == PAGE_SIZE and page_size("10") == 10
+    assert page_size("100000") == MAX_PAGE_SIZE and page_size("0") == 1 and page_size("abc") == PAGE_SIZE
+    print("✓ Курсор и размер страницы разбираются из параметров запроса")
+
+    entries = [{"id": str(i)} for i in range(5)]
+    page, cursor = page_ranked(entries, 2)
+    assert [entry["id"] for entry in page] == ["0", "1"] and cursor == encode_cursor(1, "1")
+    page, cursor = page_ranked(entries, 2, cursor)
+    assert [entry["id"] for entry in page] == ["2", "3"]
+    page, last = page_ranked(entries, 2, cursor)
+    assert [entry["id"] for entry in page] == ["4"] and last is None
+    # Выдача пересчитана: запись курсора сместилась, страница продолжается после нее
+    page, _ = page_ranked([{"id": "x"}] + entries, 2, cursor)
+    assert [entry["id"] for entry in page] == ["4"]
+    print("✓ Выдача поиска листается по позиции и ID записи")
+
+
+def test_store_pages():
+    print("Тестируем страницы главной...")
+
+    data = [{"id": str(i), "title": f"Запись {i}", "topic": "Математика" if i % 2 else "История",
+             "created_at": f"2024-01-{i // 2 + 1:02d}T10:00:00"} for i in range(9)]
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    try:
+        store = get_document_store(path)
+        index = get_store_facets(store)
+        for filters in (SearchFilters(), SearchFilters(topic="Математика"), SearchFilters(date_to="2024-01-03"),
+                        SearchFilters(topic="История", date_from="2024-01-02")):
+            expected = [entry["id"] for entry in index.filter(filters, newest_first=True)]
+            pages = collect_pages(index, filters, 2)
+            assert sum(pages, []) == expected and all(len(page) == 2 for page in pages[:-1])
+            assert index.count(filters) == len(expected)
+        assert sum(collect_pages(index, SearchFilters(), 4), [])[:3] == ["8", "6", "7"]
+        print("✓ Страницы по курсору (created_at, строка, ID) совпадают с полным списком")
+
+        first, cursor = index.page(limit=3)
+        store.add_entry({"id": "new", "title": "Новая", "created_at": "2024-02-01T10:00:00"})
+        store.delete_entry(first[-1]["id"])
+        second, _ = index.page(limit=3, after=cursor)
+        assert [entry["id"] for entry in first] == ["8", "6", "7"]
+        assert [entry["id"] for entry in second] == ["4", "5", "2"]
+        assert index.page(limit=3, after="мусор")[0][0]["id"] == "new"
+
+        # Удалена запись курсора, у следующей та же дата создания: она не пропускается
+        first, cursor = index.page(limit=4)
+        assert [entry["id"] for entry in first] == ["new", "8", "6", "4"]
+        store.delete_entry("4")
+        second, _ = index.page(limit=2, after=cursor)
+        assert [entry["id"] for entry in second] == ["5", "2"]
+        print("✓ Добавление и удаление записей не сдвигают следующую страницу")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    test_cursors()
+    test_store_pages()
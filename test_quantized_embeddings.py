@@ -0,0 +1,61 @@
+"""
+Тестирование квантованной матрицы эмбеддингов
+"""
+import glob
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from ann_index import IVFIndex, normalize_rows
+from quantized_embeddings import QuantizedEmbeddings
+
+
+def test_quantized_embeddings():
+    print("Тестируем квантованные эмбеддинги...")
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(3000, 64)).astype(np.float32)
+    query = rng.normal(size=64).astype(np.float32)
+    exact = normalize_rows(embeddings) @ normalize_rows(query)[0]
+
+    for mode, tolerance in (("int8", 0.02), ("float16", 0.002)):
+        quantized = QuantizedEmbeddings.from_embeddings(embeddings, mode)
+        scores = quantized.score(query)
+        assert np.abs(scores - exact).max() < tolerance, mode
+        top_exact = set(np.argsort(-exact)[:10].tolist())
+        top_quantized = set(np.argsort(-scores)[:10].tolist())
+        assert len(top_exact & top_quantized) >= 8, mode
+        rows = np.array([5, 1, 2999])
+        assert np.allclose(quantized.score(query, rows), scores[rows])
+    assert QuantizedEmbeddings.from_embeddings(embeddings, "int8").nbytes < embeddings.nbytes / 3
+    print("✓ Сходство по квантованным данным близко к точному")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        prefix = os.path.join(cache_dir, "model")
+        stored = QuantizedEmbeddings.open_or_create(prefix, embeddings, "int8")
+        assert isinstance(stored.codes, np.memmap) and not stored.codes.flags.writeable
+        assert np.array_equal(stored.score(query), QuantizedEmbeddings.from_embeddings(embeddings).score(query))
+        print("✓ Файл открывается через memmap только для чтения")
+
+        # Тот же набор эмбеддингов открывает существующий файл, новый — создает новую версию
+        modified_time = os.path.getmtime(stored.codes.filename)
+        assert QuantizedEmbeddings.open_or_create(prefix, embeddings, "int8").fingerprint == stored.fingerprint
+        assert os.path.getmtime(stored.codes.filename) == modified_time
+        updated = QuantizedEmbeddings.open_or_create(prefix, embeddings[:-1], "int8")
+        assert updated.fingerprint != stored.fingerprint and len(updated) == len(embeddings) - 1
+        assert len(glob.glob(prefix + ".*.int8.npy")) == 1
+        print("✓ Файлы версионируются по отпечатку эмбеддингов")
+
+        index = IVFIndex(n_lists=30).build(embeddings[:-1], updated)
+        found = index.search(query, 10, n_probe=30)
+        assert [idx for idx, _ in found] == np.argsort(-updated.score(query), kind="stable")[:10].tolist()
+        print("✓ Индекс IVF считает сходство по квантованной матрице")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_quantized_embeddings()
@@ -0,0 +1,72 @@
+"""
+Тестирование кэша результатов поиска
+"""
+import json
+import os
+import tempfile
+import time
+
+from document_store import DocumentStore
+from result_cache import ResultCache, normalize_query
+
+
+def test_result_cache():
+    print("Тестируем кэш результатов поиска...")
+
+    cache = ResultCache(max_entries=2)
+    calls = []
+
+    def compute(value):
+        def run():
+            calls.append(value)
+            return [value]
+        return run
+
+    assert cache.get_or_compute("a", compute("a")) == ["a"]
+    assert cache.get_or_compute("a", compute("a")) == ["a"]
+    assert calls == ["a"] and cache.hits == 1 and cache.misses == 1
+    print("✓ Повторный запрос берется из кэша")
+
+    cache.get_or_compute("b", compute("b"))
+    cache.get("a")  # "a" становится последним использованным
+    cache.get_or_compute("c", compute("c"))
+    assert cache.get("b") is None and cache.get("a") == ["a"] and cache.get("c") == ["c"]
+    assert len(cache) == 2 and cache.evictions == 1
+    print("✓ Вытесняется наименее используемый результат")
+
+    ttl_cache = ResultCache(max_entries=10, ttl=0.05)
+    ttl_cache.put("x", [1])
+    assert ttl_cache.get("x") == [1]
+    time.sleep(0.06)
+    assert ttl_cache.get("x") is None and len(ttl_cache) == 0
+    print("✓ Результаты с истекшим сроком жизни не возвращаются")
+
+    assert normalize_query("  Машинное   ОБУЧЕНИЕ ") == normalize_query("машинное обучение")
+
+    # Изменение хранилища меняет версию в ключе, и старый результат больше не находится
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump([{"id": "1", "title": "Первая", "content": "текст"}], f, ensure_ascii=False)
+    try:
+        store = DocumentStore(path)
+        search_cache = ResultCache()
+
+        def search():
+            return [entry["title"] for entry in store.snapshot().entries]
+
+        def key():
+            return normalize_query("запрос"), "syntax", "Все темы", 20, store.version
+
+        assert search_cache.get_or_compute(key(), search) == ["Первая"]
+        assert search_cache.get_or_compute(key(), search) == ["Первая"]
+        store.add_entry({"id": "2", "title": "Вторая", "content": "текст"})
+        assert search_cache.get_or_compute(key(), search) == ["Первая", "Вторая"]
+        stats = search_cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 2 and stats["size"] == 2
+        print("✓ Изменение записей инвалидирует кэш через версию хранилища")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    test_result_cache()
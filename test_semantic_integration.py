@@ -7,7 +7,14 @@ import os
 # Добавляем путь к рабочей директории
 sys.path.insert(0, '/workspace')
 
-from simple_semantic_search_integration import SimpleIntegratedSearchSystem, initialize_search_system, perform_integrated_search
+import json
+import shutil
+import tempfile
+import time
+
+from document_store import DocumentStore
+from passages import full_text_path, has_full_text, save_full_text, split_passages
+from simple_semantic_search_integration import SimpleIntegratedSearchSystem, initialize_search_system, perform_batch_search, perform_integrated_search
 
 def test_semantic_search_integration():
     """Тестирование интеграции семантического поиска"""
@@ -61,5 +68,210 @@ def test_semantic_search_integration():
     
     print("\nТестирование завершено успешно!")
 
+def test_batch_search():
+    """Тестирование пакетного поиска всеми движками"""
+    print("Тестируем пакетный поиск...")
+
+    from inverted_index import syntax_index
+    from simple_semantic_search_integration import search_system
+
+    data = [
+        {"id": "1", "title": "Машинное обучение", "content": "нейронные сети и обучение моделей"},
+        {"id": "2", "title": "Базы данных", "content": "язык запросов SQL и реляционные модели"},
+        {"id": "3", "title": "Python", "content": "язык программирования для обучения моделей"},
+    ]
+    queries = ["обучение моделей", "SQL", "", "язык"]
+    # Глобальные индексы могут быть подключены к хранилищу приложения, если оно уже импортировано
+    stores = search_system.store, syntax_index.store
+    search_system.store = syntax_index.store = None
+    try:
+        initialize_search_system(data)
+        syntax_index.build(data)
+        for search_type in ("semantic", "syntax", "combined"):
+            batch = perform_batch_search(queries, search_type=search_type, top_k=2)
+            assert len(batch) == len(queries)
+            for query, entries in zip(queries, batch):
+                single = perform_integrated_search(query, search_type=search_type, top_k=2) if query else []
+                assert [entry["id"] for entry in entries] == [entry["id"] for entry in single], search_type
+        syntax = perform_batch_search(queries, search_type="syntax", top_k=5)
+        assert [[entry["id"] for entry in entries] for entries in syntax] == [["1"], ["2"], [], ["2", "3"]]
+        print("✓ Пакетный поиск совпадает с поиском по одному запросу для всех движков")
+
+        try:
+            perform_batch_search(queries, search_type="fuzzy")
+            assert False, "неизвестный тип поиска принят"
+        except ValueError:
+            pass
+        print("✓ Неизвестный тип поиска отклоняется")
+    finally:
+        search_system.store, syntax_index.store = stores
+
+def test_incremental_index():
+    """Тестирование инкрементального обновления индекса по изменениям хранилища"""
+    print("Тестируем инкрементальное обновление индекса...")
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump([
+            {"id": "1", "title": "Python", "content": "язык программирования python для анализа данных"},
+            {"id": "2", "title": "SQL", "content": "язык запросов к базам данных"}
+        ], f, ensure_ascii=False)
+
+    try:
+        store = DocumentStore(path)
+        system = SimpleIntegratedSearchSystem(drift_threshold=0.5, tombstone_threshold=0.5)
+        system.attach_store(store)
+
+        # Добавление с известными словами не вызывает переобучения
+        store.add_entry({"id": "3", "title": "Анализ", "content": "анализ данных на python"})
+        found = [system.get_document_by_index(idx)["id"] for idx, _ in system.semantic_search("анализ данных python", 3)]
+        assert "3" in found
+        print("✓ Добавленная запись найдена без полного переобучения")
+
+        store.delete_entry("1")
+        found = [system.get_document_by_index(idx)["id"] for idx, _ in system.semantic_search("python", 3)]
+        assert "1" not in found and "3" in found
+        print("✓ Удаленная запись исключена из выдачи")
+
+        # Много новых слов — переобучение по порогу дрейфа словаря
+        store.update_entry("2", {"content": "реляционные таблицы индексы транзакции нормализация схемы"})
+        assert system.refit_count == 2
+        found = [system.get_document_by_index(idx)["id"] for idx, _ in system.semantic_search("транзакции", 3)]
+        assert found == ["2"]
+        print("✓ Дрейф словаря вызывает переобучение")
+
+        # Новые строки присоединяются к матрице одним пакетом перед поиском
+        rows = system.tfidf_matrix.shape[0]
+        for i in range(4, 8):
+            store.add_entry({"id": str(i), "title": f"Запись {i}", "content": "реляционные таблицы"})
+        store.delete_entry("5")
+        assert system.tfidf_matrix.shape[0] == rows and len(system._pending_mask) == 4
+        found = {system.get_document_by_index(idx)["id"] for idx, _ in system.semantic_search("таблицы", 10)}
+        assert found == {"2", "4", "6", "7"}
+        assert system.tfidf_matrix.shape[0] == rows + 4 and not system._pending_rows
+        assert system.refit_count == 2
+        print("✓ Строки новых записей присоединяются к матрице пакетом")
+
+        # Счетчик живых строк совпадает с маской, доля удаленных строк вызывает переобучение
+        assert system._live_rows == int(system._row_mask.sum())
+        store.delete_entry("4")
+        store.delete_entry("6")
+        assert system.refit_count == 2 and system._live_rows == int(system._row_mask.sum()) == 3
+        store.delete_entry("7")
+        assert system.refit_count == 3 and system._live_rows == len(system.documents) == 2
+        print("✓ Удаленные строки учитываются счетчиком без пересчета маски")
+    finally:
+        os.remove(path)
+
+def test_lazy_warm_up():
+    """Тестирование отложенного построения индекса и прогрева"""
+    print("Тестируем отложенное построение индекса...")
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump([{"id": "1", "title": "Python", "content": "язык программирования python"}], f, ensure_ascii=False)
+
+    try:
+        store = DocumentStore(path)
+        system = SimpleIntegratedSearchSystem()
+        system.attach_store(store, build=False)
+        assert system.refit_count == 0 and not system.ready.is_set()
+        print("✓ Подключение к хранилищу не строит индекс")
+
+        store.add_entry({"id": "2", "title": "SQL", "content": "язык запросов"})
+        assert system.warm_up() is True
+        found = [system.get_document_by_index(idx)["id"] for idx, _ in system.semantic_search("запросов", 3)]
+        assert found == ["2"]
+        print("✓ Прогрев строит индекс по актуальным данным")
+    finally:
+        os.remove(path)
+
+    # Без локальной трансформерной модели используется поиск TF-IDF, а не скачивание из сети
+    from semantic_search_integration import get_search_system
+    system = get_search_system()
+    assert system is get_search_system()
+    assert hasattr(system, "semantic_search")
+    print(f"✓ Фабрика системы поиска вернула {type(system).__name__}")
+
+def test_passage_index():
+    """Тестирование индексации длинных документов по фрагментам"""
+    print("Тестируем индексацию по фрагментам...")
+
+    passages = split_passages(" ".join(f"w{i}" for i in range(25)), size=10, overlap=3)
+    assert [len(passage.split()) for passage in passages] == [10, 10, 10, 4]
+    assert passages[1].split()[0] == "w7"
+    assert split_passages("") == [""]
+
+    full_text_folder = tempfile.mkdtemp()
+    # Полный текст документа хранится в отдельном каталоге по имени вложения, в записи — только начало
+    filler = " ".join(f"раздел{i}" for i in range(600))
+    save_full_text(os.path.join("static", "uploads", "doc.pdf"), f"{filler} аттестация педагогов {filler}",
+                   full_text_folder)
+    assert os.listdir(full_text_folder) == ["doc.pdf.txt"]
+    data = [
+        {"id": "1", "title": "Приказ", "content": "Начало документа", "file": "doc.pdf"},
+        {"id": "2", "title": "Аттестация", "content": "аттестация " * 3},
+        {"id": "3", "title": "Другое", "content": "текст"},
+    ]
+    system = SimpleIntegratedSearchSystem(full_text_folder=full_text_folder, passage_words=100, passage_overlap=20)
+    system.load_documents(data)
+    assert len(system.documents) > len(data)
+    found = [idx for idx, _ in system.semantic_search("аттестация педагогов", 5)]
+    assert set(found) == {0, 1}
+    print("✓ Термин из середины полного текста находит запись")
+
+    sum_system = SimpleIntegratedSearchSystem(full_text_folder=full_text_folder, passage_words=100,
+                                              passage_overlap=20, pooling="sum")
+    sum_system.load_documents(data)
+    max_scores = dict(system.semantic_search("приказ", 5))
+    sum_scores = dict(sum_system.semantic_search("приказ", 5))
+    # Заголовок есть в каждом фрагменте: сумма растет с количеством фрагментов
+    assert sum_scores[0] > max_scores[0] * 2
+    assert sum_system.batch_semantic_search(["приказ"], 5)[0] == sum_system.semantic_search("приказ", 5)
+    print("✓ Оценки фрагментов объединяются максимумом или суммой")
+
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    try:
+        store = DocumentStore(path)
+        system = SimpleIntegratedSearchSystem(full_text_folder=full_text_folder, passage_words=100, passage_overlap=20)
+        system.attach_store(store)
+        store.delete_entry("1")
+        assert [idx for idx, _ in system.semantic_search("педагогов", 5)] == []
+        store.add_entry({"id": "4", "title": "Новая", "content": "педагогов " + filler})
+        assert [system.get_document_by_index(idx)["id"] for idx, _ in system.semantic_search("педагогов", 5)] == ["4"]
+        print("✓ Удаление и добавление записи меняют все ее фрагменты")
+
+        # Файл вложения заменен (как при синхронизации): прежний полный текст устарел
+        pdf_path = os.path.join(full_text_folder, "new.pdf")
+        save_full_text(pdf_path, f"{filler} другое", full_text_folder)
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF")
+        os.utime(pdf_path, (time.time() + 10, time.time() + 10))
+        assert not has_full_text(pdf_path, full_text_folder)
+        store.add_entry({"id": "5", "title": "Письмо", "content": "", "file": "new.pdf"})
+
+        def ids(query):
+            return [system.get_document_by_index(idx)["id"] for idx, _ in system.semantic_search(query, 5)]
+
+        assert "5" in ids("другое")
+        # Новый полный текст сохраняется до обновления записи, обновление переиндексирует ее фрагменты
+        save_full_text(pdf_path, f"{filler} аттестация", full_text_folder)
+        os.utime(full_text_path(pdf_path, full_text_folder), (time.time() + 20, time.time() + 20))
+        assert has_full_text(pdf_path, full_text_folder)
+        store.update_entry("5", {"updated_at": "2025-01-01T00:00:00"})
+        assert "5" not in ids("другое")
+        assert "5" in ids("аттестация")
+        print("✓ Полный текст старше файла считается устаревшим, обновление записи читает новый")
+    finally:
+        os.remove(path)
+        shutil.rmtree(full_text_folder)
+
+
 if __name__ == "__main__":
-    test_semantic_search_integration()
\ No newline at end of file
+    test_semantic_search_integration()
+    test_batch_search()
+    test_incremental_index()
+    test_lazy_warm_up()
+    test_passage_index()
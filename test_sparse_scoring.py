@@ -0,0 +1,67 @@
+"""
+Тестирование общего ядра оценки документов TF-IDF
+"""
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from sparse_scoring import batch_search_top_k, pool_scores, search_top_k, sparse_scores, to_scoring_matrix, top_k
+
+
+def test_sparse_scoring():
+    print("Тестируем ядро оценки документов...")
+
+    rng = np.random.default_rng(0)
+    words = [f"слово{i}" for i in range(300)]
+    documents = [" ".join(rng.choice(words, 20)) for _ in range(500)]
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform(documents)
+    scoring_matrix = to_scoring_matrix(matrix)
+
+    for query in ("слово1 слово2", "слово299", "неизвестное"):
+        query_vector = vectorizer.transform([query])
+        expected = cosine_similarity(query_vector, matrix).flatten()
+        assert np.allclose(sparse_scores(query_vector, scoring_matrix), expected)
+        found = search_top_k(query_vector, scoring_matrix, 10)
+        assert [score for _, score in found] == sorted((score for _, score in found), reverse=True)
+        assert np.allclose([score for _, score in found], np.sort(expected[expected > 0])[::-1][:10])
+    print("✓ Оценки совпадают с cosine_similarity")
+
+    # Равные оценки упорядочиваются по номеру документа, в том числе на границе k
+    scores = np.array([0.5, 0.9, 0.5, 0.0, 0.5, 0.9, 0.5])
+    assert top_k(scores, 4) == [(1, 0.9), (5, 0.9), (0, 0.5), (2, 0.5)]
+    assert top_k(scores, 10) == [(1, 0.9), (5, 0.9), (0, 0.5), (2, 0.5), (4, 0.5), (6, 0.5)]
+    mask = np.array([True, False, True, True, True, True, True])
+    assert top_k(scores, 2, mask) == [(5, 0.9), (0, 0.5)]
+    assert top_k(scores, 0) == []
+    print("✓ Выбор топ-k устойчив к равным оценкам и учитывает маску")
+
+    # Пакет запросов дает те же результаты, что и запросы по одному
+    queries = ["слово1 слово2", "слово299", "неизвестное", "слово5 слово6 слово7"]
+    mask = np.ones(matrix.shape[0], dtype=bool)
+    mask[::3] = False
+    batch = batch_search_top_k(vectorizer.transform(queries), scoring_matrix, 7, mask)
+    for query, found in zip(queries, batch):
+        single = search_top_k(vectorizer.transform([query]), scoring_matrix, 7, mask)
+        assert [idx for idx, _ in found] == [idx for idx, _ in single], query
+        assert np.allclose([score for _, score in found], [score for _, score in single])
+    assert batch[2] == []
+    print("✓ Пакетная оценка совпадает с оценкой по одному запросу")
+
+    # Строки — фрагменты записей: оценка записи — максимум или сумма оценок ее фрагментов
+    scores = np.array([0.2, 0.5, 0.0, 0.4, 0.3])
+    groups = np.array([0, 0, 1, 2, 2])
+    assert np.allclose(pool_scores(scores, groups, 3, "max"), [0.5, 0.0, 0.4])
+    assert np.allclose(pool_scores(scores, groups, 3, "sum"), [0.7, 0.0, 0.7])
+    assert np.allclose(pool_scores(scores, groups, 3, "max", mask=np.array([1, 0, 1, 1, 1], dtype=bool)),
+                       [0.2, 0.0, 0.4])
+    row_groups = np.arange(matrix.shape[0]) // 5
+    query_vector = vectorizer.transform(["слово1 слово2"])
+    found = search_top_k(query_vector, scoring_matrix, 3, row_groups=row_groups, group_count=100)
+    expected = cosine_similarity(query_vector, matrix).flatten().reshape(100, 5).max(axis=1)
+    assert [group for group, _ in found] == list(np.argsort(-expected, kind="stable")[:3])
+    print("✓ Оценки фрагментов объединяются в оценки записей")
+
+
+if __name__ == "__main__":
+    test_sparse_scoring()
@@ -0,0 +1,156 @@
+"""
+Тестирование подсистем хранения базы знаний (JSON и SQLite)
+"""
+import json
+import os
+import tempfile
+
+from document_store import DocumentStore
+from storage import JournaledJsonStorage, JsonStorage, SqliteStorage, migrate_json_to_sqlite
+
+
+def test_sqlite_storage():
+    print("Тестируем хранение в SQLite...")
+
+    directory = tempfile.mkdtemp()
+    json_file = os.path.join(directory, "knowledge_base.json")
+    db_file = os.path.join(directory, "knowledge_base.db")
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump([
+            {"id": "1", "title": "Первая", "content": "текст", "education_info": {"class": "5"}},
+            {"title": "Без ID", "content": "старая запись"}
+        ], f, ensure_ascii=False)
+
+    assert migrate_json_to_sqlite(json_file, db_file) == 2
+    print("✓ Перенос из JSON выполнен")
+
+    store = DocumentStore(json_file, storage=SqliteStorage(db_file))
+    entries = store.snapshot().entries
+    assert [entry["title"] for entry in entries] == ["Первая", "Без ID"]
+    assert entries[0]["education_info"] == {"class": "5"}
+    assert entries[1]["id"]
+    print("✓ Записи читаются в исходном порядке, недостающие ID проставлены")
+
+    store.add_entry({"id": "3", "title": "Третья", "content": "новая"})
+    store.update_entry("1", {"title": "Первая (изм.)"})
+    store.delete_entry(entries[1]["id"])
+
+    # Второе соединение видит изменения, а первое замечает чужую запись
+    other = DocumentStore(json_file, storage=SqliteStorage(db_file))
+    assert [entry["id"] for entry in other.snapshot()] == ["1", "3"]
+    assert other.get_entry("1")["title"] == "Первая (изм.)"
+    other.add_entry({"id": "4", "title": "Четвертая", "content": "из другого процесса"})
+    assert store.get_entry("4") is not None
+    print("✓ Изменения отдельных записей сохраняются и видны другим соединениям")
+
+    store.storage.close()
+    other.storage.close()
+
+
+def test_json_storage_atomic_write():
+    print("Тестируем атомарную запись JSON...")
+
+    directory = tempfile.mkdtemp()
+    json_file = os.path.join(directory, "knowledge_base.json")
+    storage = JsonStorage(json_file)
+    storage.write_all([{"id": "1", "title": "Запись"}])
+    assert storage.load_all() == [{"id": "1", "title": "Запись"}]
+    assert os.listdir(directory) == ["knowledge_base.json"]
+    print("✓ Временные файлы не остаются после записи")
+
+
+def test_journaled_storage():
+    print("Тестируем журнал изменений...")
+
+    directory = tempfile.mkdtemp()
+    json_file = os.path.join(directory, "knowledge_base.json")
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump([{"id": "1", "title": "Первая", "content": "длинный текст " * 100}], f, ensure_ascii=False)
+    snapshot_before = os.path.getmtime(json_file), os.path.getsize(json_file)
+
+    store = DocumentStore(json_file, storage=JournaledJsonStorage(json_file, fsync=False))
+    store.add_entry({"id": "2", "title": "Вторая", "content": "текст"})
+    store.update_entry("1", {"title": "Первая (изм.)"})
+    store.delete_entry("2")
+    assert (os.path.getmtime(json_file), os.path.getsize(json_file)) == snapshot_before
+    assert store.storage.journal_length() == 3
+    print("✓ Изменения пишутся в журнал, снимок не перезаписывается")
+
+    # Запись правки содержит только измененные поля
+    update_record = list(store.storage.read_journal())[1]
+    assert update_record["op"] == "update" and "content" not in update_record["fields"]
+
+    # Оборванная строка в конце журнала (сбой при записи) не мешает чтению и дописыванию
+    with open(store.storage.journal_file, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "id": "3", "fi')
+    replayed = DocumentStore(json_file, storage=JournaledJsonStorage(json_file, fsync=False))
+    assert [entry["title"] for entry in replayed.snapshot()] == ["Первая (изм.)"]
+    replayed.add_entry({"id": "4", "title": "Четвертая", "content": "после сбоя"})
+    replayed = DocumentStore(json_file, storage=JournaledJsonStorage(json_file, fsync=False))
+    assert [entry["id"] for entry in replayed.snapshot()] == ["1", "4"]
+    print("✓ Журнал применяется при запуске, оборванные записи пропускаются")
+
+    assert replayed.compact() is True
+    assert not os.path.exists(replayed.storage.journal_file)
+    with open(json_file, "r", encoding="utf-8") as f:
+        assert [entry["id"] for entry in json.load(f)] == ["1", "4"]
+    assert replayed.compact() is False
+    print("✓ Сжатие переносит журнал в новый снимок")
+
+    # Второй процесс дописал журнал после того, как первый прочитал базу
+    other = DocumentStore(json_file, storage=JournaledJsonStorage(json_file, fsync=False))
+    other.add_entry({"id": "5", "title": "Пятая", "content": "из другого процесса"})
+    replayed._refresh_if_changed()
+    other.add_entry({"id": "6", "title": "Шестая", "content": "из другого процесса"})
+    # Сжатие начинается без перечитывания базы, как если бы запись пришла между чтением и сжатием
+    replayed._refresh_if_changed = lambda: None
+    assert replayed.compact() is True
+    del replayed._refresh_if_changed
+    reopened = DocumentStore(json_file, storage=JournaledJsonStorage(json_file, fsync=False))
+    assert [entry["id"] for entry in reopened.snapshot()] == ["1", "4", "5", "6"]
+    assert [entry["id"] for entry in replayed.snapshot()] == ["1", "4", "5", "6"]
+    print("✓ Записи другого процесса не теряются при сжатии")
+
+
+
+def test_sqlite_backup_restore():
+    print("Тестируем резервную копию базы в SQLite...")
+
+    from backup_system import BackupSystem
+
+    directory = tempfile.mkdtemp()
+    previous_cwd = os.getcwd()
+    # Копия включает файлы аудита и пользователей из текущего каталога
+    os.chdir(directory)
+    try:
+        json_file = os.path.join(directory, "knowledge_base.json")
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump([{"id": "1", "title": "Из JSON", "content": "текст"}], f, ensure_ascii=False)
+        migrate_json_to_sqlite(json_file, os.path.join(directory, "knowledge_base.db"))
+        store = DocumentStore(json_file, storage=SqliteStorage(os.path.join(directory, "knowledge_base.db")))
+        backups = BackupSystem(json_file, os.path.join(directory, "backups"), store=store)
+
+        store.add_entry({"id": "2", "title": "Только в SQLite", "content": "текст"})
+        backup_name = os.path.basename(backups.create_backup())
+        store.update_entry("1", {"title": "После копии"})
+        store.delete_entry("2")
+        store.add_entry({"id": "3", "title": "Лишняя", "content": "текст"})
+
+        assert backups.restore_backup(backup_name) is True
+        assert [(entry["id"], entry["title"]) for entry in store.snapshot()] == [("1", "Из JSON"),
+                                                                                 ("2", "Только в SQLite")]
+        # Данные восстановлены в самой SQLite, а не только в JSON-файле
+        reopened = SqliteStorage(os.path.join(directory, "knowledge_base.db"))
+        assert [entry["id"] for entry in reopened.load_all()] == ["1", "2"]
+        reopened.close()
+        print("✓ Копия содержит данные SQLite и восстанавливается через хранилище")
+        store.storage.close()
+    finally:
+        os.chdir(previous_cwd)
+
+
+if __name__ == "__main__":
+    test_sqlite_storage()
+    test_json_storage_atomic_write()
+    test_journaled_storage()
+    test_sqlite_backup_restore()
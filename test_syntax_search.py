@@ -1,86 +1,8 @@
 #!/usr/bin/env python3
 # Standalone test for syntax-aware search functionality
 
-import re
-
-def syntax_aware_search(text, query):
-    """
-    Performs syntax-aware search supporting:
-    - AND operator: "word1 AND word2"
-    - OR operator: "word1 OR word2" 
-    - NOT operator: "word1 NOT word2"
-    - Phrase search: "word1 word2" (both words present)
-    - Quoted phrases: "\"exact phrase\""
-    """
-    # Normalize text and query to lowercase
-    text_lower = text.lower()
-    query = query.strip()
-    
-    # Handle quoted phrases first
-    quoted_phrases = re.findall(r'"([^"]*)"', query)
-    query_without_quotes = re.sub(r'"[^"]*"', ' QUOTED_PHRASE_PLACEHOLDER ', query)
-    
-    # Check if all quoted phrases are present in the text
-    for phrase in quoted_phrases:
-        phrase = phrase.strip().lower()
-        if phrase and phrase not in text_lower:
-            return False
-    
-    # Split by AND, OR, NOT operators while preserving them
-    parts = re.split(r'\s+(AND|OR|NOT)\s+', query_without_quotes, flags=re.IGNORECASE)
-    
-    # Process parts with operators
-    i = 0
-    result = True  # Start with True for AND logic
-    operator = 'AND'  # Default operator
-    
-    while i < len(parts):
-        part = parts[i].strip()
-        
-        if part.upper() in ['AND', 'OR', 'NOT']:
-            operator = part.upper()
-        else:
-            term = part.strip().lower()
-            # Handle quoted phrases (they were already verified)
-            if 'QUOTED_PHRASE_PLACEHOLDER' in term:
-                # If this part contains the placeholder (even if mixed with other text), the quoted phrase validation was already done
-                # If the term is just the placeholder, then it's True
-                # If it has other content, we need to check the other content too
-                term_exists = True  # Start with True since quoted phrases were validated
-                
-                # Check for other non-placeholder content in the same part
-                other_content = re.sub(r'QUOTED_PHRASE_PLACEHOLDER', '', term).strip()
-                if other_content:
-                    # There's other content in this part, check it
-                    other_subterms = [t.strip() for t in other_content.split() if t.strip() and t.strip() != 'QUOTED_PHRASE_PLACEHOLDER']
-                    for subterm in other_subterms:
-                        if subterm:
-                            term_exists = term_exists and (subterm in text_lower)
-            else:
-                # Handle regular terms - for space-separated terms without operators, all should be present (AND logic)
-                subterms = [t.strip() for t in term.split() if t.strip()]
-                term_exists = True  # Start with True
-                for subterm in subterms:
-                    if subterm and subterm != 'QUOTED_PHRASE_PLACEHOLDER':  # Skip placeholder if it's mixed with other terms
-                        term_exists = term_exists and (subterm in text_lower)
-            
-            if operator == 'AND':
-                result = result and term_exists
-            elif operator == 'OR':
-                if i == 0 or all(p.upper() not in ['AND', 'OR', 'NOT'] for p in parts[:i] if p.strip()):  # First term, initialize result
-                    result = term_exists
-                else:
-                    result = result or term_exists
-            elif operator == 'NOT':
-                result = result and not term_exists
-        
-        i += 1
-    
-    # Special case: if the original query only had quoted phrases (no other terms), return True if all phrases were found
-    if len([p for p in parts if p.upper() not in ['AND', 'OR', 'NOT']]) == 1 and 'QUOTED_PHRASE_PLACEHOLDER' in parts[0] and not any(op in query.upper() for op in ['AND', 'OR', 'NOT']):
-        return len(quoted_phrases) > 0  # If we found and validated quoted phrases with no operators, return True
-    
-    return result
+from syntax_query import syntax_aware_search
+
 
 def test_syntax_aware_search():
     test_text = "The quick brown fox jumps over the lazy dog. This is a sample text for testing."
@@ -125,5 +47,85 @@ def test_syntax_aware_search():
     
     print("\nAll tests passed! The syntax-aware search function is working correctly.")
 
+def test_query_compiler():
+    from syntax_query import And, Not, Or, Phrase, Term, compile_query
+
+    test_text = "The quick brown fox jumps over the lazy dog. This is a sample text for testing."
+
+    print("Testing query compiler...")
+
+    # NOT binds tighter than AND, AND tighter than OR
+    root = compile_query("fox OR cat AND NOT dog").root
+    assert isinstance(root, Or) and isinstance(root.children[1], And)
+    assert isinstance(root.children[1].children[1], Not)
+    assert syntax_aware_search(test_text, "fox OR cat AND zebra") == True
+    assert syntax_aware_search(test_text, "(fox OR cat) AND zebra") == False
+    print("✓ Operator precedence and grouping work")
+
+    assert syntax_aware_search(test_text, "NOT cat") == True
+    assert syntax_aware_search(test_text, "quick and not dog") == False
+    assert syntax_aware_search(test_text, "(quick OR cat) NOT (zebra OR lion)") == True
+    print("✓ Leading NOT, lowercase operators and nested groups work")
+
+    phrase = compile_query('"Lazy Dog" fox').root
+    assert isinstance(phrase, And) and isinstance(phrase.children[0], Phrase)
+    assert isinstance(phrase.children[1], Term)
+    assert compile_query('"lazy dog"') is compile_query('"lazy dog"')
+    print("✓ Queries are compiled once and reused")
+
+    # Malformed queries do not raise
+    assert syntax_aware_search(test_text, "(quick AND fox") == True
+    assert syntax_aware_search(test_text, "quick)") == True
+    assert syntax_aware_search(test_text, "AND") == False
+    assert compile_query("  ").is_empty
+    print("✓ Malformed queries are handled")
+
+def test_inverted_index():
+    from document_store import DocumentSnapshot
+    from inverted_index import SyntaxSearchIndex
+
+    test_text = "The quick brown fox jumps over the lazy dog. This is a sample text for testing."
+    entries = [
+        {"id": "1", "title": "Sample", "content": test_text},
+        {"id": "2", "title": "Другая запись", "content": "Кошка спит на диване"},
+        {"id": "3", "title": "Quick notes", "content": "Nothing about animals"}
+    ]
+    index = SyntaxSearchIndex()
+    index.build(entries)
+
+    def found(query):
+        return "1" in [entry["id"] for entry in index.search(query)]
+
+    print("Testing inverted index search...")
+
+    # The same expectations as for syntax_aware_search
+    assert found("quick") == True
+    assert found("quick brown") == True
+    assert found("quick AND fox") == True
+    assert found("cat OR fox") == True
+    assert found("quick NOT cat") == True
+    assert found("quick NOT dog") == False
+    assert found("\"quick brown\"") == True
+    assert found("\"quick brown\" AND dog") == True
+    assert found("\"quick brown\" OR cat") == True
+    print("✓ Inverted index passes the syntax-aware search cases")
+
+    # Every query must give the same answer as the linear scan
+    queries = ["quick", "qui", "fox AND cat", "cat OR dog", "dog NOT lazy", "sample text", "animals OR кошка",
+               "dog.", "test AND sample NOT zebra", "нет", "\"lazy dog\" OR notes", "NOT quick",
+               "(cat OR notes) AND quick", "fox OR nothing AND zebra", "NOT (dog OR кошка)"]
+    for query in queries:
+        expected = [entry["id"] for entry in entries
+                    if syntax_aware_search(entry["title"], query) or syntax_aware_search(entry["content"], query)]
+        assert [entry["id"] for entry in index.search(query)] == expected, query
+    print("✓ Inverted index matches the linear scan")
+
+    # Deltas keep the index consistent
+    index.apply_change("delete", entries[0], None, DocumentSnapshot(1, tuple(entries[1:])))
+    assert index.search("quick") == [entries[2]]
+    print("✓ Deleted entries disappear from results")
+
 if __name__ == "__main__":
-    test_syntax_aware_search()
\ No newline at end of file
+    test_syntax_aware_search()
+    test_query_compiler()
+    test_inverted_index()
\ No newline at end of file
@@ -6,6 +6,7 @@ from datetime import datetime
 import logging
 from pdfplumber import open as pdf_open
 
+import passages
 from audit_system import log_action
 from data_utils import load_data, save_data
 
@@ -50,43 +51,109 @@ def download_document(doc, folder="static/uploads"):
         logger.error(f"Ошибка скачивания: {e}")
         return None
 
-def extract_content_from_pdf(pdf_path):
+def extract_pdf_pages(pdf_path, max_pages=None):
+    """Текст страниц PDF (все страницы или первые max_pages)"""
+    with pdf_open(pdf_path) as pdf:
+        pages = pdf.pages if max_pages is None else pdf.pages[:max_pages]
+        return [(page.extract_text() or "") + "\n\n" for page in pages]
+
+def extract_content_from_pdf(pdf_path, max_pages=3, max_chars=5000, save_full_text=False):
+    """
+    Текст PDF для предпросмотра (первые страницы, ограниченная длина)
+
+    При save_full_text читается весь документ, и его полный текст сохраняется
+    в каталоге полных текстов для поиска по фрагментам (passages.save_full_text).
+    """
     try:
-        with pdf_open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages[:3]:  # Первые 3 страницы
-                text += page.extract_text() + "\n\n"
-            return text[:5000]  # Ограничиваем длину
+        texts = extract_pdf_pages(pdf_path, None if save_full_text else max_pages)
+        if save_full_text:
+            passages.save_full_text(pdf_path, "".join(texts))
+        return "".join(texts[:max_pages])[:max_chars]  # Ограничиваем длину
     except Exception as e:
         logger.warning(f"Не удалось извлечь содержание: {e}")
         return "Недоступно для предпросмотра"
 
+def save_attachment_text(file_path):
+    """Сохраняет полный текст прикрепленного PDF для поиска по фрагментам (один проход по документу)"""
+    if not file_path.lower().endswith(".pdf"):
+        return False
+    try:
+        text = "".join(extract_pdf_pages(file_path))
+    except Exception as e:
+        logger.warning(f"Не удалось извлечь полный текст {file_path}: {e}")
+        # Текст прежней версии файла не должен попадать в поиск
+        passages.remove_full_text(file_path)
+        return False
+    passages.save_full_text(file_path, text)
+    return True
+
+def backfill_full_texts(upload_folder=passages.UPLOAD_FOLDER):
+    """
+    Извлекает полные тексты PDF-вложений, добавленных до поиска по фрагментам
+
+    Полные тексты, сохраненные прежде рядом с файлами в upload_folder, удаляются
+    (если такой .txt не является вложением записи). Полный текст, который старше
+    самого файла (файл заменен), извлекается заново. Если что-то извлечено,
+    семантический индекс перестраивается при следующем поиске.
+    """
+    from document_store import document_store
+    from simple_semantic_search_integration import search_system
+
+    try:
+        files = {entry.get("file") for entry in document_store.snapshot() if entry.get("file")}
+        written = 0
+        for filename in sorted(files):
+            file_path = os.path.join(upload_folder, filename)
+            if not filename.lower().endswith(".pdf") or not os.path.exists(file_path):
+                continue
+            legacy_path = file_path + passages.FULL_TEXT_SUFFIX
+            if os.path.exists(legacy_path) and filename + passages.FULL_TEXT_SUFFIX not in files:
+                os.remove(legacy_path)
+            if not passages.has_full_text(file_path) and save_attachment_text(file_path):
+                written += 1
+        if written:
+            search_system.invalidate()
+        logger.info(f"Извлечены полные тексты вложений: {written}")
+        return True
+    except Exception as e:
+        logger.error(f"Не удалось извлечь полные тексты вложений: {e}")
+        return False
+
 def sync_edsoo():
     
-    from data_utils import load_data, save_data
+    from document_store import document_store
     new_docs = fetch_edsoo_documents()
-    knowledge = load_data()
     added = 0
     updated = 0
 
     for doc in new_docs:
-        existing = next((x for x in knowledge if x["title"] == doc["title"]), None)
-        if existing:
+        # Поиск по индексу заголовков хранилища вместо просмотра всей базы
+        existing_id = document_store.find_id_by_title(doc["title"])
+        if existing_id is not None:
+            existing = document_store.get_entry(existing_id)
             if doc["registered_at"] > existing.get("updated_at", ""):
                 filename = download_document(doc, "static/uploads")
                 if filename:
-                    existing.update({
+                    file_path = os.path.join("static/uploads", filename)
+                    old_file = existing.get("file")
+                    if old_file and old_file != filename:
+                        passages.remove_full_text(os.path.join("static/uploads", old_file))
+                    # Полный текст сохраняется до обновления записи: индекс фрагментов читает его при обновлении
+                    save_attachment_text(file_path)
+                    document_store.update_entry(existing_id, {
                         "file": filename,
-                        "content": extract_content_from_pdf(os.path.join("static/uploads", filename))[:2000],
+                        "content": extract_content_from_pdf(file_path)[:2000],
                         "updated_at": datetime.now().isoformat()
                     })
                     updated += 1
         else:
             filename = download_document(doc, "static/uploads")
             if filename:
-                knowledge.append({
+                file_path = os.path.join("static/uploads", filename)
+                save_attachment_text(file_path)
+                document_store.add_entry({
                     "title": doc["title"],
-                    "content": extract_content_from_pdf(os.path.join("static/uploads", filename))[:2000],
+                    "content": extract_content_from_pdf(file_path)[:2000],
                     "file": filename,
                     "source": "edsoo.ru",
                     "created_at": doc["registered_at"],
@@ -95,7 +162,6 @@ def sync_edsoo():
                 added += 1
 
     if added or updated:
-        save_data(knowledge)
         log_action(
             username="system",
             action_type="sync",